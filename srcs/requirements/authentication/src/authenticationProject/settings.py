@@ -201,6 +201,8 @@ EMAIL_HOST_PASSWORD = read_secret('GMAIL_APP_PASSWORD')
 
 SIMPLE_JWT = {
     'AUTH_COOKIE': 'access_token',
+    # shared with the services verifying the access tokens locally (pong)
+    'SIGNING_KEY': read_secret('JWT_SIGNING_KEY') or SECRET_KEY,
 }
 
 AUTH_USER_MODEL = 'authenticationApp.CustomUser'
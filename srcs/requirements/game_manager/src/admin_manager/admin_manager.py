@@ -1,228 +1,299 @@
-import threading
 import websockets
 import asyncio
-from game_manager.models import GameInstance, Player
-from django.db import transaction
+from game_manager.supervisor import GameSupervisor
+from .write_buffer import GameWriteBuffer, FLUSH_WINDOW
 from django.conf import settings
 from game_manager.utils.logger import logger
 from asgiref.sync import sync_to_async
 import json
+import time
+
+MAX_CONNECTIONS = 1000 # admin websockets at once, one per game
+MAX_HANDSHAKES = 32 # connections opening at once
+OPEN_TIMEOUT = 10 # seconds
+RECONNECT_ATTEMPTS = 5
+BACKOFF_BASE = 0.5 # seconds, doubled on each attempt
+BACKOFF_MAX = 8 # seconds
 
 class AdminManager:
+	"""
+	The admin websockets of the games, one per game, all multiplexed as
+	tasks of the game_manager loop.
+
+	A connection lost or that failed to open is retried with an exponential
+	backoff, until the game ends or RECONNECT_ATTEMPTS in a row failed. A
+	game service refusing the handshake (the game no longer exists) is not
+	retried.
+
+	The messages are written behind (write_buffer.py): the updates of a game
+	received within FLUSH_WINDOW are written together, and the end of the
+	game at once.
+	"""
 	admin_manager_instance = None
 
 	def __init__(self):
-		self.threads = {}
-		self._threads_mutex = threading.Lock()
+		self._loop = None
+		self._handshakes = None
+		self.connections = {}
+		self.stats = {
+			'opened': 0,
+			'closed': 0,
+			'rejected': 0,
+			'reconnects': 0,
+			'messages': 0,
+			'flushes': 0,
+		}
 
-	def connect_to_game(self, game_id, ws_url):
-		logger.debug(f'new thread created to {ws_url} !')
-		loop = asyncio.new_event_loop()
-		asyncio.set_event_loop(loop)
-		try:
-			loop.run_until_complete(self._handle_websocket(game_id, ws_url))
-		finally:
-			self.cleanup_thread(game_id)
+	def bind(self, loop):
+		# the game_manager loop, from start_game_manager_loop
+		self._loop = loop
+		self._handshakes = asyncio.Semaphore(MAX_HANDSHAKES)
 
-	def cleanup_thread(self, game_id):
-		with self._threads_mutex:
-			thread_data = self.threads.get(game_id)
-			if not thread_data:
-				logger.error(f"Thread data for game {game_id} not found. Skipping cleanup.")
-				return
-	
-			users = thread_data.get('users', {})
-			logger.debug(f"Cleanup after game {game_id}. Closing resources...")
-			logger.debug(f"Users change status: {users}")
-			self.update_game_status(game_id, users, 'aborted')
-			del self.threads[game_id]
-	
-		logger.debug(f"Thread for game {game_id} cleaned up.")
-
-	
-	async def _handle_websocket(self, game_id, ws_url):
-		users = None
-		with self._threads_mutex:
-			if self.threads.get(game_id):
-				users = self.threads[game_id]['users']
-				logger.info(f"users : {users}")
-		logger.debug(f'thread in game : {game_id} is running...')
-		try :
-			async with websockets.connect(ws_url) as websocket:
+	def _run_in_loop(self, coroutine):
+		if self._loop is None or self._loop.is_closed() or not self._loop.is_running():
+			coroutine.close()
+			return None
+		return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+	# CONNECTIONS
+
+	async def _open(self, game_id, ws_url):
+		if game_id in self.connections:
+			return True
+		if len(self.connections) >= MAX_CONNECTIONS:
+			self.stats['rejected'] += 1
+			logger.error(f"{len(self.connections)} admin connections, game {game_id} refused")
+			return False
+		connection = {
+			'users': {
+				'players': [],
+				'spectators': []
+			},
+			'writes': GameWriteBuffer(game_id),
+			'flush': None,
+			'metrics': {
+				'started': time.time(),
+				'connects': 0,
+				'failures': 0,
+				'messages': 0,
+				'bytes': 0,
+				'handler_seconds': 0.0,
+				'flushes': 0,
+				'last_message': None,
+			}
+		}
+		self.connections[game_id] = connection
+		connection['task'] = asyncio.create_task(self._connection(game_id, ws_url, connection))
+		self.stats['opened'] += 1
+		return True
+
+	async def _connection(self, game_id, ws_url, connection):
+		metrics = connection['metrics']
+		attempts = 0
+		try:
+			while not connection['writes'].ended and attempts < RECONNECT_ATTEMPTS:
+				if attempts:
+					self.stats['reconnects'] += 1
+					await asyncio.sleep(min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX))
+				try:
+					async with self._handshakes:
+						websocket = await websockets.connect(ws_url, open_timeout=OPEN_TIMEOUT)
+				except websockets.exceptions.InvalidHandshake as e:
+					logger.error(f"Game {game_id} refused the admin connection: {e}")
+					break
+				except (OSError, asyncio.TimeoutError) as e:
+					metrics['failures'] += 1
+					attempts += 1
+					logger.warning(f"Admin connection to {game_id} failed ({attempts}/{RECONNECT_ATTEMPTS}): {e}")
+					continue
+				metrics['connects'] += 1
+				attempts = 0
 				logger.debug(f"Websocket connected : {ws_url}")
 				try:
-					async for message in websocket:
-						if await self.game_is_aborted(game_id):
-							await websocket.close()
-						if message:
-							message_dict = json.loads(message)
-							if message_dict:
-								await self.handle_message(game_id, message_dict, users)
-				except websockets.exceptions.ConnectionClosedOK:
-					logger.debug("WebSocket connection closed normally (1000 OK).")
+					await self._receive(game_id, websocket, connection)
 				except websockets.exceptions.ConnectionClosedError as e:
-					logger.error(f"WebSocket closed with error: {e}")
-				except json.JSONDecodeError as e:
-					logger.error(f"Failed to decode message: {e}")
+					metrics['failures'] += 1
+					attempts += 1
+					logger.error(f"WebSocket of {game_id} closed with error: {e}")
+				else:
+					# iterating the websocket ends without raising on a 1000 close
+					logger.debug("WebSocket connection closed normally (1000 OK).")
+					break
+				finally:
+					await websocket.close()
+		except asyncio.CancelledError:
+			logger.debug(f"Admin connection to {game_id} closed by the game_manager")
 		except Exception as e:
 			logger.error(f"Unexpected error in WebSocket handler for game {game_id}: {e}")
+		finally:
+			await self._cleanup(game_id, connection)
 
-	@sync_to_async
-	def game_is_aborted(self, game_id):
-		game_instance = GameInstance.get_game(game_id)
-		if not game_instance:
-			logger.debug("game instance is None")
-			return True
-		status = game_instance.status
-		if status == 'finished' or status == 'aborted':
-			return True
-		return False
+	async def _receive(self, game_id, websocket, connection):
+		metrics = connection['metrics']
+		writes = connection['writes']
+		async for message in websocket:
+			self.stats['messages'] += 1
+			metrics['messages'] += 1
+			metrics['bytes'] += len(message)
+			metrics['last_message'] = time.time()
+			try:
+				message_dict = json.loads(message)
+			except json.JSONDecodeError as e:
+				logger.error(f"Failed to decode message: {e}")
+				continue
+			if not message_dict:
+				continue
+			start = time.perf_counter()
+			self.handle_message(game_id, message_dict, connection)
+			if writes.ended:
+				await self._flush(connection)
+			elif writes.dirty and connection['flush'] is None:
+				connection['flush'] = asyncio.create_task(self._flush_later(game_id, connection))
+			metrics['handler_seconds'] += time.perf_counter() - start
+			if writes.ended:
+				return
 
-	@sync_to_async
-	def handle_message(self, game_id, message, users):
+	async def _cleanup(self, game_id, connection):
+		self.connections.pop(game_id, None)
+		self.stats['closed'] += 1
+		if connection['flush']:
+			connection['flush'].cancel()
+		writes = connection['writes']
+		if not writes.ended:
+			logger.debug(f"Users change status: {connection['users']}")
+			self.update_game_status(game_id, connection, 'aborted')
+		try:
+			await self._flush(connection)
+		except Exception as e:
+			logger.error(f"Error aborting game {game_id}: {e}")
+		logger.debug(f"Cleanup after game {game_id}, metrics: {connection['metrics']}")
+
+	def metrics(self, game_id):
+		connection = self.connections.get(game_id)
+		if connection is None:
+			return None
+		return dict(connection['metrics'])
+
+	# WRITES
+
+	async def _flush_later(self, game_id, connection):
+		# write-behind: the updates of the next FLUSH_WINDOW go with this one
+		await asyncio.sleep(FLUSH_WINDOW)
+		connection['flush'] = None
+		try:
+			await self._flush(connection)
+		except Exception as e:
+			logger.error(f"Error writing the updates of game {game_id}: {e}")
+
+	async def _flush(self, connection):
+		writes = connection['writes']
+		if not writes.dirty:
+			return
+		pending = writes.take()
+		self.stats['flushes'] += 1
+		connection['metrics']['flushes'] += 1
+		await sync_to_async(writes.write)(pending)
+
+	def handle_message(self, game_id, message, connection):
 		logger.debug(f"Game {game_id}: Received message: {message}")
+		users = connection['users']
+		writes = connection['writes']
 		type = message.get("type")
 		if type == "export_status":
 			status = message.get("status")
 			if status == "finished" or status == "aborted":
-				win_team = message.get("team")
-				score = message.get("score")
-				self.set_winner(game_id, win_team, score)
-			self.update_game_status(game_id, users, status)
+				writes.end(status, message.get("team"), message.get("score"))
+			self.update_game_status(game_id, connection, status)
 		elif type == "export_teams":
 			teams = message.get("teams")
-			self.export_teams(game_id, teams)
+			for team in teams:
+				for player in teams[team]:
+					writes.add_player_to_team(player, team)
+				writes.set_score(team, 0)
 		elif type == "update_score":
-			team = message.get("team")
-			score = message.get("score")
-			self.update_score(game_id, team, score)
+			writes.set_score(message.get("team"), message.get("score"))
 		elif type == "player_connection":
 			username = message.get("username")
-			if users:
-				players = users.get('players')
-				players.append(username)
-				self.update_user_status(username, 'waiting_for_players')
+			users['players'].append(username)
+			writes.set_user_status(username, 'waiting_for_players')
 		elif type == "spectator_connection":
 			username = message.get("username")
-			if users:
-				spectators = users.get('spectators')
-				spectators.append(username)
-			self.update_user_status(username, 'spectate')
+			users['spectators'].append(username)
+			writes.set_user_status(username, 'spectate')
 		elif type == "player_disconnection":
 			username = message.get("username")
-			self.update_user_status(username, 'inactive')
-			if users:
-				players = users.get('players')
-				players.remove(username)
+			writes.set_user_status(username, 'inactive')
+			if username in users['players']:
+				users['players'].remove(username)
 		elif type == "spectator_disconnection":
 			username = message.get("username")
-			self.update_user_status(username, 'inactive')
-			if users:
-				spectators = users.get('spectators')
-				spectators.remove(username)
-
-	def set_winner(self, game_id, win_team, score):
-		game_instance = GameInstance.get_game(game_id)
-		if not game_instance:
-			logger.debug("game instance is None")
-			return
-		with transaction.atomic():
-			if score:
-				game_instance.update_score(win_team, score)
-			if win_team:
-				game_instance.set_winner(win_team)
-
-	def update_game_status(self, game_id, users, status):
-		self.update_users_status_with_game_status(users, status)
-		game_instance = GameInstance.get_game(game_id)
-		if not game_instance:
-			logger.debug("game instance is None")
-			return
-		if game_instance.status == 'finished' \
-			or game_instance.status == 'aborted':
-			return
-		with transaction.atomic():
-			game_instance.update_status(status)
+			writes.set_user_status(username, 'inactive')
+			if username in users['spectators']:
+				users['spectators'].remove(username)
+
+	def update_game_status(self, game_id, connection, status):
+		GameSupervisor.game_supervisor_instance.push_status(game_id, status)
+		writes = connection['writes']
+		if status == 'finished' or status == 'aborted':
+			writes.end(status)
+		else:
+			writes.set_status(status)
+		self.update_users_status_with_game_status(connection['users'], status, writes)
 
-	def update_users_status_with_game_status(self, users, game_status):
+	def update_users_status_with_game_status(self, users, game_status, writes):
 		if game_status == 'loading':
 			logger.info("change to loading")
-			self.change_all_players_status(users, 'loading_game')
+			self.change_all_users_status(users['players'], 'loading_game', writes)
 		if game_status == 'in_progress':
 			logger.info("change to in_progress")
-			self.change_all_players_status(users, 'in_game')
+			self.change_all_users_status(users['players'], 'in_game', writes)
 		if game_status == 'aborted' or game_status == 'finished':
 			logger.info("change to finished")
-			self.change_all_players_status(users, 'inactive')
-			self.change_all_spectators_status(users, 'inactive')
+			self.change_all_users_status(users['players'], 'inactive', writes)
+			self.change_all_users_status(users['spectators'], 'inactive', writes)
 
-	def export_teams(self, game_id, teams):
-		game_instance = GameInstance.get_game(game_id)
-		if not game_instance:
-			return
-		with transaction.atomic():
-			for team in teams:
-				for player in teams[team]:
-					logger.debug(f"{player}")
-					game_instance.add_player_to_team(player, team)
-				self.update_score(game_id, team, 0)
-
-	def update_score(self, game_id, team, score):
-		game_instance = GameInstance.get_game(game_id)
-		if not game_instance:
-			return
-		with transaction.atomic():
-			game_instance.update_score(team, score)
-
-	def change_all_players_status(self, users, status):
-		logger.info(f"players : {users['players']}")
-		for username in users['players']:
-			logger.info(f"{username} status : {status}")
-			self.update_user_status(username, status)
-		if status == 'inactive':
-			for username in users['players']:
-				users['players'].remove(username)
-		
-	def change_all_spectators_status(self, users, status):
-		for username in users['spectators']:
-			self.update_user_status(username, status)
+	def change_all_users_status(self, usernames, status, writes):
+		for username in usernames:
+			writes.set_user_status(username, status)
 		if status == 'inactive':
-			for username in users['spectators']:
-				users['spectators'].remove(username)
-
-	def update_user_status(self, username, status):
-		with transaction.atomic():
-			player = Player.get_player(username)
-			if player:
-				player.update_status(status)		
+			usernames.clear()
 
 	# ADMIN_MANAGER
 
-	def start_connections(self, game_id, admin_id, game_mode):
+	async def start_connections(self, game_id, admin_id, game_mode):
+		"""
+		Opens the admin websocket of the game, from any thread. False if it
+		cannot be supervised.
+		"""
 		ws_url = settings.GAME_MODES.get(game_mode).get('service_ws') + game_id + '/' + admin_id + '/'
 		logger.debug(f'start_new_connection ws - game_id = {game_id}, admin_id = {admin_id}, ws_url = {ws_url}')
-		thread = threading.Thread(target=self.connect_to_game, args=(game_id, ws_url))
-		thread.start()
-
-		with self._threads_mutex:
-			self.threads[game_id] = {
-				'thread': thread,
-				'users': {
-					'players': [],
-					'spectators': []
-				}
-			}
+		future = self._run_in_loop(self._open(game_id, ws_url))
+		if future is None:
+			logger.error(f"game_manager loop is not running, no admin connection for {game_id}")
+			return False
+		return await asyncio.wrap_future(future)
+
+	async def _close(self, game_ids):
+		tasks = []
+		for game_id in game_ids:
+			connection = self.connections.get(game_id)
+			if connection:
+				connection['task'].cancel()
+				tasks.append(connection['task'])
+		await asyncio.gather(*tasks, return_exceptions=True)
 
 	def force_close(self, game_id):
-		with self._threads_mutex:
-			if self.threads[game_id]:
-				self.threads[game_id]['thread'].stop()
-
-	def close_all(self):
-		with self._threads_mutex:
-			for game_id in self.threads:
-				self.threads[game_id]['thread'].join()
-		logger.debug("All threads are closed.")
+		# from any thread, does not wait for the connection to close
+		self._run_in_loop(self._close([game_id]))
+
+	def close_all(self, timeout=5):
+		future = self._run_in_loop(self._close(list(self.connections)))
+		if future is not None:
+			try:
+				future.result(timeout)
+			except Exception as e:
+				logger.error(f"Error closing the admin connections: {e}")
+		logger.debug("All admin connections are closed.")
 
 if AdminManager.admin_manager_instance is None:
 	AdminManager.admin_manager_instance = AdminManager()
@@ -0,0 +1,87 @@
+import asyncio
+import json
+import socket
+from unittest import TestCase, mock
+from websockets.asyncio.server import serve
+from admin_manager import admin_manager
+from admin_manager.admin_manager import AdminManager, RECONNECT_ATTEMPTS, BACKOFF_BASE, BACKOFF_MAX
+
+class Manager(AdminManager):
+	# the statuses and the writes of the game stay in memory
+	def __init__(self):
+		super().__init__()
+		self.statuses = []
+
+	def update_game_status(self, game_id, connection, status):
+		self.statuses.append(status)
+		if status == 'finished' or status == 'aborted':
+			connection['writes'].end(status)
+
+	async def _flush(self, connection):
+		connection['writes'].take()
+
+def free_port():
+	with socket.socket() as s:
+		s.bind(('127.0.0.1', 0))
+		return s.getsockname()[1]
+
+def connect(manager, url):
+	async def main():
+		manager.bind(asyncio.get_running_loop())
+		await manager._open('game', url)
+		await manager.connections['game']['task']
+	asyncio.run(main())
+
+def connect_to(manager, handler, process_request=None):
+	async def main():
+		manager.bind(asyncio.get_running_loop())
+		async with serve(handler, '127.0.0.1', 0, process_request=process_request) as server:
+			port = server.sockets[0].getsockname()[1]
+			await manager._open('game', f'ws://127.0.0.1:{port}/game/admin/')
+			await manager.connections['game']['task']
+	asyncio.run(main())
+
+class ReconnectTests(TestCase):
+	def test_backoff_until_the_attempts_run_out(self):
+		manager = Manager()
+		delays = []
+		sleep = asyncio.sleep
+		async def record(delay):
+			delays.append(delay)
+			await sleep(0)
+		with mock.patch.object(admin_manager.asyncio, 'sleep', record):
+			connect(manager, f'ws://127.0.0.1:{free_port()}/game/admin/')
+		self.assertEqual(delays, [min(BACKOFF_BASE * 2 ** i, BACKOFF_MAX) for i in range(RECONNECT_ATTEMPTS - 1)])
+		self.assertEqual(manager.stats['reconnects'], RECONNECT_ATTEMPTS - 1)
+		self.assertEqual(manager.statuses, ['aborted'])
+		self.assertEqual(manager.connections, {})
+
+	@mock.patch.object(admin_manager, 'BACKOFF_BASE', 0.01)
+	def test_reconnect_after_a_lost_connection(self):
+		manager = Manager()
+		connects = []
+		async def handler(websocket):
+			connects.append(websocket)
+			if len(connects) == 1:
+				await websocket.send(json.dumps({'type': 'export_status', 'status': 'loading'}))
+				websocket.transport.abort()
+				return
+			await websocket.send(json.dumps({'type': 'export_status', 'status': 'finished', 'team': None, 'score': None}))
+		connect_to(manager, handler)
+		self.assertEqual(len(connects), 2)
+		self.assertEqual(manager.stats['reconnects'], 1)
+		self.assertEqual(manager.statuses, ['loading', 'finished'])
+
+	@mock.patch.object(admin_manager, 'BACKOFF_BASE', 0.01)
+	def test_refused_handshake_not_retried(self):
+		manager = Manager()
+		requests = []
+		def refuse(websocket, request):
+			requests.append(request.path)
+			return websocket.respond(403, 'no game\n')
+		async def handler(websocket):
+			pass
+		connect_to(manager, handler, refuse)
+		self.assertEqual(requests, ['/game/admin/'])
+		self.assertEqual(manager.stats['reconnects'], 0)
+		self.assertEqual(manager.statuses, ['aborted'])
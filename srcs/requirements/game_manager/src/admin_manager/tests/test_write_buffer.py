@@ -0,0 +1,64 @@
+from django.test import TestCase
+from game_manager.models import GameInstance, GameMode, Player, GameScore, GamePlayer, WinRate
+from admin_manager.write_buffer import GameWriteBuffer
+
+class GameWriteBufferTests(TestCase):
+	def setUp(self):
+		# the team ids of the rolled back tests
+		GameWriteBuffer.teams = {}
+		mode = GameMode.objects.create(name='PONG_CLASSIC')
+		# bulk_create: GameInstance.save checks the players of the game
+		GameInstance.objects.bulk_create([GameInstance(game_id='game', game_mode=mode)])
+		for username in ('p0', 'p1'):
+			Player.objects.create(username=username, status='pending')
+		self.buffer = GameWriteBuffer('game')
+
+	def flush(self):
+		self.buffer.write(self.buffer.take())
+
+	def game(self):
+		return GameInstance.objects.select_related('winner').get(game_id='game')
+
+	def test_last_status_wins(self):
+		self.buffer.set_status('loading')
+		self.buffer.set_status('in_progress')
+		self.flush()
+		self.assertEqual(self.game().status, 'in_progress')
+		self.assertFalse(self.buffer.dirty)
+
+	def test_end_is_final(self):
+		self.buffer.set_status('in_progress')
+		self.buffer.end('finished', 'left', 3)
+		self.buffer.set_status('in_progress')
+		self.flush()
+		game = self.game()
+		self.assertEqual(game.status, 'finished')
+		self.assertEqual(game.winner.name, 'left')
+		self.assertEqual(GameScore.objects.get(game=game, team__name='left').score, 3)
+
+	def test_finished_game_not_reopened(self):
+		self.buffer.end('finished')
+		self.flush()
+		late = GameWriteBuffer('game')
+		late.set_status('in_progress')
+		late.write(late.take())
+		self.assertEqual(self.game().status, 'finished')
+
+	def test_teams_written_before_the_winner(self):
+		# same batch: the win rates see the players of the teams
+		self.buffer.add_player_to_team('p0', 'left')
+		self.buffer.add_player_to_team('p1', 'right')
+		self.buffer.set_score('right', 1)
+		self.buffer.end('finished', 'left', 2)
+		self.flush()
+		self.assertEqual(GamePlayer.objects.filter(game=self.game()).count(), 2)
+		rates = dict(WinRate.objects.values_list('player__username', 'wins'))
+		self.assertEqual(rates, {'p0': 1, 'p1': 0})
+
+	def test_last_player_status_wins(self):
+		self.buffer.set_user_status('p0', 'loading_game')
+		self.buffer.set_user_status('p0', 'in_game')
+		self.buffer.set_user_status('p1', 'unknown')
+		self.flush()
+		statuses = dict(Player.objects.values_list('username', 'status'))
+		self.assertEqual(statuses, {'p0': 'in_game', 'p1': 'pending'})
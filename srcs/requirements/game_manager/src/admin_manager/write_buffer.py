@@ -0,0 +1,151 @@
+from game_manager.models import GameInstance, Player, Team, GamePlayer, GameScore
+from game_manager.utils.logger import logger
+from django.db import transaction
+
+FLUSH_WINDOW = 0.1 # seconds an update waits for the next ones
+
+class GameWriteBuffer:
+	"""
+	The database writes of the admin messages of one game, grouped.
+
+	The messages only record what changed (the last game status, score of
+	each team, status of each user and the teams); take() hands the pending
+	writes over and write() applies them in one transaction with a bulk
+	query per table. The end of the game (end) is written with the writes
+	still pending, before the winner is set.
+	"""
+	teams = {} # team name: id, shared by the games
+
+	def __init__(self, game_id):
+		self.game_id = game_id
+		self.game_pk = None
+		self.ended = False
+		self._pending = self._empty()
+
+	@staticmethod
+	def _empty():
+		return {
+			'status': None,
+			'winner': None,
+			'scores': {},
+			'players': {},
+			'teams': {},
+		}
+
+	@property
+	def dirty(self):
+		pending = self._pending
+		return pending['status'] is not None or pending['scores'] \
+			or pending['players'] or pending['teams']
+
+	# from the loop
+
+	def set_status(self, status):
+		if not self.ended:
+			self._pending['status'] = status
+
+	def end(self, status, win_team=None, score=None):
+		if self.ended:
+			return
+		self.ended = True
+		self._pending['status'] = status
+		if win_team:
+			self._pending['winner'] = win_team
+			if score:
+				self._pending['scores'][win_team] = score
+
+	def set_score(self, team, score):
+		self._pending['scores'][team] = score
+
+	def set_user_status(self, username, status):
+		self._pending['players'][username] = status
+
+	def add_player_to_team(self, username, team):
+		self._pending['teams'][username] = team
+
+	def take(self):
+		pending, self._pending = self._pending, self._empty()
+		return pending
+
+	# in a sync_to_async thread
+
+	def write(self, pending):
+		try:
+			self._write(pending)
+		except Exception:
+			# the teams created by the rolled back transaction
+			GameWriteBuffer.teams = {}
+			raise
+
+	def _write(self, pending):
+		with transaction.atomic():
+			if pending['teams'] or pending['scores'] or pending['winner']:
+				if self._load_game() is None:
+					logger.debug(f"game instance {self.game_id} is None")
+					pending['teams'], pending['scores'], pending['winner'] = {}, {}, None
+			self._write_teams(pending['teams'])
+			self._write_scores(pending['scores'])
+			if pending['status'] not in [None, *dict(GameInstance.STATUS_CHOICES)]:
+				logger.error(f"Invalid status for {self.game_id}: {pending['status']}")
+			elif pending['status']:
+				GameInstance.objects.filter(game_id=self.game_id) \
+					.exclude(status__in=['finished', 'aborted']) \
+					.update(status=pending['status'])
+			if pending['winner']:
+				game_instance = GameInstance.objects.get(pk=self.game_pk)
+				game_instance.set_winner(pending['winner'])
+			self._write_players(pending['players'])
+
+	def _load_game(self):
+		if self.game_pk is None:
+			self.game_pk = GameInstance.objects.filter(game_id=self.game_id) \
+				.values_list('pk', flat=True).first()
+		return self.game_pk
+
+	@classmethod
+	def _team_ids(cls, names):
+		missing = [name for name in names if name not in cls.teams]
+		if missing:
+			Team.objects.bulk_create([Team(name=name) for name in missing], ignore_conflicts=True)
+			cls.teams.update(Team.objects.filter(name__in=missing).values_list('name', 'pk'))
+		return {name: cls.teams[name] for name in names}
+
+	def _write_teams(self, teams):
+		if not teams:
+			return
+		team_ids = self._team_ids(set(teams.values()))
+		player_ids = dict(Player.objects.filter(username__in=teams).values_list('username', 'pk'))
+		GamePlayer.objects.bulk_create([
+			GamePlayer(game_id=self.game_pk, player_id=player_ids[username], team_id=team_ids[team])
+			for username, team in teams.items() if username in player_ids
+		], ignore_conflicts=True)
+
+	def _write_scores(self, scores):
+		if not scores:
+			return
+		team_ids = self._team_ids(set(scores))
+		existing = {game_score.team_id: game_score
+			for game_score in GameScore.objects.filter(game_id=self.game_pk, team_id__in=team_ids.values())}
+		updated, created = [], []
+		for team, score in scores.items():
+			game_score = existing.get(team_ids[team])
+			if game_score:
+				game_score.score = score
+				updated.append(game_score)
+			else:
+				created.append(GameScore(game_id=self.game_pk, team_id=team_ids[team], score=score))
+		if updated:
+			GameScore.objects.bulk_update(updated, ['score'])
+		if created:
+			GameScore.objects.bulk_create(created, ignore_conflicts=True)
+
+	def _write_players(self, players):
+		statuses = {}
+		for username, status in players.items():
+			if status not in dict(Player.STATUS_CHOICES):
+				logger.error(f"Invalid status for {username}: {status}")
+				continue
+			statuses.setdefault(status, []).append(username)
+		for status, usernames in statuses.items():
+			Player.objects.filter(username__in=usernames).update(status=status)
+			logger.info(f"{usernames}, new status : {status}")
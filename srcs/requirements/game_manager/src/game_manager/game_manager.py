@@ -1,12 +1,14 @@
 from django.conf import settings
 from .models import Player, GameInstance, PlayerGameHistory, GamePlayer, GameScore, WinRate, GameMode
 from .utils.logger import logger
+from .utils.cursor import encode_cursor
 from admin_manager.admin_manager import AdminManager
-from .utils.timer import Timer
+from .supervisor import GameSupervisor
 from django.apps import apps
 from django.db import connection
 from asgiref.sync import sync_to_async
 from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 import threading
 import asyncio
@@ -21,14 +23,8 @@ class Game_manager:
 		self.update_databases()
 		self._task = None
 		self._is_running_mutex = threading.Lock()
-		self._current_games = {}
-		self._current_games_mutex = threading.Lock()
-		self.status_timer = {
-			'waiting': 15,
-			'loading' : 15,
-			'in_progress': 3600,
-			'aborting': 15
-		}
+		self.supervisor = GameSupervisor.game_supervisor_instance
+		self.supervisor.on_timeout = self.abort_expired_game
 
 	def update_databases(self):
 		if apps.is_installed('game_manager') and 'game_manager_player' in connection.introspection.table_names():
@@ -43,43 +39,25 @@ class Game_manager:
 						and  game_instance.status != 'aborted':
 						game_instance.abort_game()
 
-	def add_new_game(self, game_id):
-		game = GameInstance.get_game(game_id)
-		if game.status and game.status not in ['finished', 'aborted']:
-			with self._current_games_mutex:
-				players_queryset = PlayerGameHistory.objects.filter(game=game)
-				logger.debug(f"Raw PlayerGameHistory queryset for game {game_id}: {players_queryset}")
-			
-				players_list = list(players_queryset.values_list('player__username', flat=True))
-				logger.debug(f"Player usernames for game {game_id}: {players_list}")
-	
-				self._current_games[game_id] = {
-					'status': game.status,
-					'latest_update_status': Timer(),
-					'players': players_list
-				}
-			
-	async def get_game_history(self, username):
-		player = await self.fetch_player(username)
-		history = await self.fetch_history(player)
-		if not history:
-			return {}
-		game_entries = await self.extract_game_ids(history)
+	async def get_game_history(self, username, limit=None, before=None):
+		"""
+		The games of the player, newest first: `limit` games after the
+		cursor `before` (all of them by default), and the cursor of the next
+		page, None at the last page.
+		"""
+		entries = await self.fetch_history_page(username, limit, before)
 		history_dict = {}
-		for game_date, game_id in game_entries:
-			game_data = await self.get_game_data(game_id)
-			if game_data:
-				game_data['self_team'] = ''
-				teams = game_data.get('teams')
-				if teams:
-					for team_name in teams:
-						for playername in teams[team_name]:
-							logger.debug(f"{playername} == {username}")
-							if playername == username:
-								game_data['self_team'] = team_name
-				date_key = game_date.strftime("%Y-%m-%d %H:%M:%S")
-				history_dict[date_key] = game_data
-		return history_dict
+		for game_date, pk, game_data in entries:
+			game_data['self_team'] = ''
+			for team_name, playernames in game_data['teams'].items():
+				if username in playernames:
+					game_data['self_team'] = team_name
+			date_key = timezone.localtime(game_date).strftime("%Y-%m-%d %H:%M:%S")
+			history_dict[date_key] = game_data
+		next_before = None
+		if limit and len(entries) == limit:
+			next_before = encode_cursor(*entries[-1][:2])
+		return history_dict, next_before
 
 	async def create_game(self, game_mode, modifiers, players_list, teams_list, ia_authorizes, special_id):
 		# pars game_mode
@@ -210,10 +188,10 @@ class Game_manager:
 			game_id, admin_id, game_mode, modifiers, players, teams_list, special_id)
 		if is_game_notified:
 			logger.debug(f'Game service {game_id} created with players: {players}')
-			AdminManager.admin_manager_instance.start_connections(game_id, admin_id, game_mode)
-			return True
-		else:
-			return False
+			if await AdminManager.admin_manager_instance.start_connections(game_id, admin_id, game_mode):
+				return True
+			await self.game_abort_notify(game_id, game_mode)
+		return False
 
 	async def disconnect_to_game(self, game_id, game_mode):
 		is_game_notified = await Game_manager.game_manager_instance.game_abort_notify(game_id, game_mode)
@@ -226,67 +204,17 @@ class Game_manager:
 
 	# LOOP
 
-	@sync_to_async	
-	def _set_current_game_status(self, game_id):
-		current_game = self._current_games[game_id]
-		game_instance = GameInstance.get_game(game_id)
-		if game_instance and game_instance.status\
-			and game_instance.status != 'finished' and game_instance.status != 'aborted':
-			if current_game['latest_update_status'].get_elapsed_time() \
-				>= self.status_timer[current_game['status']]:
-					if game_instance.status != self._current_games[game_id]['status']:
-						logger.debug(f"{current_game['latest_update_status'].get_elapsed_time()}s elapsed with status : {self._current_games[game_id]['status']}")
-						current_game['status'] = game_instance.status
-						current_game['latest_update_status'].reset()
-						return None, None
-					#elif self.game_instance.status != 'aborting':
-					#	logger.debug(f"{current_game['latest_update_status'].get_elapsed_time()}s aborting game... : {self._current_games[game_id]['status']}")
-					#	game_instance.aborting_game()
-					#	current_game['status'] = game_instance.status
-					#	current_game['latest_update_status'].reset()
-					#	return None, None
-					else:
-						logger.debug(f"{current_game['latest_update_status'].get_elapsed_time()}s abort game : {self._current_games[game_id]['status']}")
-						for player in current_game['players']:
-							player_instance = Player.get_player(player)
-							if player_instance:
-								player_instance.update_status('inactive')
-						game_instance.abort_game()
-						return game_id, game_instance.game_mode
-			else :
-				return None, None
-		else:
-			for player in current_game['players']:
-				player_instance = Player.get_player(player)
-				if player_instance:
-					player_instance.update_status('inactive')
-			return game_id, None
-
-	async def _game_manager_logic(self):
-		with self._current_games_mutex:
-			for game_id in self._current_games:
-				result = await self._set_current_game_status(game_id)
-				if result:
-					game_id, game_mode = result
-					if game_mode:
-						await self.game_abort_notify(game_id, game_mode)
-					if game_id:
-						del self._current_games[game_id]
-						break
-
-	async def _game_manager_loop(self):
-		logger.debug("game_manager loop started")
-		while True:
-			with self._is_running_mutex:
-				if not self._is_running:
-					break
-			await self._game_manager_logic()
-			await asyncio.sleep(1)
+	async def abort_expired_game(self, game_id, game_mode):
+		# called by the supervisor when the game stayed too long in a status
+		if await self.abort_running_game(game_id):
+			await self.game_abort_notify(game_id, game_mode)
+		AdminManager.admin_manager_instance.force_close(game_id)
 
 	async def start_game_manager_loop(self):
 		with self._is_running_mutex:
 			self._is_running = True
-		self._task = asyncio.create_task(self._game_manager_loop())
+		AdminManager.admin_manager_instance.bind(asyncio.get_running_loop())
+		self._task = asyncio.create_task(self.supervisor.run())
 		try:
 			await self._task
 		except asyncio.CancelledError:
@@ -306,10 +234,9 @@ class Game_manager:
 		if status:
 			ret = {'status': status}
 			if status in ['pending', 'waiting', 'loading', 'in_game']:
-				player_history = await self.fetch_history(await self.fetch_player(username))
-				game_id = await self.get_last_game_id(player_history)
-				if game_id:
-					game_data = await self.get_game_data(game_id)
+				last_games = await self.fetch_history_page(username, 1)
+				if last_games:
+					game_date, pk, game_data = last_games[0]
 					ret['game_mode'] = game_data['game_mode']
 					ret['game_id'] = game_data['game_id']
 					game_mode_data = settings.GAME_MODES.get(ret['game_mode'])
@@ -325,13 +252,6 @@ class Game_manager:
 
 	# db
 
-	@sync_to_async
-	def get_last_game_id(self, player_history):
-		if player_history:
-			latest_game = player_history[-1]
-			return latest_game.game.game_id
-		return None
-
 	async def create_new_game_instance(self, game_id, game_mode, modifiers, players):
 		game = await self.create_game_instance(game_id, game_mode, modifiers, players)
 		if game:
@@ -352,7 +272,8 @@ class Game_manager:
 	def create_game_instance(self, game_id, game_mode, modifiers, players):
 		with transaction.atomic():
 			game_instance = GameInstance.create_game(game_id, game_mode, modifiers, players)
-			Game_manager.game_manager_instance.add_new_game(game_id)
+			if game_instance:
+				self.supervisor.track_game(game_id, game_mode, players)
 			return game_instance
 		return None
 
@@ -375,6 +296,13 @@ class Game_manager:
 	def abord_game_instance(self, game):
 		with transaction.atomic():
 			game.abort_game()
+		self.supervisor.push_status(game.game_id, 'aborted')
+
+	@sync_to_async
+	def abort_running_game(self, game_id):
+		# a single query: the game may have ended meanwhile
+		return GameInstance.objects.filter(game_id=game_id)\
+			.exclude(status__in=['finished', 'aborted']).update(status='aborted') > 0
 
 	@sync_to_async
 	def create_player_instance(self, username):
@@ -400,55 +328,62 @@ class Game_manager:
 		return win_rate
 
 	@sync_to_async
-	def fetch_player(self, username):
-		return Player.objects.get(username=username)
-
-	@sync_to_async
-	def fetch_history(self, player):
-		history = list(PlayerGameHistory.objects.filter(player=player).order_by('game_date'))
-		if not history:
-			logger.warning(f"No history found for player {player.username}.")
-			return []
-		return history
-
-	
-	@sync_to_async
-	def extract_game_ids(self, history):
-		return [
-			(timezone.localtime(entry.game_date), entry.game.game_id) 
-			for entry in history
-		]
+	def fetch_history_page(self, username, limit=None, before=None):
+		# 3 queries whatever the number of games
+		history = PlayerGameHistory.objects.filter(player__username=username) \
+			.select_related('game__game_mode', 'game__winner').order_by('-game_date', '-pk')
+		if before:
+			# keyset: the games of the same date as the cursor are not skipped
+			game_date, pk = before
+			history = history.filter(Q(game_date__lt=game_date) | Q(game_date=game_date, pk__lt=pk))
+		if limit:
+			history = history[:limit]
+		history = list(history)
+		games = self.games_data([entry.game for entry in history])
+		return [(entry.game_date, entry.pk, games[entry.game_id]) for entry in history]
 
 	@sync_to_async
 	def get_game_data(self, game_id):
 		try:
-			game_instance = GameInstance.get_game(game_id)
+			game_instance = GameInstance.objects.select_related('game_mode', 'winner') \
+				.filter(game_id=game_id).first()
 			if not game_instance:
 				return None
-			game_players = GamePlayer.objects.filter(game=game_instance)
-			teams_distribution = {}
-			for player_entry in game_players:
-				if player_entry.team.name not in teams_distribution:
-					teams_distribution[player_entry.team.name] = []
-				username = player_entry.player.username
-				#nickname = player_entry.player.nickname
-				teams_distribution[player_entry.team.name].append(player_entry.player.username)
-			game_scores = GameScore.objects.filter(game=game_instance)
-			teams_scores = {score.team.name: score.score for score in game_scores}
-			game_data = {
+			game_data = self.games_data([game_instance])[game_instance.pk]
+			logger.debug(f"game_data = {game_data}")
+			return game_data
+		except Exception as e:
+			logger.error(f"Error fetching game data: {e}")
+			return None
+
+	def games_data(self, game_instances):
+		"""
+		The data of the games, their teams and scores read in one query each.
+		`game_instances` with their game_mode and winner.
+		"""
+		game_pks = [game_instance.pk for game_instance in game_instances]
+		teams_distribution = {game_pk: {} for game_pk in game_pks}
+		teams_scores = {game_pk: {} for game_pk in game_pks}
+		game_players = GamePlayer.objects.filter(game_id__in=game_pks).order_by('pk') \
+			.values_list('game_id', 'team__name', 'player__username')
+		for game_pk, team_name, username in game_players:
+			teams_distribution[game_pk].setdefault(team_name, []).append(username)
+		game_scores = GameScore.objects.filter(game_id__in=game_pks) \
+			.values_list('game_id', 'team__name', 'score')
+		for game_pk, team_name, score in game_scores:
+			teams_scores[game_pk][team_name] = score
+		return {
+			game_instance.pk: {
 				"game_id": game_instance.game_id,
 				"status": game_instance.status,
 				"winner": game_instance.winner.name if game_instance.winner else None,
 				"game_mode": game_instance.game_mode.name,
 				"game_date": game_instance.game_date.isoformat(),
-				"teams": teams_distribution,
-				"scores": teams_scores,
+				"teams": teams_distribution[game_instance.pk],
+				"scores": teams_scores[game_instance.pk],
 			}
-			logger.debug(f"game_data = {game_data}")
-			return game_data
-		except Exception as e:
-			logger.error(f"Error fetching game data: {e}")
-			return None
+			for game_instance in game_instances
+		}
 	
 	@sync_to_async
 	def copy_data(self, data):
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import F
 from django.db import IntegrityError, DatabaseError
 from django.core.exceptions import ValidationError,ObjectDoesNotExist
 from django.utils import timezone
@@ -91,6 +92,10 @@ class PlayerGameHistory(models.Model):
 
 	class Meta:
 		unique_together = ('player', 'game')
+		indexes = [
+			# history pages of a player, newest first ((game_date, id) cursor)
+			models.Index(fields=['player', 'game_date', 'id'], include=['game'], name='history_player_date_idx'),
+		]
 
 class Team(models.Model):
 	name = models.CharField(max_length=42)
@@ -148,31 +153,26 @@ class GameInstance(models.Model):
 			self.save()
 	
 			# Récupère tous les joueurs des équipes
-			teams = GamePlayer.objects.filter(game=self)
+			teams = GamePlayer.objects.filter(game=self).values_list('player_id', 'team_id')
 		
 			# Séparer les joueurs en fonction de leur équipe
-			winning_players = teams.filter(team=self.winner)
-			losing_players = teams.exclude(team=self.winner)
+			winning_players = [player for player, team in teams if team == self.winner_id]
+			losing_players = [player for player, team in teams if team != self.winner_id]
 		
 			# Met à jour les win_rate des joueurs gagnants et perdants
-			for player_game in winning_players:
-				self.update_win_rate(player_game.player, True)  # Gagnant
-			for player_game in losing_players:
-				self.update_win_rate(player_game.player, False)  # Perdant
-
-	def update_win_rate(self, player, win):
-		game_mode = self.game_mode
-
-		# Récupérer ou créer l'instance de WinRate pour le joueur et le mode de jeu
-		win_rate_instance, created = WinRate.objects.get_or_create(player=player, game_mode=game_mode)
-
-		# Mettre à jour le nombre de victoires ou de défaites
-		if win_rate_instance:
-			if win:
-				win_rate_instance.wins += 1
-			else:
-				win_rate_instance.losses += 1
-			win_rate_instance.save()
+			self.update_win_rates(winning_players, losing_players)
+
+	def update_win_rates(self, winning_players, losing_players):
+		# Crée les WinRate manquants, puis une requête par résultat
+		win_rates = WinRate.objects.filter(game_mode_id=self.game_mode_id)
+		existing = set(win_rates.filter(player_id__in=winning_players + losing_players)
+			.values_list('player_id', flat=True))
+		WinRate.objects.bulk_create([WinRate(player_id=player, game_mode_id=self.game_mode_id)
+			for player in winning_players + losing_players if player not in existing])
+		if winning_players:
+			win_rates.filter(player_id__in=winning_players).update(wins=F('wins') + 1)
+		if losing_players:
+			win_rates.filter(player_id__in=losing_players).update(losses=F('losses') + 1)
 
 	def abort_game(self):
 		self.status = 'aborted'
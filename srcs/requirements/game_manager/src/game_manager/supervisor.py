@@ -0,0 +1,163 @@
+from .models import Player
+from .utils.logger import logger
+from asgiref.sync import sync_to_async
+from django.db import transaction
+import asyncio
+import heapq
+import threading
+
+class GameSupervisor:
+	"""
+	Aborts the games stuck in a status for longer than its timeout.
+
+	The statuses are pushed (push_status, from AdminManager and from any
+	thread) instead of read from the database: each game has a deadline in a
+	heap and the supervisor only wakes up for the next one, or for an event.
+	The players of the games that end are set inactive in one batch. The
+	events pushed before the loop runs are queued until it does.
+
+	Everything but push_status and track_game runs in the game_manager
+	loop thread.
+	"""
+	game_supervisor_instance = None
+
+	def __init__(self):
+		self.status_timer = {
+			'waiting': 15,
+			'loading' : 15,
+			'in_progress': 3600,
+			'aborting': 15
+		}
+		self.on_timeout = None
+		self._loop = None
+		self._wakeup = None
+		self._lock = threading.Lock()
+		self._early = []
+		self._games = {}
+		self._deadlines = []
+		self._pending_players = {}
+		self.stats = {
+			'events': 0,
+			'timeouts': 0,
+			'player_batches': 0,
+		}
+
+	# from any thread
+
+	def track_game(self, game_id, game_mode, players):
+		self._call(self._track, game_id, game_mode, list(players))
+
+	def push_status(self, game_id, status):
+		self._call(self._status, game_id, status)
+
+	def _call(self, callback, *args):
+		with self._lock:
+			if self._loop is None or self._loop.is_closed():
+				logger.debug(f"game supervisor is not running yet, {callback.__name__}{args} queued")
+				self._early.append((callback, args))
+				return
+			self._loop.call_soon_threadsafe(callback, *args)
+
+	# events
+
+	def _track(self, game_id, game_mode, players):
+		self._games[game_id] = {
+			'status': 'waiting',
+			'game_mode': game_mode,
+			'players': players,
+			'deadline': None
+		}
+		self._schedule(game_id)
+
+	def _status(self, game_id, status):
+		self.stats['events'] += 1
+		game = self._games.get(game_id)
+		if game is None:
+			return
+		if status in ['finished', 'aborted']:
+			self._release(game_id)
+		elif status != game['status']:
+			game['status'] = status
+			self._schedule(game_id)
+
+	def _schedule(self, game_id):
+		game = self._games[game_id]
+		timeout = self.status_timer.get(game['status'])
+		game['deadline'] = None if timeout is None else self._loop.time() + timeout
+		if game['deadline'] is not None:
+			heapq.heappush(self._deadlines, (game['deadline'], game_id))
+			self._wakeup.set()
+		if len(self._deadlines) > 2 * len(self._games) + 64:
+			# drop the deadlines replaced since
+			self._deadlines = [(deadline, game_id) for deadline, game_id in self._deadlines
+				if game_id in self._games and self._games[game_id]['deadline'] == deadline]
+			heapq.heapify(self._deadlines)
+
+	def _release(self, game_id):
+		game = self._games.pop(game_id)
+		for username in game['players']:
+			self._pending_players[username] = 'inactive'
+		self._wakeup.set()
+		return game
+
+	# LOOP
+
+	async def run(self):
+		self._wakeup = asyncio.Event()
+		with self._lock:
+			self._loop = asyncio.get_running_loop()
+			early, self._early = self._early, []
+		for callback, args in early:
+			callback(*args)
+		logger.debug("game supervisor started")
+		while True:
+			self._wakeup.clear()
+			await self._expire()
+			await self._flush_players()
+			timeout = None
+			if self._deadlines:
+				timeout = max(self._deadlines[0][0] - self._loop.time(), 0)
+			try:
+				await asyncio.wait_for(self._wakeup.wait(), timeout)
+			except asyncio.TimeoutError:
+				pass
+
+	async def _expire(self):
+		now = self._loop.time()
+		while self._deadlines and self._deadlines[0][0] <= now:
+			deadline, game_id = heapq.heappop(self._deadlines)
+			game = self._games.get(game_id)
+			if game is None or game['deadline'] != deadline:
+				# the game ended or changed status since
+				continue
+			self.stats['timeouts'] += 1
+			logger.debug(f"{self.status_timer[game['status']]}s elapsed with status : {game['status']}, abort game {game_id}")
+			self._release(game_id)
+			if self.on_timeout:
+				try:
+					await self.on_timeout(game_id, game['game_mode'])
+				except Exception as e:
+					logger.error(f"Error aborting game {game_id}: {e}")
+
+	async def _flush_players(self):
+		if not self._pending_players:
+			return
+		pending, self._pending_players = self._pending_players, {}
+		self.stats['player_batches'] += 1
+		try:
+			await self.update_players_status(pending)
+		except Exception as e:
+			logger.error(f"Error updating the status of {list(pending)}: {e}")
+
+	@sync_to_async
+	def update_players_status(self, pending):
+		statuses = {}
+		for username, status in pending.items():
+			statuses.setdefault(status, []).append(username)
+		with transaction.atomic():
+			for status, usernames in statuses.items():
+				Player.objects.filter(username__in=usernames).update(status=status)
+				logger.info(f"{usernames}, new status : {status}")
+
+if GameSupervisor.game_supervisor_instance is None:
+	GameSupervisor.game_supervisor_instance = GameSupervisor()
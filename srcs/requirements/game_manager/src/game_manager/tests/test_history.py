@@ -0,0 +1,55 @@
+from datetime import timedelta
+from asgiref.sync import async_to_sync
+from django.test import TestCase
+from django.utils import timezone
+from game_manager.models import GameInstance, GameMode, Player, PlayerGameHistory
+from game_manager.game_manager import Game_manager
+from game_manager.utils.cursor import encode_cursor, decode_cursor
+
+class HistoryPaginationTests(TestCase):
+	def setUp(self):
+		mode = GameMode.objects.create(name='PONG_CLASSIC')
+		player = Player.objects.create(username='p0')
+		# bulk_create: GameInstance.save checks the players of the game
+		games = GameInstance.objects.bulk_create([
+			GameInstance(game_id=f'game{i}', status='finished', game_mode=mode) for i in range(7)
+		])
+		now = timezone.now()
+		# games 2 to 5 share their date
+		dates = [now, now - timedelta(minutes=1)] + [now - timedelta(minutes=2)] * 4 + [now - timedelta(minutes=3)]
+		PlayerGameHistory.objects.bulk_create([
+			PlayerGameHistory(player=player, game=game, game_date=date) for game, date in zip(games, dates)
+		])
+		self.game_manager = Game_manager.game_manager_instance
+
+	def pages(self, limit):
+		pages, before = [], None
+		while True:
+			entries = async_to_sync(self.game_manager.fetch_history_page)('p0', limit, before)
+			pages.append([game_data['game_id'] for game_date, pk, game_data in entries])
+			history, next_before = async_to_sync(self.game_manager.get_game_history)('p0', limit, before)
+			if next_before is None:
+				return pages
+			before = decode_cursor(next_before)
+
+	def test_pages_do_not_skip_ties(self):
+		pages = self.pages(3)
+		self.assertEqual(pages, [
+			['game0', 'game1', 'game5'],
+			['game4', 'game3', 'game2'],
+			['game6'],
+		])
+
+	def test_whole_history_without_limit(self):
+		history, next_before = async_to_sync(self.game_manager.get_game_history)('p0')
+		self.assertIsNone(next_before)
+		self.assertEqual(sum(self.pages(2), []), sum(self.pages(100), []))
+
+	def test_cursor(self):
+		date = timezone.now()
+		token = encode_cursor(date, 12)
+		self.assertNotIn('+', token)
+		self.assertEqual(decode_cursor(token), (date, 12))
+		for token in ('', 'nope', encode_cursor(date, 12)[:-4]):
+			with self.assertRaises(ValueError):
+				decode_cursor(token)
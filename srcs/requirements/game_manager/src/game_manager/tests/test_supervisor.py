@@ -0,0 +1,68 @@
+import asyncio
+from unittest import TestCase
+from game_manager.supervisor import GameSupervisor
+
+class Supervisor(GameSupervisor):
+	def __init__(self):
+		super().__init__()
+		self.status_timer = {'waiting': 0.05, 'loading': 0.05, 'in_progress': 0.2}
+		self.aborted = []
+		self.players = []
+		self.on_timeout = self.abort
+
+	async def abort(self, game_id, game_mode):
+		self.aborted.append(game_id)
+
+	async def update_players_status(self, pending):
+		# no database here
+		self.players.append(pending)
+
+def run(supervisor, events, duration):
+	"""
+	Runs the supervisor for `duration` seconds, `events` being (delay,
+	method, args) called from another thread as AdminManager does.
+	"""
+	async def main():
+		loop = asyncio.get_running_loop()
+		task = asyncio.create_task(supervisor.run())
+		for delay, method, args in events:
+			loop.call_later(delay, lambda method=method, args=args: loop.run_in_executor(None, method, *args))
+		await asyncio.sleep(duration)
+		task.cancel()
+	asyncio.run(main())
+
+class GameSupervisorTests(TestCase):
+	def test_stuck_game_aborted(self):
+		supervisor = Supervisor()
+		run(supervisor, [(0, supervisor.track_game, ('A', 'PONG_CLASSIC', ['p0', 'p1']))], 0.2)
+		self.assertEqual(supervisor.aborted, ['A'])
+		self.assertEqual(supervisor.players, [{'p0': 'inactive', 'p1': 'inactive'}])
+		self.assertEqual(supervisor._games, {})
+
+	def test_status_event_moves_the_deadline(self):
+		supervisor = Supervisor()
+		run(supervisor, [
+			(0, supervisor.track_game, ('A', 'PONG_CLASSIC', ['p0'])),
+			(0.03, supervisor.push_status, ('A', 'in_progress')),
+		], 0.15)
+		# in_progress has 0.2s from 0.03
+		self.assertEqual(supervisor.aborted, [])
+		self.assertEqual(supervisor._games['A']['status'], 'in_progress')
+
+	def test_finished_game_released(self):
+		supervisor = Supervisor()
+		run(supervisor, [
+			(0, supervisor.track_game, ('A', 'PONG_CLASSIC', ['p0'])),
+			(0.01, supervisor.push_status, ('A', 'finished')),
+		], 0.15)
+		self.assertEqual(supervisor.aborted, [])
+		self.assertEqual(supervisor.players, [{'p0': 'inactive'}])
+
+	def test_events_before_the_loop_kept(self):
+		supervisor = Supervisor()
+		supervisor.track_game('A', 'PONG_CLASSIC', [])
+		supervisor.track_game('B', 'PONG_CLASSIC', [])
+		supervisor.push_status('B', 'in_progress')
+		run(supervisor, [], 0.15)
+		self.assertEqual(supervisor.aborted, ['A'])
+		self.assertEqual(supervisor._games['B']['status'], 'in_progress')
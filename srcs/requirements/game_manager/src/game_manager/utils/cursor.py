@@ -0,0 +1,27 @@
+"""
+Opaque cursors of the history pages: the (game_date, pk) of the last entry
+of a page, the next page holding the entries strictly before it in the
+(-game_date, -pk) order.
+"""
+from django.utils.dateparse import parse_datetime
+from datetime import timezone
+import base64
+
+def encode_cursor(game_date, pk):
+	value = f"{game_date.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')}|{pk}"
+	return base64.urlsafe_b64encode(value.encode()).decode().rstrip('=')
+
+def decode_cursor(token):
+	"""
+	(game_date, pk) of a cursor, raises ValueError when it is not one.
+	"""
+	try:
+		value = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+		game_date, pk = value.split('|')
+		game_date = parse_datetime(game_date)
+		pk = int(pk)
+	except (ValueError, UnicodeDecodeError):
+		raise ValueError(f"invalid cursor {token}")
+	if game_date is None or game_date.tzinfo is None:
+		raise ValueError(f"invalid cursor {token}")
+	return game_date, pk
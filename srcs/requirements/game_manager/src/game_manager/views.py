@@ -3,6 +3,7 @@ from django.conf import settings
 from django.http import JsonResponse
 from django.core.exceptions import ObjectDoesNotExist
 from .utils.decorators import auth_required, async_csrf_exempt
+from .utils.cursor import decode_cursor
 from .game_manager import Game_manager
 from matchmaking.matchmaking import Matchmaking
 from .utils.logger import logger
@@ -10,6 +11,8 @@ from rest_framework import status
 import asyncio
 import json
 
+MAX_HISTORY_PAGE = 100 # games
+
 @async_csrf_exempt
 @auth_required
 async def get_history(request, username=None):
@@ -18,10 +21,21 @@ async def get_history(request, username=None):
 	game_manager_instance = Game_manager.game_manager_instance
 	if game_manager_instance is None:
 		return JsonResponse({"message": "Game Manager is not initialised"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+	# cursor pagination: ?limit=<games>&before=<next_before of the previous page>
+	try:
+		limit = request.GET.get('limit')
+		limit = min(int(limit), MAX_HISTORY_PAGE) if limit else None
+		before = request.GET.get('before')
+		before = decode_cursor(before) if before else None
+		if limit is not None and limit < 1:
+			raise ValueError
+	except ValueError:
+		return JsonResponse({"error": "Invalid limit or before"}, status=status.HTTP_400_BAD_REQUEST)
 	try :
 		await game_manager_instance.create_new_player_instance(username)
-		game_history = await game_manager_instance.get_game_history(username)
-		return JsonResponse({'status': 'success', 'game_history': game_history, 'username': username}, status=status.HTTP_200_OK)
+		game_history, next_before = await game_manager_instance.get_game_history(username, limit, before)
+		return JsonResponse({'status': 'success', 'game_history': game_history, 'next_before': next_before,
+			'username': username}, status=status.HTTP_200_OK)
 	except Exception as e:
 		logger.error(f"Error in get_game_history for user {username}: {str(e)}")
 		return JsonResponse({"message": "GameManager error occurred"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
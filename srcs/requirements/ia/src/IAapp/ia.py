@@ -2,9 +2,23 @@
 import json
 import time
 from .logger import logger
+from .wire import decode_frame
+from .predictor import Predictor
+
+# secondes entre deux décisions, selon la difficulté
+DIFFICULTIES = {
+	'easy': 1.0,
+	'normal': 0.3,
+	'hard': 0.1,
+}
+MIN_DECISION_DELAY = 0.005
+PADDLE_DIRECTIONS = {1: 1, 2: -1, 3: 0, 4: 0} # commande: direction de la raquette
 
 class IA:
-	def __init__(self, ia_id):
+	def __init__(self, ia_id, difficulty='normal', clock=time.time):
+		# horloge des décisions (le temps du jeu pour selfplay.py)
+		self.clock = clock
+
 		# info sur la balle
 		self.ball_pos = {'x': 0, 'y': 0, 'z': 1}
 		self.paddle_pos = {'p1': 0.0, 'p2': 0.0}
@@ -15,19 +29,21 @@ class IA:
 
 		# prediction et position optimale du paddle
 		self.predicted_y = 0
+		self.predicted_time = 0
+		self.predictor = None
 		self.optimal_paddle_position = 0
 
 		# info sur joueur droit ou gauche
-		self.paddle_hit = False
 		self.player = 'AI'
 
-		# delai de 1 seconde a respecter
-		self.last_message_time = 0
-		self.message_cooldown = 1 # 1 seconde de délai
-		self.last_padel_contact = 0
+		self.time_reach_target = self.clock()
 
-		self.time_reach_target = time.time()
-		self.time_start = time.time()
+		# flux de la balle (`?ball=1`): décisions de decide(), raquette estimée
+		self.decision_interval = DIFFICULTIES.get(difficulty, DIFFICULTIES['normal'])
+		self.playing = False
+		self.paddle_y = 0.0
+		self.paddle_velocity = 0.0
+		self.paddle_since = self.clock()
 
 		# Constantes du terrain
 		self.paddle_speed = 0
@@ -67,6 +83,8 @@ class IA:
   
 		self.PADDLE_MAX_Y = self.COURT_HEIGHT - self.PADDLE_HEIGHT / 2
 		self.PADDLE_MIN_Y = -self.PADDLE_MAX_Y
+
+		self.predictor = Predictor(data, self.player == 'p1')
   
 		logger.debug(f"Base : PADDLE_MAX_Y :{self.PADDLE_MAX_Y} et PADDLE_MIN_Y{self.PADDLE_MIN_Y}\npos paddle x = {self.paddle_x}\n court height = {self.COURT_HEIGHT}")
   
@@ -82,38 +100,15 @@ class IA:
 
 	def predict_ball_intersection(self):
 		"""
-		Prédit le point d'intersection de la balle avec le plan de la raquette
-		Retourne la position y prédite ou None si la balle s'éloigne
+		Prédit le point d'intersection de la balle avec le plan de la raquette,
+		rebonds et renvoi de l'adversaire compris (predictor.py)
+		Retourne la position y prédite, 0 si la balle ne revient pas
 		"""
-		if self.ball_velocity['x'] == 0:
+		prediction = self.predictor.predict(self.ball_pos, self.ball_velocity) if self.predictor else None
+		if prediction is None:
+			self.predicted_time = 0
 			return 0
-		if (self.player == 'p1'):
-			# Si la balle s'éloigne de notre raquette
-			if self.ball_velocity['x'] > 0:
-				return 0
-			# Position x de notre raquette
-		else:
-			if self.ball_velocity['x'] < 0:
-				return 0
-
-		# Calcul du temps jusqu'à l'intersection
-		distance_to_paddle = self.paddle_x - self.ball_pos['x']
-		time_to_intersection = distance_to_paddle / self.ball_velocity['x']
-
-		# Calcul de la position y prédite
-		self.predicted_y = self.ball_pos['y'] + (self.ball_velocity['y'] * time_to_intersection)
-
-		# Prise en compte des rebonds
-		bounces = 0
-		while abs(self.predicted_y) > self.COURT_HEIGHT:  # Rebonds sur les murs (32 ou -32)
-			if self.predicted_y > self.COURT_HEIGHT:
-				self.predicted_y = 2 * self.COURT_HEIGHT - self.predicted_y  # Rebond sur le mur supérieur
-			elif self.predicted_y < -self.COURT_HEIGHT:
-				self.predicted_y = -2 * self.COURT_HEIGHT - self.predicted_y  # Rebond sur le mur inférieur
-			bounces += 1
-			if bounces > 10:  # Limite de sécurité pour éviter une boucle infinie
-				break
-
+		self.predicted_y, self.predicted_time = prediction
 		return self.predicted_y
 
 	def get_optimal_paddle_position(self, predicted_y):
@@ -128,6 +123,31 @@ class IA:
 
 		return self.optimal_paddle_position
 
+	def own_paddle(self, now):
+		"""
+		Position estimée de notre raquette: la dernière reçue, et nos commandes depuis
+		"""
+		y = self.paddle_y + self.paddle_velocity * (now - self.paddle_since)
+		return max(self.PADDLE_MIN_Y, min(self.PADDLE_MAX_Y, y))
+
+	def decide(self, ws):
+		"""
+		Décision avec le flux de la balle, appelée par l'agent (run_ia.py)
+		Retourne le délai avant la prochaine décision
+		"""
+		if not self.playing:
+			return self.decision_interval
+		now = self.clock()
+		position = self.own_paddle(now)
+		self.predicted_y = self.predict_ball_intersection()
+		self.optimal_paddle_position = self.get_optimal_paddle_position(self.predicted_y)
+		self.time_reach_target = self.time_to_reach_target(position, self.optimal_paddle_position)
+		self.ft_move_by_timer(now, self.time_reach_target, self.optimal_paddle_position, position, ws)
+		if self.is_moving_up or self.is_moving_down:
+			# revenir pour s'arrêter sur la cible
+			return max(min(self.decision_interval, self.time_reach_target), MIN_DECISION_DELAY)
+		return self.decision_interval
+
 	def ft_move_by_timer(self, timer, timer_to_reach, target, pos_actuel, ws):
 		""" Deplace le paddle a la position souhaite (target) tout en prenant en compte le temps pour savoir a quelle moment s'arreter de monter
 
@@ -140,7 +160,7 @@ class IA:
 		"""	
 		TOLERANCE = 0.5
 		if (pos_actuel + TOLERANCE < target):
-			if (timer_to_reach < time.time() - timer):
+			if (timer_to_reach < self.clock() - timer):
 				if self.is_moving_up:
 					self.send_command(ws, 3)  # Arrêter de monter
 					self.is_moving_up = False
@@ -152,7 +172,7 @@ class IA:
 				self.is_moving_up = True
 
 		elif (pos_actuel - TOLERANCE > target):
-			if (timer_to_reach < time.time() - timer):
+			if (timer_to_reach < self.clock() - timer):
 				if self.is_moving_down:
 					self.send_command(ws, 4)
 					self.is_moving_down = False
@@ -173,7 +193,11 @@ class IA:
 		return
 		
 	def on_message(self, ws, message):
-		data = json.loads(message)
+		# game updates are binary frames, the other messages JSON
+		if isinstance(message, bytes):
+			data = decode_frame(message)
+		else:
+			data = json.loads(message)
 		if data['type'] == 'waiting_room':
 			logger.debug("En attente d'un adversaire...")
 		elif data['type'] == 'export_data':
@@ -191,51 +215,34 @@ class IA:
 		elif data['type'] == 'export_data':
 			game_id = data['game_id']
 			logger.debug("Jeu créé! ID du jeu :", game_id)
-		elif data['type'] == 'padel_contact':
-			current_time = time.time()
-			# if data[QUETRU] != self.player:
-			# else:
-			# self.optimal_paddle_position = 0
-			# self.time_start = time.time()
-			# self.ft_move_by_timer(self.time_start, self.time_reach_target, self.optimal_paddle_position, self.paddle_pos[self.player], ws)
-			if current_time - self.last_padel_contact > self.message_cooldown:
-				self.last_padel_contact = current_time
-				logger.debug(f"Contact avec la raquette! {data}")
-				self.paddle_hit = True
-				self.ball_pos = data['bp']
+		elif data['type'] == 'tr':
+			# mouvement de la balle: contact, rebond, point ou échantillon
+			# (le flux `?ball=1` remplace les gu et padel_contact)
+			self.ball_pos = data['bp']
+			self.ball_velocity = data['bv']
+			if self.player in data['pp']:
 				self.paddle_pos = data['pp']
-				self.ball_velocity = data['bs']
-				self.predicted_y = self.predict_ball_intersection()
-				self.optimal_paddle_position = self.get_optimal_paddle_position(self.predicted_y)
-				self.time_reach_target = self.time_to_reach_target(self.paddle_pos[self.player], self.optimal_paddle_position)
-				self.time_start = time.time()
-				self.ft_move_by_timer(self.time_start, self.time_reach_target, self.optimal_paddle_position, self.paddle_pos[self.player], ws)
+				self.paddle_y = data['pp'][self.player]
+				self.paddle_velocity = data['pv'][self.player]
+				self.paddle_since = self.clock()
 		elif data['type'] == 'game_start':
 			logger.debug("Le jeu a commencé!")
-		elif data['type'] == 'gu':
-			current_time = time.time()
-			if current_time - self.last_message_time > self.message_cooldown:
-				self.last_message_time = current_time
-				self.ball_pos = data['bp']
-				self.paddle_pos = data['pp']
-				if not self.paddle_hit:
-					self.ball_velocity = data['bs']
-					self.predicted_y = self.predict_ball_intersection()
-					self.optimal_paddle_position = self.get_optimal_paddle_position(self.predicted_y)
-					self.time_reach_target = self.time_to_reach_target(self.paddle_pos[self.player], self.optimal_paddle_position)
-					self.time_start = time.time()
-			self.ft_move_by_timer(self.time_start, self.time_reach_target, self.optimal_paddle_position, self.paddle_pos[self.player], ws)
+			self.playing = True
 		elif data['type'] == 'scored':
 			logger.debug(data['msg'])
 			# Réinitialiser les données de prédiction après un point
 			self.ball_velocity = {'x': 0, 'y': 0}
 			self.optimal_paddle_position = 0
-			self.paddle_hit = False
 		elif data['type'] == 'game_end':
 			logger.debug(f"Jeu terminé. Raison: {data['reason']}")
+			self.playing = False
 			ws.close()
 
 	def send_command(self, ws, command):
+		now = self.clock()
+		self.paddle_y = self.own_paddle(now)
+		self.paddle_since = now
+		self.paddle_velocity = PADDLE_DIRECTIONS.get(command, 0) * self.paddle_speed
 		ws.send(json.dumps({
 			'type': 'move',
 			'input': command
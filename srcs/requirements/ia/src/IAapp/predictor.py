@@ -0,0 +1,107 @@
+# predictor.py
+"""
+Where and when the ball reaches the padel of the AI, in constant time.
+
+The ball moves in a straight line and bounces off the walls: its y on the
+plane of the padel is folded in closed form (fold) instead of bounce by
+bounce. A ball going away is followed to the padel of the opponent, returned
+as by Ball.updateSpeedAndDir (pong_game/game/ball.py) on the face of a still
+padel, then folded again up to our plane: two legs at most.
+
+The planes are those of the ball's center: the faces of the padels and the
+walls, less the radius of the ball. The results are cached on the ball state
+rounded to QUANTUM, which the successive frames of a straight line often
+share once rounded.
+"""
+import functools
+import math
+
+QUANTUM = 1 / 16 # rounding of the positions and speeds in the cache keys
+CACHE_SIZE = 4096
+MAX_SPEED = 2500 # speed.x cap of Ball.updateSpeedAndDir
+
+def fold(y, wall):
+	"""
+	Position and direction (1: the same, -1: reversed) at `y` of a point
+	moving freely between -wall and wall.
+	"""
+	span = 2 * wall
+	u = (y + wall) % (2 * span)
+	if u <= span:
+		return u - wall, 1
+	return 3 * wall - u, -1
+
+def speed_from_velocity(vx, vy):
+	# inverse of Ball.normalize_speed: the velocity is (sx², sy²) / |speed|
+	vx, vy = abs(vx), abs(vy)
+	total = vx + vy
+	return math.sqrt(vx * total), math.sqrt(vy * total)
+
+def velocity_from_speed(sx, sy):
+	norm = math.hypot(sx, sy)
+	if norm == 0:
+		return 0.0, 0.0
+	return sx * sx / norm, sy * sy / norm
+
+def front_contact(sx, sy, base_x, base_y):
+	"""
+	Speed after a contact with the face of a still padel.
+	"""
+	sx = min(sx + base_x / 6, MAX_SPEED)
+	step = base_y / 4
+	if sy > base_y:
+		sy = max(sy - step, base_y - step)
+	elif sy < base_y:
+		sy = min(sy + step, base_y + 2 * step)
+	return sx, sy
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def intercept(x, y, vx, vy, plane, opposite, wall, base_x, base_y):
+	"""
+	(y, seconds) of the ball center on the plane x = `plane`, through the
+	plane x = `opposite` if the ball goes away. None if it does not move.
+	"""
+	if vx == 0:
+		return None
+	time = 0.0
+	if (plane - x) * vx < 0:
+		to_opposite = (opposite - x) / vx
+		if to_opposite > 0:
+			y, direction = fold(y + vy * to_opposite, wall)
+			sx, sy = front_contact(*speed_from_velocity(vx, vy), base_x, base_y)
+			nx, ny = velocity_from_speed(sx, sy)
+			vx = -math.copysign(nx, vx)
+			vy = math.copysign(ny, vy) * direction
+			time, x = to_opposite, opposite
+		else:
+			# beyond the padel of the opponent: it scores
+			return None
+	to_plane = max((plane - x) / vx, 0.0)
+	y, _ = fold(y + vy * to_plane, wall)
+	return y, time + to_plane
+
+def quantize(value):
+	return round(value / QUANTUM) * QUANTUM
+
+class Predictor:
+	def __init__(self, data, left):
+		"""
+		`data`: the export_data of the game, `left`: side of the AI.
+		"""
+		ball = data['ball']
+		padel = data['padel']
+		rad = ball['rad']
+		face = abs(padel['pos']['x']) - padel['size']['x'] / 2 - rad
+		self.plane = -face if left else face
+		self.opposite = -self.plane
+		self.wall = data['arena']['size']['y'] / 2 - rad
+		self.base = (ball['spd']['x'], ball['spd']['y'])
+
+	def predict(self, ball_pos, ball_velocity):
+		"""
+		(y, seconds) of the next arrival of the ball on our plane, None if
+		it is not coming back.
+		"""
+		return intercept(quantize(ball_pos['x']), quantize(ball_pos['y']),
+			quantize(ball_velocity['x']), quantize(ball_velocity['y']),
+			self.plane, self.opposite, self.wall, *self.base)
@@ -1,25 +1,77 @@
 # run_ia.py
+import asyncio
+import websockets
 from .ia import IA
-import websocket
 from .logger import logger
 
-def run_ia(data):
-    game_id = data['game_id']
-    ai_id = data['ai_id']['private']
-    ai_pid = data['ai_id']['public']
-    host = 'pong'  # Ou l'adresse IP de votre serveur
-    port = '8000'       # Changez le port si nécessaire
-    websocket_url = f"ws://{host}:{port}/ws/pong/{game_id}/{ai_id}/"
-    logger.debug(f"WS URL : {websocket_url}")
-    
-    ia = IA(ai_pid)
-    
-
-
-    ws = websocket.WebSocketApp(websocket_url,
-                                on_open=ia.on_open,
-                                on_message=ia.on_message,
-                                on_error=ia.on_error,
-                                on_close=ia.on_close)
-    
-    ws.run_forever()
+HOST = 'pong' # Ou l'adresse IP de votre serveur
+PORT = '8000' # Changez le port si nécessaire
+OPEN_TIMEOUT = 10 # seconds
+AGENT_IDLE = 900 # seconds without a message before the AI leaves
+
+class AgentSocket:
+	"""
+	The socket IA.on_message sends to: its messages are sent by the agent
+	once the message received is handled.
+	"""
+	def __init__(self):
+		self.outgoing = []
+		self.closing = False
+
+	def send(self, message):
+		self.outgoing.append(message)
+
+	def close(self):
+		self.closing = True
+
+async def run_ia(data):
+	"""
+	Plays the game of `data` (the body of create_ia, with an optional
+	`difficulty`) until its end, as a task of the loop of the runtime
+	(runtime.py).
+
+	The AI subscribes to the ball stream of the game (`?ball=1`): an event
+	when the motion of the ball changes and a sample twice a second, instead
+	of the 40 states a second. It decides on its own timer (IA.decide), as
+	often as its difficulty allows.
+	"""
+	game_id = data['game_id']
+	ai_id = data['ai_id']['private']
+	ai_pid = data['ai_id']['public']
+	websocket_url = f"ws://{HOST}:{PORT}/ws/pong/{game_id}/{ai_id}/?format=binary&ball=1"
+	logger.debug(f"WS URL : {websocket_url}")
+
+	ia = IA(ai_pid, data.get('difficulty', 'normal'))
+	socket = AgentSocket()
+	loop = asyncio.get_running_loop()
+	async with websockets.connect(websocket_url, open_timeout=OPEN_TIMEOUT) as ws:
+		ia.on_open(socket)
+		last_message = next_decision = loop.time()
+		try:
+			while not socket.closing:
+				now = loop.time()
+				if now >= next_decision:
+					next_decision = now + ia.decide(socket)
+					await send_outgoing(ws, socket)
+					continue
+				if now - last_message > AGENT_IDLE:
+					logger.warning(f"IA {ai_pid}: nothing from {game_id} for {AGENT_IDLE}s, leaving")
+					break
+				try:
+					message = await asyncio.wait_for(ws.recv(), next_decision - now)
+				except asyncio.TimeoutError:
+					continue
+				last_message = loop.time()
+				try:
+					ia.on_message(socket, message)
+				except Exception as e:
+					ia.on_error(socket, e)
+				await send_outgoing(ws, socket)
+		except websockets.ConnectionClosed:
+			pass
+	ia.on_close(socket, ws.close_code, ws.close_reason)
+
+async def send_outgoing(ws, socket):
+	for outgoing in socket.outgoing:
+		await ws.send(outgoing)
+	socket.outgoing.clear()
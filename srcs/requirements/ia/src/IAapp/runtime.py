@@ -0,0 +1,65 @@
+# runtime.py
+"""
+The AIs of the service, hosted on a single asyncio event loop.
+
+Each AI (run_ia.py) is a task of the loop, run by a daemon thread started
+with the first AI: an AI costs a task and a socket, not a thread, and
+hundreds of them share one thread. A finished AI is forgotten.
+"""
+import asyncio
+import threading
+from .logger import logger
+from .run_ia import run_ia
+
+MAX_AGENTS = 1000
+
+class AIRuntime:
+	def __init__(self):
+		self.loop = None
+		self.lock = threading.Lock()
+		self.agents = {} # private ai id: task, from the loop only
+		self.stats = {
+			'started': 0,
+			'finished': 0,
+			'failed': 0,
+		}
+
+	def start(self):
+		with self.lock:
+			if self.loop is None:
+				self.loop = asyncio.new_event_loop()
+				threading.Thread(target=self.loop.run_forever, name='ai-runtime', daemon=True).start()
+		return self.loop
+
+	def spawn(self, data):
+		"""
+		Starts the AI of `data` (the body of create_ia), from any thread.
+		False if the runtime is full.
+		"""
+		return asyncio.run_coroutine_threadsafe(self.add(data), self.start()).result()
+
+	async def add(self, data):
+		ai_id = data['ai_id']['private']
+		if ai_id in self.agents:
+			return True
+		if len(self.agents) >= MAX_AGENTS:
+			return False
+		self.agents[ai_id] = asyncio.get_running_loop().create_task(self.run(ai_id, data))
+		self.stats['started'] += 1
+		return True
+
+	async def run(self, ai_id, data):
+		try:
+			await run_ia(data)
+			self.stats['finished'] += 1
+		except Exception as e:
+			self.stats['failed'] += 1
+			logger.error(f"IA {data['ai_id']['public']} ({data['game_id']}): {e}")
+		finally:
+			del self.agents[ai_id]
+
+	@property
+	def running(self):
+		return len(self.agents)
+
+ai_runtime = AIRuntime()
@@ -0,0 +1,279 @@
+# selfplay.py
+"""
+Offline evaluation of the AI: matches of IA against IA or scripted opponents
+on a headless pong Game, without websocket nor server.
+
+An AI receives what the agent (run_ia.py) would: export_data, game_start,
+the ball stream (binary `tr` frames of the pong TrajectoryEncoder) and the
+scores. It decides on the clock of the game, at the rate of its difficulty,
+and its commands are queued on the game as the consumer does.
+
+Players: ai:easy, ai:normal, ai:hard (the AI at a difficulty), follow (a
+script following the ball every tick), idle (never moves). Every pairing of
+--left and --right plays --matches matches, seeded --seed, --seed + 1, ...
+so that the results are reproducible, spread over a process pool.
+
+Reported per pairing:
+- win rate of the left side, and draws (no winner after --max-time),
+- points and mean length of a match, in seconds of game time,
+- decisions of an AI per second of game time,
+- CPU per match (simulation included) and per decision of an AI.
+
+Usage (from the IA `src` directory, the pong sources being in the
+repository, see --pong):
+	python -m IAapp.selfplay --left ai:hard ai:normal --right follow --matches 1000
+	python -m IAapp.selfplay --save results.json
+	python -m IAapp.selfplay --baseline results.json
+
+With --baseline the exit status is 1 when the win rate of a pairing moved
+from the saved results by more than --tolerance.
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from .ia import IA, DIFFICULTIES
+from .run_ia import AgentSocket
+
+TICK_RATE = 0.025 # seconds, as the pong tick scheduler
+MAX_TIME = 120 # seconds of game time before a match is a draw
+PONG_SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'pong', 'src')
+PLAYERS = [f'ai:{difficulty}' for difficulty in DIFFICULTIES] + ['follow', 'idle']
+
+def load_pong(path):
+	if path not in sys.path:
+		sys.path.insert(0, path)
+
+# PLAYERS
+
+class Agent:
+	"""
+	An IA fed as run_ia.py feeds it.
+	"""
+	def __init__(self, game, username, difficulty):
+		self.game = game
+		self.username = username
+		self.ia = IA('AI', difficulty, clock=lambda: game.time)
+		self.socket = AgentSocket()
+		self.next_decision = 0.0
+		self.decisions = 0
+		self.seconds = 0.0
+		data = game.export_data()
+		# the teams are sent with the nicknames, the AI's being 'AI'
+		data['teams'] = {side: ['AI' if name == username else name for name in team]
+			for side, team in data['teams'].items()}
+		self.receive(json.dumps({'type': 'export_data', 'data': data}))
+		self.receive(json.dumps({'type': 'game_start'}))
+
+	def receive(self, message):
+		start = time.perf_counter()
+		self.ia.on_message(self.socket, message)
+		self.seconds += time.perf_counter() - start
+		self.apply()
+
+	def play(self):
+		if self.game.time < self.next_decision:
+			return
+		start = time.perf_counter()
+		self.next_decision = self.game.time + self.ia.decide(self.socket)
+		self.seconds += time.perf_counter() - start
+		self.decisions += 1
+		self.apply()
+
+	def apply(self):
+		for message in self.socket.outgoing:
+			data = json.loads(message)
+			if data['type'] == 'move':
+				self.game.input_players(self.username, data['input'])
+		self.socket.outgoing.clear()
+
+class Follower:
+	"""
+	Keeps the center of its padel on the ball, every tick.
+	"""
+	def __init__(self, game, username):
+		self.game = game
+		self.player = game.players[username]
+		self.key = None
+
+	def receive(self, message):
+		pass
+
+	def play(self):
+		padel = self.player.padel
+		y = self.game.ball.position.y
+		if y > padel.position.y + padel.size.y / 4:
+			self.press('up')
+		elif y < padel.position.y - padel.size.y / 4:
+			self.press('down')
+		else:
+			self.press(None)
+
+	def press(self, key):
+		if key == self.key:
+			return
+		inputs = self.player.input_data
+		if self.key is not None:
+			self.game.input_players(self.player.username, inputs[f'stop_{self.key}'])
+		if key is not None:
+			self.game.input_players(self.player.username, inputs[key])
+		self.key = key
+
+class Idle:
+	def receive(self, message):
+		pass
+
+	def play(self):
+		pass
+
+def make_player(kind, game, username):
+	if kind.startswith('ai:'):
+		return Agent(game, username, kind[3:])
+	if kind == 'follow':
+		return Follower(game, username)
+	return Idle()
+
+# MATCHES
+
+def play_match(task):
+	left, right, seed, modifiers, max_time = task
+	from pong_game.game.game import Game
+	from pong_game.game_managers import wire
+	from pong_game.game_managers.trajectory import TrajectoryEncoder, BALL_SAMPLE_INTERVAL
+
+	start = time.process_time()
+	game = Game({'left': None, 'right': None}, 'PONG_CLASSIC', modifiers, [['left'], ['right']],
+		seed=seed, record=False)
+	stream = TrajectoryEncoder(BALL_SAMPLE_INTERVAL, padels=False)
+	players = [make_player(left, game, 'left'), make_player(right, game, 'right')]
+	winner = None
+	while game.time < max_time:
+		for player in players:
+			player.play()
+		state = game.update(TICK_RATE)
+		message = stream.encode(state)
+		if message is not None:
+			message = wire.encode_state(message) if wire.is_binary(message) else json.dumps(message)
+			for player in players:
+				player.receive(message)
+		if state['type'] == 'game_end':
+			winner = state['team']
+			break
+	agents = [player for player in players if isinstance(player, Agent)]
+	return {
+		'pairing': pairing_name(left, right),
+		'winner': winner,
+		'points': game.score['left'] + game.score['right'],
+		'time': game.time,
+		'agents': len(agents),
+		'decisions': sum(agent.decisions for agent in agents),
+		'ai_seconds': sum(agent.seconds for agent in agents),
+		'cpu': time.process_time() - start,
+	}
+
+def pairing_name(left, right):
+	return f'{left} vs {right}'
+
+# REPORT
+
+def summarize(matches):
+	results = {}
+	for match in matches:
+		result = results.setdefault(match['pairing'], {
+			'matches': 0, 'left_wins': 0, 'draws': 0, 'points': 0, 'time': 0.0,
+			'agent_time': 0.0, 'decisions': 0, 'ai_seconds': 0.0, 'cpu': 0.0,
+		})
+		result['matches'] += 1
+		result['left_wins'] += match['winner'] == 'left'
+		result['draws'] += match['winner'] is None
+		result['points'] += match['points']
+		result['time'] += match['time']
+		result['agent_time'] += match['time'] * match['agents']
+		result['decisions'] += match['decisions']
+		result['ai_seconds'] += match['ai_seconds']
+		result['cpu'] += match['cpu']
+	summary = {}
+	for name, result in results.items():
+		count = result['matches']
+		summary[name] = {
+			'matches': count,
+			'left_win_rate': result['left_wins'] / count,
+			'draw_rate': result['draws'] / count,
+			'points_per_match': result['points'] / count,
+			'seconds_per_match': result['time'] / count,
+			'decisions_per_s': result['decisions'] / result['agent_time'] if result['agent_time'] else 0.0,
+			'cpu_ms_per_match': result['cpu'] / count * 1e3,
+			'us_per_decision': result['ai_seconds'] / result['decisions'] * 1e6 if result['decisions'] else 0.0,
+		}
+	return summary
+
+def print_header():
+	print(f"{'pairing':<24} {'matches':>7} {'left win':>8} {'draws':>6} {'points':>6} "
+		f"{'match s':>7} {'dec/s':>6} {'cpu ms':>7} {'us/dec':>7}")
+
+def print_result(name, result):
+	print(f"{name:<24} {result['matches']:>7} {result['left_win_rate']:>8.3f} {result['draw_rate']:>6.3f} "
+		f"{result['points_per_match']:>6.2f} {result['seconds_per_match']:>7.1f} "
+		f"{result['decisions_per_s']:>6.2f} {result['cpu_ms_per_match']:>7.1f} {result['us_per_decision']:>7.1f}")
+
+def compare(results, baseline, tolerance):
+	"""
+	Pairings whose win rate moved from the baseline beyond the tolerance.
+	"""
+	regressions = []
+	for name, result in results.items():
+		reference = baseline.get(name)
+		if reference is None:
+			continue
+		if abs(result['left_win_rate'] - reference['left_win_rate']) > tolerance:
+			regressions.append(f"{name}: left win rate {result['left_win_rate']:.3f} "
+				f"(baseline {reference['left_win_rate']:.3f})")
+	return regressions
+
+def main():
+	parser = argparse.ArgumentParser(description="Offline matches of the pong AI")
+	parser.add_argument('--left', nargs='*', default=['ai:easy', 'ai:normal', 'ai:hard'], choices=PLAYERS)
+	parser.add_argument('--right', nargs='*', default=['follow', 'ai:normal'], choices=PLAYERS)
+	parser.add_argument('--matches', type=int, default=200, help="matches per pairing")
+	parser.add_argument('--seed', type=int, default=42)
+	parser.add_argument('--modifiers', nargs='*', default=[])
+	parser.add_argument('--max-time', type=float, default=MAX_TIME, help="seconds of game time")
+	parser.add_argument('--jobs', type=int, default=os.cpu_count())
+	parser.add_argument('--pong', default=PONG_SRC, help="the pong `src` directory")
+	parser.add_argument('--save', metavar='PATH', help="write the results as JSON")
+	parser.add_argument('--baseline', metavar='PATH', help="compare with saved results")
+	parser.add_argument('--tolerance', type=float, default=0.05, help="win rate")
+	args = parser.parse_args()
+
+	pong = os.path.abspath(args.pong)
+	load_pong(pong)
+	tasks = [(left, right, args.seed + index, args.modifiers, args.max_time)
+		for left, right in itertools.product(args.left, args.right)
+		for index in range(args.matches)]
+	start = time.perf_counter()
+	with ProcessPoolExecutor(args.jobs, initializer=load_pong, initargs=(pong,)) as pool:
+		matches = list(pool.map(play_match, tasks, chunksize=max(1, len(tasks) // (args.jobs * 8))))
+	elapsed = time.perf_counter() - start
+
+	results = summarize(matches)
+	print_header()
+	for name, result in results.items():
+		print_result(name, result)
+	print(f"\n{len(matches)} matches in {elapsed:.1f} s ({len(matches) / elapsed:.0f} matches/s, {args.jobs} processes)")
+	if args.save:
+		with open(args.save, 'w') as file:
+			json.dump(results, file, indent=1)
+	if args.baseline:
+		with open(args.baseline) as file:
+			regressions = compare(results, json.load(file), args.tolerance)
+		for regression in regressions:
+			print(f"REGRESSION {regression}")
+		if regressions:
+			sys.exit(1)
+		print(f"no regression beyond {args.tolerance}")
+
+if __name__ == '__main__':
+	main()
@@ -1,12 +1,9 @@
 # Create your views here.
 import json
-from threading import Thread
 from django.http import JsonResponse
 from .logger import logger
-from .run_ia import run_ia  # Assure-toi d'importer la tâche
+from .runtime import ai_runtime
 from django.views.decorators.csrf import csrf_exempt
-# Liste pour stocker les threads
-threads = []
 
 
 # recevoir la game id web socket de Amery
@@ -15,18 +12,17 @@ def create_ia(request):
 	logger.debug(f"request body:, {request}")
 	logger.debug(f"Request body: {request.body}")
 	
-	# Démarre une nouvelle IA dans un thread séparé
+	# Démarre une nouvelle IA sur la boucle du runtime
 	logger.debug("Test message - within create_ia view.")
  
 	try:
 		RequestBody = json.loads(request.body)
 		
-		# Démarrer le thread sans appeler la fonction immédiatement
-		thread = Thread(target=run_ia, args=(RequestBody,))
-		thread.start()
-		threads.append(thread)  # Ajoute le thread à la liste pour le gérer plus tard
+		if not ai_runtime.spawn(RequestBody):
+			logger.error(f"Trop d'IA en cours ({ai_runtime.running}).")
+			return JsonResponse({'error': 'Too many AIs'}, status=503)
   
-		# Réponse après démarrage du thread
+		# Réponse après démarrage de l'IA
 		return JsonResponse({'message': 'connected to the server IA'}, status=200)
 
 	except json.JSONDecodeError:
@@ -0,0 +1,50 @@
+# wire.py
+"""
+Decoder of the binary game frames sent by the pong service
+(pong_game/game_managers/wire.py) to connections opened with `?format=binary`.
+"""
+import struct
+
+WIRE_VERSION = 1
+
+TYPE_NAMES = {
+	1: 'gu',
+	2: 'padel_contact',
+	4: 'tr',
+}
+
+HEADER = struct.Struct('<BBB')
+BALL = struct.Struct('<5f')
+MOTION = struct.Struct('<6f')
+MAX_PADELS = 4
+
+def decode_frame(frame):
+	version, code, mask = HEADER.unpack_from(frame, 0)
+	if version != WIRE_VERSION:
+		raise ValueError(f"unsupported wire version {version}")
+	if code not in TYPE_NAMES:
+		raise ValueError(f"unknown frame type {code}")
+	if TYPE_NAMES[code] == 'tr':
+		return decode_trajectory(frame, mask)
+	x, y, z, sx, sy = BALL.unpack_from(frame, HEADER.size)
+	keys = [f'p{i + 1}' for i in range(MAX_PADELS) if mask & (1 << i)]
+	padels = struct.unpack_from(f'<{len(keys)}f', frame, HEADER.size + BALL.size)
+	return {
+		'type': TYPE_NAMES[code],
+		'bp': {'x': x, 'y': y, 'z': z},
+		'bs': {'x': sx, 'y': sy},
+		'pp': dict(zip(keys, padels))
+	}
+
+def decode_trajectory(frame, mask):
+	t, x, y, z, vx, vy = MOTION.unpack_from(frame, HEADER.size)
+	keys = [f'p{i + 1}' for i in range(MAX_PADELS) if mask & (1 << i)]
+	values = struct.unpack_from(f'<{2 * len(keys)}f', frame, HEADER.size + MOTION.size)
+	return {
+		'type': 'tr',
+		't': t,
+		'bp': {'x': x, 'y': y, 'z': z},
+		'bv': {'x': vx, 'y': vy},
+		'pp': dict(zip(keys, values[0::2])),
+		'pv': dict(zip(keys, values[1::2]))
+	}
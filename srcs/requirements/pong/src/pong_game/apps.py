@@ -4,3 +4,22 @@ from django.apps import AppConfig
 class pong_gameConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pong_game'
+
+    def ready(self):
+        from django.conf import settings
+        from .game_managers.tick_scheduler import tick_scheduler
+        from .utils.logger import logger
+        from .utils.tokens import token_verifier
+        from .game_managers.shards import shards
+        from .game_managers.lifecycle import room_reaper
+        from .game_managers.replays import replay_store
+        room_reaper.configure(settings.PONG_ROOM_WAITING_TIMEOUT)
+        replay_store.configure(settings.PONG_REPLAY_DIR, settings.PONG_REPLAY_KEEP)
+        shards.configure(settings.PONG_WORKERS, settings.PONG_WORKER_ID, settings.PONG_WORKER_PORT)
+        token_verifier.configure(settings.PONG_JWT_SIGNING_KEY, settings.PONG_AUTH_CACHE_TTL)
+        if getattr(settings, 'PONG_BATCH_PHYSICS', False):
+            from .game.batch_physics import BatchPhysics, is_available
+            if is_available():
+                tick_scheduler.set_engine(BatchPhysics())
+            else:
+                logger.warning("PONG_BATCH_PHYSICS is set but numpy is missing, rooms are stepped one by one")
@@ -0,0 +1,152 @@
+"""
+Micro-benchmark of the ball/padel collision routine.
+
+Compares the scalar swept collision of `pong_game.game.collisions` with the
+previous NumPy implementation (kept below as `legacy_get_position_physic`)
+on the same random ball moves around a padel.
+
+Usage (from the pong `src` directory):
+	python -m pong_game.benchmarks.bench_collisions [--cases 20000] [--seed 42]
+"""
+import argparse
+import random
+import time
+from ..game.collisions import get_position_physic
+from ..game.vector import Vec2, Hitbox
+
+# PREVIOUS IMPLEMENTATION (NumPy)
+
+def legacy_is_point_near_segment(np, point, segment_start, segment_end, radius):
+	seg_vec = segment_end - segment_start
+	point_vec = point - segment_start
+	seg_len_sq = np.dot(seg_vec, seg_vec)
+	proj = np.dot(point_vec, seg_vec) / seg_len_sq if seg_len_sq != 0 else 0
+	proj_clamped = np.clip(proj, 0, 1)
+	closest_point = segment_start + proj_clamped * seg_vec
+	distance_sq = np.sum((point - closest_point) ** 2)
+	return distance_sq == radius ** 2
+
+def legacy_intersec_point(np, A, B, ball_pos, ball_dest, r):
+	ball_dir = ball_dest - ball_pos
+	seg_dir = B - A
+	if np.cross(seg_dir, ball_dir) == 0:
+		return None, None
+	t1 = np.cross((ball_pos - A), ball_dir) / np.cross(seg_dir, ball_dir)
+	intersec = A + t1 * seg_dir
+	if not (0 <= t1 <= 1):
+		return None, None
+	dist_ball_travel = np.linalg.norm(ball_dest - ball_pos)
+	dist_to_intersec = np.linalg.norm(intersec - ball_pos)
+	if dist_to_intersec > dist_ball_travel:
+		return None, None
+	seg_normal = np.array([-seg_dir[1], seg_dir[0]])
+	seg_normal /= np.linalg.norm(seg_normal)
+	to_dest = np.dot(ball_dest - intersec, seg_normal)
+	if to_dest >= 0:
+		return None, None
+	contact_point = intersec
+	ball_center_contact = contact_point + seg_normal * r
+	return ball_center_contact, contact_point
+
+def legacy_get_position_physic(np, ball_pos, ball_dest, r, pad):
+	b_pos = np.array([ball_pos['x'], ball_pos['y']])
+	b_dest = np.array([ball_dest['x'], ball_dest['y']])
+	A = np.array([pad['A']['x'], pad['A']['y']])
+	B = np.array([pad['B']['x'], pad['B']['y']])
+	C = np.array([pad['C']['x'], pad['C']['y']])
+	D = np.array([pad['D']['x'], pad['D']['y']])
+	segments = [(A, B), (B, C), (C, D), (D, A)]
+	for start, end in segments:
+		if legacy_is_point_near_segment(np, b_pos, start, end, r):
+			return None
+	positions = []
+	for (start, end), name in zip(segments, ['AB', 'BC', 'CD', 'DA']):
+		contact, point = legacy_intersec_point(np, start, end, b_pos, b_dest, r)
+		if contact is not None:
+			positions.append((contact, point, name))
+	if positions:
+		closest_contact, contact_point, segment_name = min(
+			positions, key=lambda item: np.linalg.norm(item[0] - b_pos)
+		)
+		return {
+			'center_at_contact': {'x': closest_contact[0], 'y': closest_contact[1]},
+			'point_contact': {'x': contact_point[0], 'y': contact_point[1]},
+			'segment': segment_name
+		}
+	return None
+
+# CASES
+
+def make_hitbox(x, y, size_x, size_y):
+	hitbox = Hitbox()
+	hitbox.update(x, y, size_x, size_y)
+	return hitbox
+
+def make_cases(count, seed):
+	"""
+	Ball moves of one 25 ms tick at game speeds, aimed around a right side
+	padel (vanilla size) so that roughly half of them touch it.
+	"""
+	rng = random.Random(seed)
+	cases = []
+	for _ in range(count):
+		pad_y = rng.uniform(-26, 26)
+		pad = make_hitbox(39, pad_y, 4, 12)
+		x0 = rng.uniform(25, 36)
+		y0 = pad_y + rng.uniform(-14, 14)
+		speed = rng.uniform(30, 200) * 0.025
+		dx = speed * rng.uniform(0.3, 1.0)
+		dy = speed * rng.uniform(-1.0, 1.0)
+		cases.append((Vec2(x0, y0), Vec2(x0 + dx, y0 + dy), 1, pad))
+	return cases
+
+def time_routine(routine, cases, repeat):
+	best = None
+	for _ in range(repeat):
+		start = time.perf_counter()
+		for ball_pos, ball_dest, r, pad in cases:
+			routine(ball_pos, ball_dest, r, pad)
+		elapsed = time.perf_counter() - start
+		if best is None or elapsed < best:
+			best = elapsed
+	return best
+
+def main():
+	parser = argparse.ArgumentParser(description="Ball/padel collision micro-benchmark")
+	parser.add_argument('--cases', type=int, default=20000)
+	parser.add_argument('--seed', type=int, default=42)
+	parser.add_argument('--repeat', type=int, default=3)
+	args = parser.parse_args()
+
+	cases = make_cases(args.cases, args.seed)
+	scalar_time = time_routine(get_position_physic, cases, args.repeat)
+	hits = sum(1 for case in cases if get_position_physic(*case))
+	print(f"cases: {len(cases)} ({hits} contacts)")
+	print(f"scalar: {scalar_time / len(cases) * 1e6:.2f} us/call")
+	try:
+		import numpy as np
+	except ImportError:
+		print("numpy is not installed, legacy comparison skipped")
+		return
+	legacy_cases = [
+		(ball_pos.to_dict(), ball_dest.to_dict(), r, pad.to_dict())
+		for ball_pos, ball_dest, r, pad in cases
+	]
+	legacy = lambda *case: legacy_get_position_physic(np, *case)
+	legacy_time = time_routine(legacy, legacy_cases, args.repeat)
+	print(f"numpy:  {legacy_time / len(cases) * 1e6:.2f} us/call")
+	print(f"speedup: x{legacy_time / scalar_time:.1f}")
+	# The scalar routine sweeps the ball's edge, the legacy one its centre:
+	# report how often both see the same face.
+	same = 0
+	both = 0
+	for case, legacy_case in zip(cases, legacy_cases):
+		new = get_position_physic(*case)
+		old = legacy(*legacy_case)
+		if new and old:
+			both += 1
+			same += new['segment'] == old['segment']
+	print(f"contacts found by both: {both}, same face: {same}")
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,220 @@
+"""
+In-process load harness of the game rooms.
+
+Runs N rooms through the real GameConsumer, tick scheduler and broadcaster,
+every client being a channels WebsocketCommunicator connected with a
+special id (no authentication service) and the channel layer the in-memory
+one (no redis). Players follow the ball from the frames they receive,
+spectators only count theirs. A room whose game ends is replaced so that N
+rooms keep running for the whole duration.
+
+Reported:
+- frames and bytes delivered per second, to players and to spectators,
+- p50 / p99 / max scheduler tick (simulation + fan-out of every room),
+  overruns and dropped steps,
+- p99 gap between two frames received by a client (40 Hz = 25 ms).
+
+The clients run in the same process and use part of the CPU: compare runs
+of this harness with each other, not with production figures.
+
+Usage (from the pong `src` directory, with the service requirements):
+	python -m pong_game.benchmarks.bench_fanout [--rooms 50] [--spectators 2] [--duration 10]
+	python -m pong_game.benchmarks.bench_fanout --format binary --stream delta
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+
+TICK_RATE = 0.025
+
+def setup_django():
+	os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pong_project.settings')
+	import django
+	django.setup()
+	from django.conf import settings
+	# every consumer lives in this process
+	settings.CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+def percentile(values, ratio):
+	if not values:
+		return 0.0
+	ordered = sorted(values)
+	return ordered[min(len(ordered) - 1, int(ratio * len(ordered)))]
+
+class Client:
+	"""
+	One websocket connection. Counts what it receives; a player also sends
+	the key down / key up moves following the ball.
+	"""
+
+	def __init__(self, app, path, query, stats, username=None, input_data=None):
+		from channels.testing import WebsocketCommunicator
+		self.communicator = WebsocketCommunicator(app, path)
+		self.communicator.scope['query_string'] = query.encode()
+		self.stats = stats
+		self.username = username
+		self.input_data = input_data
+		self.padel = None
+		self.key = None
+		self.last_frame = None
+		self.closed = False
+
+	async def connect(self):
+		connected, _ = await self.communicator.connect()
+		return connected
+
+	async def send(self, message):
+		await self.communicator.send_to(text_data=json.dumps(message))
+
+	async def run(self, deadline):
+		from ..game_managers import wire
+		while not self.closed:
+			timeout = deadline - time.perf_counter()
+			if timeout <= 0:
+				return
+			try:
+				# not receive_output(): its timeout cancels the consumer
+				message = await asyncio.wait_for(self.communicator.output_queue.get(), timeout)
+			except asyncio.TimeoutError:
+				return
+			if message['type'] == 'websocket.close':
+				self.closed = True
+				return
+			payload = message.get('bytes') or message.get('text') or ''
+			now = time.perf_counter()
+			if self.last_frame is not None:
+				self.stats['gaps'].append(now - self.last_frame)
+			self.last_frame = now
+			self.stats['frames'] += 1
+			self.stats['bytes'] += len(payload)
+			if self.input_data is None:
+				continue
+			state = wire.decode_frame(payload) if isinstance(payload, bytes) else json.loads(payload)
+			if state.get('type') in ('gu', 'padel_contact') and self.padel in state.get('pp', {}):
+				await self.follow(state['bp']['y'], state['pp'][self.padel])
+
+	async def follow(self, ball_y, padel_y):
+		key = None
+		if ball_y > padel_y + 2:
+			key = 'up'
+		elif ball_y < padel_y - 2:
+			key = 'down'
+		if key == self.key:
+			return
+		if self.key is not None:
+			await self.send({'type': 'move', 'input': self.input_data[f'stop_{self.key}']})
+		if key is not None:
+			await self.send({'type': 'move', 'input': self.input_data[key]})
+		self.key = key
+
+	async def close(self):
+		if not self.closed:
+			self.closed = True
+			await self.communicator.disconnect()
+
+def padel_keys(game):
+	# key of the padel of each player in the `pp` of the states
+	offset = {'left': 1, 'right': 3 if game.game_mode == 'PONG_DUO' else 2}
+	return {
+		player.username: f'p{i + offset[side]}'
+		for side, players in game.players_in_side.items()
+		for i, player in enumerate(players)
+	}
+
+async def run_room(app, args, deadline, stats):
+	from ..game_managers.game_manager import game_manager
+	from ..game.getdata import get_data
+	input_data = get_data(args.modifiers, 'input_data')
+	players = 4 if args.mode == 'PONG_DUO' else 2
+	query = f'format={args.format}' + (f'&{args.stream}=1' if args.stream else '')
+	while time.perf_counter() < deadline:
+		game_id, admin_id = str(uuid.uuid4()), str(uuid.uuid4())
+		usernames = [f'player{i}' for i in range(players)]
+		special_ids = [
+			{'private': str(uuid.uuid4()), 'public': name, 'nickname': name}
+			for name in usernames + [f'spectator{i}' for i in range(args.spectators)]
+		]
+		half = players // 2
+		game_manager.add_games_room(game_id, admin_id, args.mode, args.modifiers, usernames,
+			special_ids, [usernames[:half], usernames[half:]])
+		admin = Client(app, f'/ws/pong/{game_id}/{admin_id}/', '', stats['admin'])
+		clients = [admin]
+		try:
+			if not await admin.connect():
+				raise RuntimeError("admin connection refused")
+			for ids in special_ids[:players]:
+				player = Client(app, f"/ws/pong/{game_id}/{ids['private']}/", query,
+					stats['players'], ids['public'], input_data)
+				if not await player.connect():
+					raise RuntimeError("player connection refused")
+				clients.append(player)
+			keys = padel_keys(game_manager.get_room(game_id)['game_instance'])
+			for player in clients[1:]:
+				player.padel = keys[player.username]
+				await player.send({'type': 'ready'})
+			await asyncio.sleep(TICK_RATE)
+			for ids in special_ids[players:]:
+				spectator = Client(app, f"/ws/pong/{game_id}/{ids['private']}/", query, stats['spectators'])
+				if await spectator.connect():
+					clients.append(spectator)
+					await spectator.send({'type': 'ready'})
+			await asyncio.gather(*(client.run(deadline) for client in clients))
+			if admin.closed: # closed by the consumer at the end of the game
+				stats['games'] += 1
+		finally:
+			for client in reversed(clients):
+				await client.close()
+
+def new_stats():
+	return {'frames': 0, 'bytes': 0, 'gaps': []}
+
+async def run(args):
+	from channels.routing import URLRouter
+	from ..routing import websocket_urlpatterns
+	from ..game_managers.tick_scheduler import tick_scheduler
+	from ..game_managers.broadcaster import broadcaster
+	app = URLRouter(websocket_urlpatterns)
+
+	durations = []
+	record_tick = tick_scheduler.record_tick
+	def record(duration):
+		durations.append(duration)
+		record_tick(duration)
+	tick_scheduler.record_tick = record
+
+	stats = {'admin': new_stats(), 'players': new_stats(), 'spectators': new_stats(), 'games': 0}
+	start = time.perf_counter()
+	deadline = start + args.duration
+	await asyncio.gather(*(run_room(app, args, deadline, stats) for _ in range(args.rooms)))
+	elapsed = time.perf_counter() - start
+	await asyncio.sleep(0.1)
+
+	print(f"{args.rooms} rooms {args.mode} {args.modifiers or 'vanilla'}, {args.spectators} spectators/room, "
+		f"format {args.format}, stream {args.stream or 'full'}, {elapsed:.1f} s, {stats['games']} games ended")
+	for name in ('players', 'spectators'):
+		group = stats[name]
+		print(f"{name:<10} {group['frames'] / elapsed:>9.0f} frames/s {group['bytes'] / elapsed / 1024:>9.1f} KiB/s "
+			f"{group['bytes'] / max(group['frames'], 1):>6.1f} B/frame  p99 gap {percentile(group['gaps'], 0.99) * 1e3:.1f} ms")
+	print(f"scheduler  {tick_scheduler.stats['ticks']} ticks  p50 {percentile(durations, 0.50) * 1e3:.2f} ms  "
+		f"p99 {percentile(durations, 0.99) * 1e3:.2f} ms  max {max(durations, default=0) * 1e3:.2f} ms  "
+		f"overruns {tick_scheduler.stats['overruns']}  dropped steps {tick_scheduler.stats['dropped_steps']}")
+	print(f"broadcaster {broadcaster.stats}")
+
+def main():
+	parser = argparse.ArgumentParser(description="In-process load harness of the game rooms")
+	parser.add_argument('--rooms', type=int, default=50)
+	parser.add_argument('--spectators', type=int, default=2, help="spectators per room")
+	parser.add_argument('--duration', type=float, default=10.0, help="seconds")
+	parser.add_argument('--mode', default='PONG_CLASSIC', choices=['PONG_CLASSIC', 'PONG_DUO'])
+	parser.add_argument('--modifiers', nargs='*', default=[])
+	parser.add_argument('--format', default='json', choices=['json', 'binary'])
+	parser.add_argument('--stream', default=None, choices=['delta', 'trajectory', 'ball'])
+	args = parser.parse_args()
+	setup_django()
+	asyncio.run(run(args))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,268 @@
+"""
+Headless benchmark of the pong simulation.
+
+Drives `Game` directly, without consumers nor event loop, for PONG_CLASSIC
+and PONG_DUO under every combination of modifiers. Each player is a
+scripted bot following the ball (key down / key up inputs, as the client
+sends them) and a room that ends is replaced by a new one.
+
+Reported per scenario (mode + modifiers):
+- room-ticks/s: fixed steps of one room per second spent stepping, and
+  the number of rooms one core sustains at 40 Hz,
+- p50 / p99 tick: time to step every room of the scenario once,
+- alloc/room-tick: bytes allocated during a step (tracemalloc peak,
+  measured in a separate pass since tracing slows everything down),
+- bytes/frame of the `gu` states: JSON, binary, delta, trajectory and
+  ball streams (see game_managers/wire.py).
+
+Serialization and inputs are not part of the timed steps.
+
+Usage (from the pong `src` directory):
+	python -m pong_game.benchmarks.bench_simulation [--rooms 20] [--ticks 400]
+	python -m pong_game.benchmarks.bench_simulation --save baseline.json
+	python -m pong_game.benchmarks.bench_simulation --baseline baseline.json
+
+With --baseline the exit status is 1 when a scenario is slower (room-ticks/s)
+or allocates more than the baseline by more than --tolerance.
+"""
+import argparse
+import itertools
+import json
+import random
+import sys
+import time
+import tracemalloc
+from ..game.game import Game
+from ..game.getdata import MODIFIERS
+from ..game_managers import wire
+from ..game_managers.delta import DeltaEncoder
+from ..game_managers.trajectory import TrajectoryEncoder, BALL_SAMPLE_INTERVAL
+
+MODES = {
+	'PONG_CLASSIC': 2,
+	'PONG_DUO': 4,
+}
+TICK_RATE = 0.025
+
+# SCENARIOS
+
+def modifier_combinations(names=MODIFIERS):
+	for count in range(len(names) + 1):
+		for combination in itertools.combinations(names, count):
+			yield list(combination)
+
+def scenario_name(mode, modifiers):
+	return f"{mode}[{','.join(modifiers) or 'vanilla'}]"
+
+class Bot:
+	"""
+	Follows the ball with the padel, reacting every `reaction` ticks and
+	aiming anywhere on its padel so that points are actually scored.
+	"""
+
+	def __init__(self, game, player, rng):
+		self.game = game
+		self.player = player
+		self.reaction = rng.randint(1, 6)
+		self.aim = rng.uniform(-0.6, 0.6)
+		self.key = None
+		self.ticks = 0
+
+	def play(self):
+		self.ticks += 1
+		if self.ticks % self.reaction:
+			return
+		padel = self.player.padel
+		target = self.game.ball.position.y + self.aim * padel.size.y
+		if target > padel.position.y + padel.size.y / 4:
+			self.press('up')
+		elif target < padel.position.y - padel.size.y / 4:
+			self.press('down')
+		else:
+			self.press(None)
+
+	def press(self, key):
+		if key == self.key:
+			return
+		inputs = self.player.input_data
+		if self.key is not None:
+			self.game.input_players(self.player.username, inputs[f'stop_{self.key}'])
+		if key is not None:
+			self.game.input_players(self.player.username, inputs[key])
+		self.key = key
+
+class Room:
+	def __init__(self, mode, modifiers, rng):
+		self.mode = mode
+		self.modifiers = modifiers
+		self.rng = rng
+		self.streams = None
+		self.new_game()
+
+	def new_game(self):
+		usernames = [f'player{i}' for i in range(MODES[self.mode])]
+		half = len(usernames) // 2
+		self.game = Game({username: None for username in usernames}, self.mode,
+			self.modifiers, [usernames[:half], usernames[half:]])
+		self.bots = [Bot(self.game, player, self.rng) for player in self.game.players.values()]
+		self.streams = {
+			'delta': DeltaEncoder(),
+			'trajectory': TrajectoryEncoder(),
+			'ball': TrajectoryEncoder(BALL_SAMPLE_INTERVAL, padels=False)
+		}
+		self.streams['trajectory'].reset()
+		self.streams['ball'].reset()
+
+	def play(self):
+		for bot in self.bots:
+			bot.play()
+
+def make_rooms(mode, modifiers, count, seed):
+	random.seed(seed) # sides, maps and ball directions of Game / Ball
+	rng = random.Random(seed)
+	return [Room(mode, modifiers, rng) for _ in range(count)]
+
+# MEASURES
+
+def percentile(values, ratio):
+	ordered = sorted(values)
+	return ordered[min(len(ordered) - 1, int(ratio * len(ordered)))]
+
+class FrameSizes:
+	def __init__(self):
+		self.frames = 0
+		self.bytes = {'json': 0, 'binary': 0, 'delta': 0, 'trajectory': 0, 'ball': 0}
+
+	def add(self, room, state):
+		for name, encoder in room.streams.items():
+			variant = encoder.encode(state)
+			if variant is not state and variant is not None:
+				self.bytes[name] += len(wire.encode_state(variant))
+		if state['type'] != 'gu':
+			return
+		self.frames += 1
+		self.bytes['json'] += len(json.dumps(state))
+		self.bytes['binary'] += len(wire.encode_state(state))
+
+	def per_frame(self):
+		return {name: total / max(self.frames, 1) for name, total in self.bytes.items()}
+
+def step(rooms):
+	states = []
+	for room in rooms:
+		states.append(room.game.update(TICK_RATE))
+	return states
+
+def after_step(rooms, states, sizes=None):
+	for room, state in zip(rooms, states):
+		if sizes is not None:
+			sizes.add(room, state)
+		if state['type'] == 'game_end':
+			room.new_game()
+		else:
+			room.play()
+
+def run_scenario(mode, modifiers, args):
+	rooms = make_rooms(mode, modifiers, args.rooms, args.seed)
+	sizes = FrameSizes()
+	durations = []
+	points = 0
+	for _ in range(args.ticks):
+		start = time.perf_counter()
+		states = step(rooms)
+		durations.append(time.perf_counter() - start)
+		points += sum(1 for state in states if state['type'] in ('scored', 'game_end'))
+		after_step(rooms, states, sizes)
+
+	rooms = make_rooms(mode, modifiers, args.rooms, args.seed)
+	allocated = 0
+	tracemalloc.start()
+	for _ in range(args.alloc_ticks):
+		tracemalloc.reset_peak()
+		before = tracemalloc.get_traced_memory()[0]
+		states = step(rooms)
+		allocated += tracemalloc.get_traced_memory()[1] - before
+		after_step(rooms, states)
+	tracemalloc.stop()
+
+	total = sum(durations)
+	room_ticks = args.rooms * args.ticks
+	return {
+		'room_ticks_per_s': room_ticks / total,
+		'rooms_at_40hz': room_ticks / total * TICK_RATE,
+		'p50_tick_us': percentile(durations, 0.50) * 1e6,
+		'p99_tick_us': percentile(durations, 0.99) * 1e6,
+		'alloc_bytes_per_room_tick': allocated / max(args.rooms * args.alloc_ticks, 1),
+		'bytes_per_frame': sizes.per_frame(),
+		'points': points,
+	}
+
+# REPORT
+
+def print_header():
+	print(f"{'scenario':<60} {'room-ticks/s':>12} {'rooms@40Hz':>10} {'p50 us':>8} {'p99 us':>8} "
+		f"{'alloc B':>8} {'json':>6} {'bin':>5} {'delta':>6} {'traj':>5} {'ball':>5}")
+
+def print_result(name, result):
+	sizes = result['bytes_per_frame']
+	print(f"{name:<60} {result['room_ticks_per_s']:>12.0f} {result['rooms_at_40hz']:>10.0f} "
+		f"{result['p50_tick_us']:>8.1f} {result['p99_tick_us']:>8.1f} "
+		f"{result['alloc_bytes_per_room_tick']:>8.0f} {sizes['json']:>6.1f} {sizes['binary']:>5.1f} "
+		f"{sizes['delta']:>6.1f} {sizes['trajectory']:>5.1f} {sizes['ball']:>5.1f}")
+
+def compare(results, baseline, tolerance):
+	"""
+	Scenarios slower or allocating more than the baseline beyond the tolerance.
+	"""
+	regressions = []
+	for name, result in results.items():
+		reference = baseline.get(name)
+		if reference is None:
+			continue
+		if result['room_ticks_per_s'] < reference['room_ticks_per_s'] * (1 - tolerance):
+			regressions.append(f"{name}: {result['room_ticks_per_s']:.0f} room-ticks/s "
+				f"(baseline {reference['room_ticks_per_s']:.0f})")
+		if result['alloc_bytes_per_room_tick'] > reference['alloc_bytes_per_room_tick'] * (1 + tolerance):
+			regressions.append(f"{name}: {result['alloc_bytes_per_room_tick']:.0f} B/room-tick "
+				f"(baseline {reference['alloc_bytes_per_room_tick']:.0f})")
+	return regressions
+
+def main():
+	parser = argparse.ArgumentParser(description="Headless pong simulation benchmark")
+	parser.add_argument('--rooms', type=int, default=20, help="rooms stepped together")
+	parser.add_argument('--ticks', type=int, default=400, help="timed ticks per scenario")
+	parser.add_argument('--alloc-ticks', type=int, default=40, help="traced ticks per scenario")
+	parser.add_argument('--seed', type=int, default=42)
+	parser.add_argument('--modes', nargs='*', default=list(MODES), choices=list(MODES))
+	parser.add_argument('--modifiers', nargs='*', default=None, choices=MODIFIERS,
+		help="only this combination (default: every combination)")
+	parser.add_argument('--save', metavar='PATH', help="write the results as JSON")
+	parser.add_argument('--baseline', metavar='PATH', help="compare with saved results")
+	parser.add_argument('--tolerance', type=float, default=0.15)
+	args = parser.parse_args()
+
+	combinations = [args.modifiers] if args.modifiers is not None else list(modifier_combinations())
+	results = {}
+	print_header()
+	for mode in args.modes:
+		for modifiers in combinations:
+			name = scenario_name(mode, modifiers)
+			results[name] = run_scenario(mode, modifiers, args)
+			print_result(name, results[name])
+
+	total = sum(1 / result['room_ticks_per_s'] for result in results.values())
+	print(f"\n{len(results)} scenarios, mean {len(results) / total:.0f} room-ticks/s")
+	if args.save:
+		with open(args.save, 'w') as file:
+			json.dump(results, file, indent=1)
+	if args.baseline:
+		with open(args.baseline) as file:
+			regressions = compare(results, json.load(file), args.tolerance)
+		for regression in regressions:
+			print(f"REGRESSION {regression}")
+		if regressions:
+			sys.exit(1)
+		print(f"no regression beyond {args.tolerance:.0%}")
+
+if __name__ == '__main__':
+	main()
@@ -1,167 +1,152 @@
 from .getdata import get_data
+from .vector import Vec2, Vec3
 from .collisions import get_position_physic
 from ..utils.logger import logger
+import random
 
 class Ball:
-	def __init__(self, modifiers):
-		from .timer import Timer
-		import copy
-
+	def __init__(self, modifiers, rng=random):
+		self.rng = rng # the random source of the game
 		self.ball_data = get_data(modifiers,'ball_data')
 		self.arena_data = get_data(modifiers,'arena_data')
-		self.position = copy.copy(self.ball_data['pos'])
-		self.direction = {'x': 1, 'y': self.random_dir()}
-		self.speed = copy.copy(self.ball_data['spd'])
+		self.rad = self.ball_data['rad']
+		self.base_speed = Vec2.from_dict(self.ball_data['spd'])
+		self.border = Vec2(self.arena_data['size']['x'] / 2, self.arena_data['size']['y'] / 2)
+		self.position = Vec3.from_dict(self.ball_data['pos'])
+		self.direction = Vec2(1, self.random_dir())
+		self.speed = Vec2.from_dict(self.ball_data['spd'])
+		self.normalized = Vec2()
+		self.destination = Vec2()
 		self.random_y_speed()
-		self.timer = Timer()
 		self.priority = False
 
-	def update_ball_position(self, get_players_in_side):
-		destination = self.get_destination()
+	def update_ball_position(self, get_players_in_side, dt):
+		destination = self.get_destination(dt)
 		# logger.debug(f"dest = {destination}")
-		destination_collider = self.get_destination_collider(destination)
-		players_in_side = get_players_in_side('right' if destination['x'] > 0 else 'left')
+		players_in_side = get_players_in_side('right' if destination.x > 0 else 'left')
 		for player_in_side in players_in_side:
 			padel = player_in_side.padel
 			if padel.ball_contact:
 				self.updateSpeedAndDir(padel, padel.ball_contact, \
 					'DA' if padel.direction == 1 else 'BC')
 				return 'padel_contact'
-			padel_hitbox = padel.get_hitbox()
-			physic_position = get_position_physic(self.position, destination, self.ball_data['rad'],\
-						padel_hitbox)
+			physic_position = get_position_physic(self.position, destination, self.rad,\
+						padel.get_hitbox())
 			# logger.debug(f"physic_position:{physic_position}")
 			if physic_position:
 				self.padel_contact(physic_position, padel)
 				self.priority = True
 				return 'padel_contact'
-		border_collider = self.get_border_collider()
-		for axis in ['x', 'y']:
-			if destination_collider[axis] <= border_collider[axis] \
-					and destination_collider[axis] >= -border_collider[axis]:
-				self.position[axis] = destination[axis]
-			else:
-				self.position[axis] \
-					= self.direction[axis] * self.arena_data['size'][axis] / 2 \
-					- self.direction[axis] * self.ball_data['rad']
-				self.direction[axis] *= -1
+		position = self.position
+		direction = self.direction
+		border = self.border
+		collider = destination.x + self.rad * direction.x
+		if -border.x <= collider <= border.x:
+			position.x = destination.x
+		else:
+			position.x = direction.x * border.x - direction.x * self.rad
+			direction.x *= -1
+		collider = destination.y + self.rad * direction.y
+		if -border.y <= collider <= border.y:
+			position.y = destination.y
+		else:
+			position.y = direction.y * border.y - direction.y * self.rad
+			direction.y *= -1
 		return 'gu'
 		
-	def get_destination(self):
+	def get_destination(self, dt):
 		normalized_speed = self.normalize_speed()
-		# logger.debug(f"speed:{self.speed}")
-		destination = {
-			'x': self.position['x'] + self.direction['x'] \
-				* normalized_speed['x'] * self.timer.get_elapsed_time(),
-			'y': self.position['y'] + self.direction['y'] \
-				* normalized_speed['y'] * self.timer.get_elapsed_time()
-		}
-		self.timer.reset()
-		return destination
-		
-	def get_destination_collider(self, destination):
-		return {
-			'x': destination['x'] + self.ball_data['rad'] * self.direction['x'],
-			'y': destination['y'] + self.ball_data['rad'] * self.direction['y']
-		}
+		self.destination.set(
+			self.position.x + self.direction.x * normalized_speed.x * dt,
+			self.position.y + self.direction.y * normalized_speed.y * dt
+		)
+		return self.destination
 
-	def get_border_collider(self):
-		return {
-			'x': self.arena_data['size']['x'] / 2,
-			'y': self.arena_data['size']['y'] / 2
-		}
-	
 	def is_scored(self):
-		border_collider = self.get_border_collider()['x']
-		if self.position['x'] + self.ball_data['rad'] == border_collider:
+		if self.position.x + self.rad == self.border.x:
 			return 'left'
-		elif self.position['x'] - self.ball_data['rad'] == -border_collider:	
+		elif self.position.x - self.rad == -self.border.x:
 			return 'right'
 		else:
 			return None
 
 	def reset_position(self):
-		import copy
-		self.position = copy.copy(self.ball_data['pos'])
-		self.direction['y'] = self.random_dir()
-		self.speed = copy.copy(self.ball_data['spd'])
+		pos = self.ball_data['pos']
+		self.position.x, self.position.y, self.position.z = pos['x'], pos['y'], pos['z']
+		self.direction.y = self.random_dir()
+		self.speed.set(self.base_speed.x, self.base_speed.y)
 		self.random_y_speed()
 
 	def incrased_y_speed(self, incrase):
-		if (self.speed['y'] > self.ball_data['spd']['y'] + incrase * 2):
+		if (self.speed.y > self.base_speed.y + incrase * 2):
 			return
-		self.speed['y'] += incrase
-		if (self.speed['y'] > self.ball_data['spd']['y'] + incrase * 2):
-			self.speed['y'] = self.ball_data['spd']['y'] + incrase * 2
+		self.speed.y += incrase
+		if (self.speed.y > self.base_speed.y + incrase * 2):
+			self.speed.y = self.base_speed.y + incrase * 2
 
 	def decrased_y_speed(self, decrase):
-		if (self.speed['y'] < self.ball_data['spd']['y'] - decrase):
+		if (self.speed.y < self.base_speed.y - decrase):
 			return
-		self.speed['y'] -= decrase
-		if (self.speed['y'] < self.ball_data['spd']['y'] - decrase):
-			self.speed['y'] = self.ball_data['spd']['y'] - decrase
+		self.speed.y -= decrase
+		if (self.speed.y < self.base_speed.y - decrase):
+			self.speed.y = self.base_speed.y - decrase
 
 
 	def updateSpeedAndDir(self, padel, point_contact, segment):
 		if segment == 'AB' or segment == 'CD':
 			logger.debug("switch")
-			self.direction['x'] *= -1
-			self.speed['x'] += self.ball_data['spd']['x'] / 6
-			if self.speed['x'] >= 2500:
-				self.speed['x'] = 2500
+			self.direction.x *= -1
+			self.speed.x += self.base_speed.x / 6
+			if self.speed.x >= 2500:
+				self.speed.x = 2500
 			if padel.direction == 0:
-				if self.speed['y'] > self.ball_data['spd']['y']:
-					self.decrased_y_speed(self.ball_data['spd']['y'] / 4)
-				elif self.speed['y'] < self.ball_data['spd']['y']:
-					self.incrased_y_speed(self.ball_data['spd']['y'] / 4)
-			elif padel.direction != self.direction['y']:
-				self.decrased_y_speed(self.ball_data['spd']['y'] / 2)
-			elif self.speed['y'] < self.ball_data['spd']['y'] * 2:
-				self.incrased_y_speed(self.ball_data['spd']['y'] / 2)
+				if self.speed.y > self.base_speed.y:
+					self.decrased_y_speed(self.base_speed.y / 4)
+				elif self.speed.y < self.base_speed.y:
+					self.incrased_y_speed(self.base_speed.y / 4)
+			elif padel.direction != self.direction.y:
+				self.decrased_y_speed(self.base_speed.y / 2)
+			elif self.speed.y < self.base_speed.y * 2:
+				self.incrased_y_speed(self.base_speed.y / 2)
 		elif segment == 'BC' or segment == 'DA':
-			if (padel.position['x'] < 0 and padel.position['x'] <= point_contact['x']) \
-				or (padel.position['x'] > 0 and padel.position['x'] >= point_contact['x']):
-				self.direction['x'] *= -1
-			self.direction['y'] = 1 if segment == 'DA' else -1
-			self.speed['x'] += self.ball_data['spd']['x'] / 6
-			if self.speed['x'] >= 2500:
-				self.speed['x'] = 2500
-			if self.speed['y'] < self.ball_data['spd']['y']:
-				self.speed['y'] = self.ball_data['spd']['y']
+			if (padel.position.x < 0 and padel.position.x <= point_contact['x']) \
+				or (padel.position.x > 0 and padel.position.x >= point_contact['x']):
+				self.direction.x *= -1
+			self.direction.y = 1 if segment == 'DA' else -1
+			self.speed.x += self.base_speed.x / 6
+			if self.speed.x >= 2500:
+				self.speed.x = 2500
+			if self.speed.y < self.base_speed.y:
+				self.speed.y = self.base_speed.y
 			if padel.direction == 0:
-				self.incrased_y_speed(self.ball_data['spd']['y'] * 0.75)
-			elif padel.direction != self.direction['y']:
-				self.incrased_y_speed(self.ball_data['spd']['y'])
+				self.incrased_y_speed(self.base_speed.y * 0.75)
+			elif padel.direction != self.direction.y:
+				self.incrased_y_speed(self.base_speed.y)
 			else:
-				self.incrased_y_speed(self.ball_data['spd']['y'] / 2)
+				self.incrased_y_speed(self.base_speed.y / 2)
 
 	def padel_contact(self, physic_position, padel):
 		center_at_contact = physic_position['center_at_contact']
 		point_contact = physic_position['point_contact']
 		segment = physic_position['segment']
-		self.position['x'] = center_at_contact['x']
-		self.position['y'] = center_at_contact['y']
+		self.position.x = center_at_contact['x']
+		self.position.y = center_at_contact['y']
 		self.updateSpeedAndDir(padel, point_contact, segment)
 
 	def random_dir(self):
-		import random
-		return 1 if random.randint(1, 2) == 1 else -1
+		return 1 if self.rng.randint(1, 2) == 1 else -1
 
 	def random_y_speed(self):
-		import random
-		self.speed['y'] *= random.choice([0.5, 0.75, 1, 1.25, 1.5])
+		self.speed.y *= self.rng.choice([0.5, 0.75, 1, 1.25, 1.5])
 
 	def normalize_speed(self):
-		s_resul = ((self.speed['x']**2 + self.speed['y']**2)**0.5)
+		# in place: the returned vector is reused by the next call
+		speed = self.speed
+		s_resul = ((speed.x**2 + speed.y**2)**0.5)
 		if s_resul != 0:
-			factorx = self.speed['x'] / s_resul
-			factory = self.speed['y'] / s_resul
-			return {
-				'x': self.speed['x'] * factorx,
-				'y': self.speed['y'] * factory
-			}
+			factorx = speed.x / s_resul
+			factory = speed.y / s_resul
+			self.normalized.set(speed.x * factorx, speed.y * factory)
 		else:
-			return {
-				'x': self.speed['x'],
-				'y': self.speed['y']
-			}	
\ No newline at end of file
+			self.normalized.set(speed.x, speed.y)
+		return self.normalized
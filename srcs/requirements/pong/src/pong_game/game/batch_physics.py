@@ -0,0 +1,162 @@
+"""
+Batched ball step for every running room of the process.
+
+Instead of calling Game.update room by room, the balls of all rooms are
+packed into contiguous NumPy arrays and advanced together: scoring
+detection, destination, padel contact detection and border bounce are each
+a handful of array operations whatever the number of rooms.
+
+The per-room work left in Python is the padel update (input driven) and the
+rare ball/padel contacts, which go through the regular Ball code so that
+speed and direction changes stay in one place. Results are written back to
+the Ball objects and each room gets the same state dict as Game.update
+would return.
+"""
+from ..utils.logger import logger
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+MAX_PADELS_PER_SIDE = 2
+
+def is_available():
+	return np is not None
+
+class BatchPhysics:
+	def __init__(self):
+		if np is None:
+			raise ImportError("numpy is required by the batched physics engine")
+
+	def __call__(self, games, dt):
+		return self.step(games, dt)
+
+	def step(self, games, dt):
+		states = [None] * len(games)
+		if not games:
+			return states
+		balls = [game.ball for game in games]
+		position = np.array([(ball.position.x, ball.position.y) for ball in balls], dtype=float)
+		rad = np.array([ball.rad for ball in balls], dtype=float)
+		border = np.array([(ball.border.x, ball.border.y) for ball in balls], dtype=float)
+
+		# Ball.is_scored
+		scored_left = position[:, 0] + rad == border[:, 0]
+		scored_right = position[:, 0] - rad == -border[:, 0]
+
+		moving = []
+		for i, game in enumerate(games):
+			game.tick(dt)
+			if scored_left[i]:
+				states[i] = game.scored('left')
+			elif scored_right[i]:
+				states[i] = game.scored('right')
+			else:
+				game.update_padels(dt)
+				if game.ball_can_move(dt):
+					moving.append(i)
+				else:
+					states[i] = game.export_state('gu')
+		if not moving:
+			return states
+
+		index = np.array(moving)
+		m_balls = [balls[i] for i in moving]
+		position = position[index]
+		rad = rad[index]
+		border = border[index]
+		direction = np.array([(ball.direction.x, ball.direction.y) for ball in m_balls], dtype=float)
+		speed = np.array([(ball.speed.x, ball.speed.y) for ball in m_balls], dtype=float)
+
+		# Ball.normalize_speed / Ball.get_destination. The norm is taken with
+		# Python floats: NumPy turns ** 0.5 into sqrt, which can differ from
+		# pow() by one ulp and make the two engines drift apart.
+		norm = np.array([(ball.speed.x**2 + ball.speed.y**2)**0.5 for ball in m_balls], dtype=float)
+		has_speed = norm != 0
+		factor = speed / np.where(has_speed, norm, 1.0)[:, None]
+		normalized = np.where(has_speed[:, None], speed * factor, speed)
+		destination = position + direction * normalized * dt
+
+		contact = self.padel_contacts(games, moving, position, destination, rad)
+
+		# Ball.update_ball_position border handling, for the balls touching no padel
+		collider = destination + rad[:, None] * direction
+		inside = (collider <= border) & (collider >= -border)
+		new_position = np.where(inside, destination, direction * border - direction * rad[:, None])
+		new_direction = np.where(inside, direction, -direction)
+
+		for j, i in enumerate(moving):
+			game = games[i]
+			if contact[j]:
+				# rare path: let the Ball code resolve the contact exactly
+				type = game.ball.update_ball_position(game.get_players_in_side, dt)
+				states[i] = game.export_state(type)
+				continue
+			ball = m_balls[j]
+			ball.position.x = float(new_position[j, 0])
+			ball.position.y = float(new_position[j, 1])
+			ball.direction.x = int(new_direction[j, 0])
+			ball.direction.y = int(new_direction[j, 1])
+			states[i] = game.export_state('gu')
+		return states
+
+	def padel_contacts(self, games, moving, position, destination, rad):
+		"""
+		Boolean array, True for the rooms whose ball touches a padel during
+		this step or is being pushed by one (padel.ball_contact).
+		"""
+		count = len(moving)
+		contact = np.zeros(count, dtype=bool)
+		rects = np.full((MAX_PADELS_PER_SIDE, count, 4), np.nan)
+		for j, i in enumerate(moving):
+			game = games[i]
+			side = 'right' if destination[j, 0] > 0 else 'left'
+			for k, player in enumerate(game.get_players_in_side(side)):
+				padel = player.padel
+				if padel.ball_contact or k >= MAX_PADELS_PER_SIDE:
+					contact[j] = True
+					break
+				hitbox = padel.get_hitbox()
+				rects[k, j] = (hitbox.left, hitbox.right, hitbox.bottom, hitbox.top)
+		x0 = position[:, 0]
+		y0 = position[:, 1]
+		x1 = destination[:, 0]
+		y1 = destination[:, 1]
+		with np.errstate(divide='ignore', invalid='ignore'):
+			for k in range(MAX_PADELS_PER_SIDE):
+				left, right, bottom, top = rects[k].T
+				hit = sweep_circle_rects(x0, y0, x1, y1, rad, left, right, bottom, top)
+				contact |= hit & ~np.isnan(left)
+		return contact
+
+def sweep_circle_rects(x0, y0, x1, y1, r, left, right, bottom, top):
+	"""
+	Array version of collisions.is_resting_on_rect + sweep_circle_rect,
+	True where get_position_physic would report a contact.
+	"""
+	dx = x1 - x0
+	dy = y1 - y0
+	r_sq = r * r
+	clip_x = np.minimum(np.maximum(x0, left), right)
+	clip_y = np.minimum(np.maximum(y0, bottom), top)
+	resting = ((x0 - right) ** 2 + (y0 - clip_y) ** 2 == r_sq) \
+		| ((x0 - clip_x) ** 2 + (y0 - bottom) ** 2 == r_sq) \
+		| ((x0 - left) ** 2 + (y0 - clip_y) ** 2 == r_sq) \
+		| ((x0 - clip_x) ** 2 + (y0 - top) ** 2 == r_sq)
+	hit = np.zeros(x0.shape, dtype=bool)
+	# AB / CD: right and left faces
+	for plane, moving_in, sign in ((right + r, dx < 0, 1), (left - r, dx > 0, -1)):
+		d0 = sign * (x0 - plane)
+		d1 = sign * (x1 - plane)
+		t = d0 / (d0 - d1)
+		y = y0 + t * dy
+		hit |= moving_in & (d0 >= 0) & (d1 < 0) & (bottom - r <= y) & (y <= top + r)
+	# BC / DA: bottom and top faces
+	for plane, moving_in, sign in ((bottom - r, dy > 0, -1), (top + r, dy < 0, 1)):
+		d0 = sign * (y0 - plane)
+		d1 = sign * (y1 - plane)
+		t = d0 / (d0 - d1)
+		x = x0 + t * dx
+		hit |= moving_in & (d0 >= 0) & (d1 < 0) & (left - r <= x) & (x <= right + r)
+	return hit & ~resting
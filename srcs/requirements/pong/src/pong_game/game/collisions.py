@@ -1,107 +1,122 @@
-import numpy as np
 from ..utils.logger import logger
 
-def is_point_near_segment(point, segment_start, segment_end, radius):
-    """
-    Vérifie si un point est à une distance inférieure ou égale à `radius` d'un segment défini par `segment_start` et `segment_end`.
-    """
-    # Vecteurs
-    seg_vec = segment_end - segment_start
-    point_vec = point - segment_start
-
-    # Projection scalaire
-    seg_len_sq = np.dot(seg_vec, seg_vec)
-    proj = np.dot(point_vec, seg_vec) / seg_len_sq if seg_len_sq != 0 else 0
-    proj_clamped = np.clip(proj, 0, 1)
-
-    # Point projeté sur le segment
-    closest_point = segment_start + proj_clamped * seg_vec
-
-    # Distance du point projeté au point initial
-    distance_sq = np.sum((point - closest_point) ** 2)
-    return distance_sq == radius ** 2
-
-# Calculates the intersection point between the ball's trajectory and a segment with the ball's radius
-def intersec_point(A, B, ball_pos, ball_dest, r):
-	ball_dir = ball_dest - ball_pos  # Ball's direction vector
-	seg_dir = B - A  # Segment direction vector
-	
-	# Check if the ball direction and segment are parallel
-	if np.cross(seg_dir, ball_dir) == 0:
-		return None, None
-
-	t1 = np.cross((ball_pos - A), ball_dir) / np.cross(seg_dir, ball_dir)
-	intersec = A + t1 * seg_dir  # Intersection point on the segment
-	
-	# Ensure the intersection is within the segment bounds
-	if not (0 <= t1 <= 1):
-		return None, None
-
-	dist_ball_travel = np.linalg.norm(ball_dest - ball_pos)  # Total ball travel distance
-	dist_to_intersec = np.linalg.norm(intersec - ball_pos)  # Distance to intersection
-	
-	# Check if the intersection is within the distance the ball will travel
-	if dist_to_intersec > dist_ball_travel:
-		return None, None
-
-	# Calculate normal to the segment
-	seg_normal = np.array([-seg_dir[1], seg_dir[0]])
-	seg_normal /= np.linalg.norm(seg_normal)  # Normalize
-
-	# Check if the ball is heading towards the segment
-	to_dest = np.dot(ball_dest - intersec, seg_normal)
-	if to_dest >= 0:
-		return None, None
-
-	# Compute contact point by adjusting for ball radius
-	contact_point = intersec
-	ball_center_contact = contact_point + seg_normal * r
-
-	return ball_center_contact, contact_point
+# The padel hitbox is the axis-aligned rectangle of Padel.get_hitbox():
+#
+#   D ---- A      AB: right face  (outward normal +x)
+#   |      |      BC: bottom face (outward normal -y)
+#   |      |      CD: left face   (outward normal -x)
+#   C ---- B      DA: top face    (outward normal +y)
+#
+# Everything below works on plain floats: no temporary vectors are built,
+# the per-tick cost is a handful of multiplications and comparisons.
+
+def segment_distance_sq(px, py, sx, sy, ex, ey):
+	"""
+	Squared distance between the point (px, py) and the axis-aligned segment
+	going from (sx, sy) to (ex, ey).
+	"""
+	if sx == ex:
+		cy = min(max(py, min(sy, ey)), max(sy, ey))
+		return (px - sx) ** 2 + (py - cy) ** 2
+	cx = min(max(px, min(sx, ex)), max(sx, ex))
+	return (px - cx) ** 2 + (py - sy) ** 2
+
+def is_resting_on_rect(x, y, r, left, right, bottom, top):
+	"""
+	True when the ball is exactly touching one of the faces, which is where
+	a previous contact leaves it. That contact has already been handled.
+	"""
+	r_sq = r * r
+	return segment_distance_sq(x, y, right, top, right, bottom) == r_sq \
+		or segment_distance_sq(x, y, right, bottom, left, bottom) == r_sq \
+		or segment_distance_sq(x, y, left, bottom, left, top) == r_sq \
+		or segment_distance_sq(x, y, left, top, right, top) == r_sq
+
+def sweep_circle_rect(x0, y0, x1, y1, r, left, right, bottom, top):
+	"""
+	Swept circle against an axis-aligned rectangle.
+
+	The circle of radius `r` moves in a straight line from (x0, y0) to
+	(x1, y1). Each face is pushed outward by `r` (the rectangle grown by the
+	ball radius, with square corners) and the earliest face crossed while
+	moving inward is the contact.
+
+	Returns (t, segment) with t in [0, 1] the fraction of the move done at
+	contact time, or None.
+	"""
+	dx = x1 - x0
+	dy = y1 - y0
+	best_t = None
+	segment = None
+	# AB: right face
+	if dx < 0:
+		d0 = x0 - (right + r)
+		d1 = x1 - (right + r)
+		if d0 >= 0 > d1:
+			t = d0 / (d0 - d1)
+			y = y0 + t * dy
+			if bottom - r <= y <= top + r:
+				best_t, segment = t, 'AB'
+	# BC: bottom face
+	if dy > 0:
+		d0 = (bottom - r) - y0
+		d1 = (bottom - r) - y1
+		if d0 >= 0 > d1:
+			t = d0 / (d0 - d1)
+			x = x0 + t * dx
+			if left - r <= x <= right + r and (best_t is None or t < best_t):
+				best_t, segment = t, 'BC'
+	# CD: left face
+	if dx > 0:
+		d0 = (left - r) - x0
+		d1 = (left - r) - x1
+		if d0 >= 0 > d1:
+			t = d0 / (d0 - d1)
+			y = y0 + t * dy
+			if bottom - r <= y <= top + r and (best_t is None or t < best_t):
+				best_t, segment = t, 'CD'
+	# DA: top face
+	if dy < 0:
+		d0 = y0 - (top + r)
+		d1 = y1 - (top + r)
+		if d0 >= 0 > d1:
+			t = d0 / (d0 - d1)
+			x = x0 + t * dx
+			if left - r <= x <= right + r and (best_t is None or t < best_t):
+				best_t, segment = t, 'DA'
+	if segment is None:
+		return None
+	return best_t, segment
 
 # Main function to get ball and padel collision position
+# ball_pos / ball_dest: objects with x and y (Vec2, Vec3), pad: a Hitbox
 def get_position_physic(ball_pos, ball_dest, r, pad):
-    b_pos = np.array([ball_pos['x'], ball_pos['y']])
-    b_dest = np.array([ball_dest['x'], ball_dest['y']])
-
-    A = np.array([pad['A']['x'], pad['A']['y']])
-    B = np.array([pad['B']['x'], pad['B']['y']])
-    C = np.array([pad['C']['x'], pad['C']['y']])
-    D = np.array([pad['D']['x'], pad['D']['y']])
-
-    segments = [(A, B), (B, C), (C, D), (D, A)]
-    for i, (start, end) in enumerate(segments):
-        if is_point_near_segment(b_pos, start, end, r):
-            logger.debug("in coll")
-            return None  # Collision détectée avec le paddle
-
-    # Check all four segments of the paddle for a potential collision
-    contact_AB, point_AB = intersec_point(A, B, b_pos, b_dest, r)
-    contact_BC, point_BC = intersec_point(B, C, b_pos, b_dest, r)
-    contact_CD, point_CD = intersec_point(C, D, b_pos, b_dest, r)
-    contact_DA, point_DA = intersec_point(D, A, b_pos, b_dest, r)
-
-    # Store all potential contact points
-    positions = [
-        (contact_AB, point_AB, "AB"),
-        (contact_BC, point_BC, "BC"),
-        (contact_CD, point_CD, "CD"),
-        (contact_DA, point_DA, "DA")
-    ]
-
-    # Filter out any segments without a valid intersection
-    positions = [(c, p, name) for c, p, name in positions if c is not None]
-
-    # Return the closest contact point, if any
-    if positions:
-        closest_contact, contact_point, segment_name = min(
-            positions, key=lambda item: np.linalg.norm(item[0] - b_pos)
-        )
-        return {
-            'center_at_contact': {'x': closest_contact[0], 'y': closest_contact[1]},
-            'point_contact': {'x': contact_point[0], 'y': contact_point[1]},
-            'segment': segment_name
-        }
-    else:
-        return None
-
+	left = pad.left
+	right = pad.right
+	bottom = pad.bottom
+	top = pad.top
+	x0 = ball_pos.x
+	y0 = ball_pos.y
+	if is_resting_on_rect(x0, y0, r, left, right, bottom, top):
+		logger.debug("in coll")
+		return None
+	hit = sweep_circle_rect(x0, y0, ball_dest.x, ball_dest.y, r, left, right, bottom, top)
+	if hit is None:
+		return None
+	t, segment = hit
+	cx = x0 + t * (ball_dest.x - x0)
+	cy = y0 + t * (ball_dest.y - y0)
+	# contact point: projection of the centre on the face it touches
+	if segment == 'AB':
+		point = {'x': right, 'y': min(max(cy, bottom), top)}
+	elif segment == 'CD':
+		point = {'x': left, 'y': min(max(cy, bottom), top)}
+	elif segment == 'BC':
+		point = {'x': min(max(cx, left), right), 'y': bottom}
+	else:
+		point = {'x': min(max(cx, left), right), 'y': top}
+	return {
+		'center_at_contact': {'x': cx, 'y': cy},
+		'point_contact': point,
+		'segment': segment
+	}
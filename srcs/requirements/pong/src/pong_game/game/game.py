@@ -1,12 +1,16 @@
 from .player import Player
 from .ball import Ball
 from ..utils.logger import logger
-from .getdata import get_data
+from .getdata import get_data, thaw
+from .replay import ReplayRecorder
+import random
 
 class Game:
-	def __init__(self, players, game_mode, modifiers, teamlist=None):  # add teams list
-		from .timer import Timer
-		import random
+	def __init__(self, players, game_mode, modifiers, teamlist=None, seed=None, record=True):  # add teams list
+		# every random draw of the match comes from its seed (see replay.py)
+		self.seed = random.getrandbits(32) if seed is None else seed
+		self.rng = random.Random(self.seed)
+		self.recorder = ReplayRecorder(self.seed, game_mode, modifiers, players, teamlist) if record else None
 	
 		sides = ['left', 'right']
 		logger.debug(f"TEAM LIST DANS LA CLASSE GAME: {teamlist}")
@@ -38,7 +42,7 @@ class Game:
 						logger.debug(f"{username} ajouté à l'équipe {side} !")
 		else:
 			# Attribution aléatoire si teamlist est vide ou invalide
-			random.shuffle(sides)
+			self.rng.shuffle(sides)
 			for i, (username, player_consumer) in enumerate(players.items()):
 				side = sides[i % len(sides)]
 				self.players[username] = Player(username, player_consumer, side, game_mode, modifiers)
@@ -46,57 +50,88 @@ class Game:
 				logger.debug(f"{username} est assigné à l'équipe {side} de façon aléatoire !")
 	
 		# Initialisation des autres éléments du jeu
-		self.ball = Ball(modifiers)
-		self.timer = Timer()
-		self.timer.settup(None)
-		self.wait = 3
+		self.ball = Ball(modifiers, self.rng)
+		self.wait = 3 # seconds of simulated time before the ball moves
+		self.time = 0.0 # simulated time since the start of the game
+		self.steps = 0 # fixed steps run
 		maps = ['mountain', 'island']
-		random.shuffle(maps)
+		self.rng.shuffle(maps)
 		self.map = maps[0]
 	
 		logger.debug(f"Configuration finale des équipes : {self.players_in_side}")
 	
 	
 	def input_players(self, username, input):
-		self.players[username].move_padel(input)
+		# applied once per tick, by update_padels
+		return self.players[username].queue_input(input)
 
-	def update(self):
-		type = "gu"
+	def update(self, dt):
+		"""
+		Advance the simulation by exactly `dt` seconds of game time.
+		"""
+		self.tick(dt)
 		scoring_side = self.ball.is_scored()
 		if scoring_side != None:
 			return self.scored(scoring_side)
-		for username in self.players:
-			self.players[username].padel.update_padel_position(self.ball)
-		if (self.timer.waiting(self.wait)):
+		self.update_padels(dt)
+		type = "gu"
+		if self.ball_can_move(dt):
+			type = self.ball.update_ball_position(self.get_players_in_side, dt)
+		return self.export_state(type)
+
+	def tick(self, dt):
+		self.time += dt
+		self.steps += 1
+		if self.steps == 1 and self.recorder:
+			self.recorder.start(dt)
+
+	def update_padels(self, dt):
+		for index, player in enumerate(self.players.values()):
+			command = player.apply_input()
+			if command is not None and self.recorder:
+				self.recorder.input(self.steps, index, command)
+			player.padel.update_padel_position(self.ball, dt)
+
+	def ball_can_move(self, dt):
+		# consumes the waiting time at the start of each point
+		if self.wait > 0:
+			self.wait -= dt
+		if self.wait <= 0:
 			self.wait = 0
-			type = self.ball.update_ball_position(self.get_players_in_side)
-		else:
-			self.ball.timer.reset()
+			return True
+		return False
+
+	def export_state(self, type):
+		ball = self.ball
+		speed = ball.normalize_speed()
 		return {
 			'type': type, #game update
-			'bp': self.ball.position,
+			'bp': ball.position.to_dict(),
 			'bs': {
-				'x': self.ball.normalize_speed()['x'] * self.ball.direction['x'],
-				'y': self.ball.normalize_speed()['y'] * self.ball.direction['y']
+				'x': speed.x * ball.direction.x,
+				'y': speed.y * ball.direction.y
 			},
-			'pp': self.export_padels_position()
+			'pp': self.export_padels_position(),
+			# the step the state comes from, published later (trajectory.py)
+			't': self.time,
+			'moving': self.wait <= 0
 		}
 
 	def export_padels_position(self):
 		if self.game_mode == 'PONG_CLASSIC' or self.game_mode == 'PONG_CLASSIC_AI':
 		# Mode 1v1
 			return {
-				'p1': self.players_in_side['left'][0].padel.position['y'],
-				'p2': self.players_in_side['right'][0].padel.position['y']
+				'p1': self.players_in_side['left'][0].padel.position.y,
+				'p2': self.players_in_side['right'][0].padel.position.y
 			}
 		elif self.game_mode == 'PONG_DUO':
 			# Mode 2v2
 			padels_position = {
-				f'p{i + 1}': player.padel.position['y']
+				f'p{i + 1}': player.padel.position.y
 				for i, player in enumerate(self.players_in_side['left'])
 			}
 			padels_position.update({
-				f'p{i + 3}': player.padel.position['y']
+				f'p{i + 3}': player.padel.position.y
 				for i, player in enumerate(self.players_in_side['right'])
 			})
 			return padels_position
@@ -106,10 +141,10 @@ class Game:
 
 	def export_data(self):
 		return {
-			'input': get_data(self.modifiers, 'input_data'),
-			'key': get_data(self.modifiers, 'key_data'),
-			'arena': get_data(self.modifiers, 'arena_data'),
-			'ball': get_data(self.modifiers, 'ball_data'),
+			'input': thaw(get_data(self.modifiers, 'input_data')),
+			'key': thaw(get_data(self.modifiers, 'key_data')),
+			'arena': thaw(get_data(self.modifiers, 'arena_data')),
+			'ball': thaw(get_data(self.modifiers, 'ball_data')),
 			'padel': self.get_players_in_side('right')[0].padel.export_padel_data(),
 			'teams': self.export_teams(),
 			'map': self.map,
@@ -141,6 +176,8 @@ class Game:
 		return None
 	
 	def scored(self, scoring_side):
+		if self.recorder:
+			self.recorder.event(self.steps, 'scored_' + scoring_side)
 		self.ball.reset_position()
 		self.score[scoring_side] += 1
 		if self.score[scoring_side] >= 3:
@@ -151,7 +188,6 @@ class Game:
 				'team': str(scoring_side),
 			}
 		else:
-			self.timer.reset()
 			self.wait = 1
 			return {
 				'type': 'scored',
@@ -161,10 +197,20 @@ class Game:
 			}
 		
 	def give_up(self, win_team):
+		if self.recorder:
+			self.recorder.event(self.steps, 'give_up_' + str(win_team))
 		return {
 			'type': 'game_end',
 			'reason': 'The ' + str(win_team) + ' side wins !',
 			'score': str(self.score[win_team]),
 			'team': str(win_team),
 		} 
-		
\ No newline at end of file
+
+	def end_recording(self):
+		if self.recorder:
+			self.recorder.event(self.steps, 'end')
+		return self.recorder
+
+def update_games(games, dt):
+	# default engine of the tick_scheduler: one Game.update per room
+	return [game.update(dt) for game in games]
@@ -1,6 +1,53 @@
 import copy
+import itertools
+from types import MappingProxyType
+from .data import data_vanilla, data_modifier_so_long, data_modifier_small_arena, \
+	data_modifier_elusive, data_modifier_border, data_modifier_perfection
+
+# Every data table of every combination of modifiers is built once, at
+# import, and frozen (read-only MappingProxyType all the way down): get_data
+# is a dict lookup and the tables can be shared by all the rooms. Objects
+# needing a mutable copy of a part (a position, a speed) take it with thaw().
+
+MODIFIERS = ('so_long', 'small_arena', 'elusive', 'border', 'perfection')
+DATA_NAMES = ('key_data', 'input_data', 'ball_data', 'padel_data', 'arena_data')
 
 def get_data(modifiers, data_name):
+	"""
+	Frozen data table `data_name` for the given modifiers.
+	"""
+	if data_name not in DATA_NAMES:
+		raise ValueError(f"Data with name '{data_name}' not found in 'data_vanilla'.")
+	return TABLES[modifiers_key(modifiers)][data_name]
+
+def parse_modifiers(modifiers):
+	"""
+	Names of the modifiers, given as a list or as the comma separated string
+	the game_manager sends.
+	"""
+	if not modifiers:
+		return []
+	if isinstance(modifiers, str):
+		modifiers = modifiers.split(',')
+	return [modifier.strip() for modifier in modifiers if modifier.strip()]
+
+def modifiers_key(modifiers):
+	return frozenset(modifier for modifier in parse_modifiers(modifiers) if modifier in MODIFIERS)
+
+def freeze(data):
+	if isinstance(data, dict):
+		return MappingProxyType({key: freeze(value) for key, value in data.items()})
+	return data
+
+def thaw(data):
+	"""
+	Mutable (deep) copy of a frozen table or of a part of it.
+	"""
+	if isinstance(data, (dict, MappingProxyType)):
+		return {key: thaw(value) for key, value in data.items()}
+	return data
+
+def build_data(modifiers, data_name):
 	data = get_data_vanilla(data_name)
 	if modifiers == None or data_name == 'key_data' or data_name == 'input_data':
 		return data
@@ -17,50 +64,42 @@ def get_data(modifiers, data_name):
 	return data
 
 def get_data_vanilla(data_name):
-	from .data.data_vanilla import key_data, input_data, ball_data, padel_data, arena_data
-	data_dict = {
-		'key_data': key_data,
-		'input_data': input_data,
-		'ball_data': ball_data,
-		'padel_data': padel_data,
-		'arena_data': arena_data
-	}
-	data = copy.deepcopy(data_dict.get(data_name))
+	data = copy.deepcopy(getattr(data_vanilla, data_name, None))
 	if data is None:
 		raise ValueError(f"Data with name '{data_name}' not found in 'data_vanilla'.")
 	return data
 
 def get_data_modifer_so_long(data, data_name):
-	from .data.data_modifier_so_long import ball_data, padel_data, arena_data
-	select_data(data, data_name, ball_data, padel_data, arena_data)
+	module = data_modifier_so_long
+	select_data(data, data_name, module.ball_data, module.padel_data, module.arena_data)
 	if data is None:
 		raise ValueError(f"Data with name '{data_name}' not found in 'so_long'.")
 	return data
 
 def get_data_modifer_small_arena(data, data_name):
-	from .data.data_modifier_small_arena import ball_data, padel_data, arena_data
-	select_data(data, data_name, ball_data, padel_data, arena_data)
+	module = data_modifier_small_arena
+	select_data(data, data_name, module.ball_data, module.padel_data, module.arena_data)
 	if data is None:
 		raise ValueError(f"Data with name '{data_name}' not found in 'small_arena'.")
 	return data
 
 def get_data_modifer_elusive(data, data_name):
-	from .data.data_modifier_elusive import ball_data, padel_data, arena_data
-	select_data(data, data_name, ball_data, padel_data, arena_data)
+	module = data_modifier_elusive
+	select_data(data, data_name, module.ball_data, module.padel_data, module.arena_data)
 	if data is None:
 		raise ValueError(f"Data with name '{data_name}' not found in 'elusive'.")
 	return data
 
 def get_data_modifer_border(data, data_name):
-	from .data.data_modifier_border import ball_data, padel_data, arena_data
-	select_data(data, data_name, ball_data, padel_data, arena_data)
+	module = data_modifier_border
+	select_data(data, data_name, module.ball_data, module.padel_data, module.arena_data)
 	if data is None:
 		raise ValueError(f"Data with name '{data_name}' not found in 'border'.")
 	return data
 
 def get_data_modifer_perfection(data, data_name):
-	from .data.data_modifier_perfection import ball_data, padel_data, arena_data
-	select_data(data, data_name, ball_data, padel_data, arena_data)
+	module = data_modifier_perfection
+	select_data(data, data_name, module.ball_data, module.padel_data, module.arena_data)
 	if data is None:
 		raise ValueError(f"Data with name '{data_name}' not found in 'border'.")
 	return data
@@ -82,3 +121,14 @@ def modifer_data(data1, data2):
 		else:
 			for sub_data_name in data1[data_name]:
 				data1[data_name][sub_data_name] *= data2[data_name][sub_data_name]
+
+def build_tables():
+	tables = {}
+	for count in range(len(MODIFIERS) + 1):
+		for modifiers in itertools.combinations(MODIFIERS, count):
+			tables[frozenset(modifiers)] = MappingProxyType({
+				data_name: freeze(build_data(modifiers, data_name)) for data_name in DATA_NAMES
+			})
+	return MappingProxyType(tables)
+
+TABLES = build_tables()
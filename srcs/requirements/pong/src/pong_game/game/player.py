@@ -1,7 +1,17 @@
 from .padel import Padel
-from .timer import Timer
 from .getdata import get_data
 
+# An input only changes the direction of the padel (see Padel.up, down,
+# stop_up, stop_down): as a command it is the direction it gives to each
+# current direction (-1, 0, 1), and the inputs received during a tick
+# compose into a single command.
+COMMANDS = {
+	'up': (1, 1, 1),
+	'down': (-1, -1, -1),
+	'stop_up': (-1, 0, 0),
+	'stop_down': (0, 0, 1),
+}
+
 class Player:
 	def __init__(self, username, player_consumer, side, game_mode, modifiers):
 		self.player_consumer = player_consumer
@@ -9,14 +19,31 @@ class Player:
 		self.username = username
 		self.padel = Padel(self, game_mode, modifiers)
 		self.input_data = get_data(modifiers, 'input_data')
+		self.commands = {self.input_data[name]: command for name, command in COMMANDS.items()}
+		self.stops = {self.input_data['stop_up'], self.input_data['stop_down']}
+		self.pending = None
+
+	def is_stop(self, input):
+		return input in self.stops
+
+	def queue_input(self, input):
+		"""
+		Composes an input with the ones received since the last tick. Returns
+		None for an unknown input, True when it was merged into a pending one.
+		"""
+		command = self.commands.get(input)
+		if command is None:
+			return None
+		if self.pending is None:
+			self.pending = command
+			return False
+		self.pending = tuple(command[direction + 1] for direction in self.pending)
+		return True
 
-	def move_padel(self, input):
-		
-		if input == self.input_data['up']:
-			self.padel.up()
-		elif input == self.input_data['down']:
-			self.padel.down()
-		elif input == self.input_data['stop_up']:
-			self.padel.stop_up()
-		elif input == self.input_data['stop_down']:
-			self.padel.stop_down()
\ No newline at end of file
+	def apply_input(self):
+		# the command applied, if any
+		command = self.pending
+		if command is not None:
+			self.padel.direction = command[self.padel.direction + 1]
+			self.pending = None
+		return command
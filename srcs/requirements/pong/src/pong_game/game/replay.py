@@ -0,0 +1,166 @@
+"""
+Recording of a match, and its playback by simulation.
+
+The simulation only depends on its seed (Game.rng), its parameters and the
+commands applied to the padels at each fixed step: a recording holds
+nothing else, a match of a few minutes is a few hundred bytes, and Replay
+simulates it again, state for state, much faster than real time.
+
+Layout (little endian), written once and then only appended to:
+
+header	4s magic	B version	I seed	d dt	H meta length
+meta	JSON: game_mode, modifiers, players (in the order given to Game),
+	teamlist
+records	varint steps since the previous record, then a byte:
+	0b0ppccccc	input: command c (COMMAND_CODES) applied to the padel of
+			player p (index in Game.players) at this step
+	0b1eeeeeee	event e (EVENTS) at this step
+
+The steps are counted from 1 (the first Game.update). 'end' is the last
+record: the step the match stopped at, whatever the reason.
+"""
+import json
+import struct
+from .getdata import parse_modifiers
+
+MAGIC = b'PGRP'
+REPLAY_VERSION = 1
+HEADER = struct.Struct('<4sBIdH')
+EVENT_FLAG = 0x80
+
+# a command maps each padel direction (-1, 0, 1) to a new one, see player.py
+COMMAND_CODES = {}
+for code in range(27):
+	COMMAND_CODES[(code % 3 - 1, code // 3 % 3 - 1, code // 9 - 1)] = code
+COMMANDS = {code: command for command, code in COMMAND_CODES.items()}
+
+EVENTS = {
+	'scored_left': 1,
+	'scored_right': 2,
+	'give_up_left': 3, # left wins, the right side left
+	'give_up_right': 4,
+	'end': 5,
+}
+EVENT_NAMES = {code: name for name, code in EVENTS.items()}
+
+class ReplayError(ValueError):
+	pass
+
+class ReplayRecorder:
+	def __init__(self, seed, game_mode, modifiers, players, teamlist):
+		self.seed = seed
+		self.meta = json.dumps({
+			'game_mode': game_mode,
+			'modifiers': parse_modifiers(modifiers),
+			'players': list(players),
+			'teamlist': teamlist,
+		}, separators=(',', ':')).encode()
+		self.data = bytearray()
+		self.last_step = 0
+		self.ended = False
+
+	def start(self, dt):
+		# first step: the header carries the timestep
+		self.data += HEADER.pack(MAGIC, REPLAY_VERSION, self.seed, dt, len(self.meta))
+		self.data += self.meta
+
+	def input(self, step, player_index, command):
+		self.record(step, player_index << 5 | COMMAND_CODES[command])
+
+	def event(self, step, name):
+		if self.ended:
+			return
+		self.record(step, EVENT_FLAG | EVENTS[name])
+		if name == 'end':
+			self.ended = True
+
+	def record(self, step, code):
+		if not self.data:
+			return
+		delta = step - self.last_step
+		self.last_step = step
+		while delta > 0x7f:
+			self.data.append(delta & 0x7f | 0x80)
+			delta >>= 7
+		self.data.append(delta)
+		self.data.append(code)
+
+class Replay:
+	"""
+	A parsed recording. play() simulates it again.
+	"""
+	def __init__(self, data):
+		data = bytes(data)
+		if len(data) < HEADER.size:
+			raise ReplayError("recording too short")
+		magic, version, self.seed, self.dt, meta_length = HEADER.unpack_from(data)
+		if magic != MAGIC or version != REPLAY_VERSION:
+			raise ReplayError("not a pong recording, or of another version")
+		try:
+			meta = json.loads(data[HEADER.size:HEADER.size + meta_length])
+		except ValueError:
+			raise ReplayError("corrupted recording")
+		self.game_mode = meta['game_mode']
+		self.modifiers = meta['modifiers']
+		self.players = meta['players']
+		self.teamlist = meta['teamlist']
+		self.inputs = {} # step: [(player index, command)]
+		self.events = [] # (step, name)
+		self.end_step = None
+		step = 0
+		offset = HEADER.size + meta_length
+		try:
+			while offset < len(data):
+				delta = shift = 0
+				while True:
+					byte = data[offset]
+					offset += 1
+					delta |= (byte & 0x7f) << shift
+					shift += 7
+					if not byte & 0x80:
+						break
+				step += delta
+				code = data[offset]
+				offset += 1
+				if code & EVENT_FLAG:
+					name = EVENT_NAMES[code & 0x7f]
+					self.events.append((step, name))
+					if name == 'end':
+						self.end_step = step
+				else:
+					self.inputs.setdefault(step, []).append((code >> 5, COMMANDS[code & 0x1f]))
+		except (IndexError, KeyError):
+			raise ReplayError("truncated or corrupted recording")
+
+	def game(self):
+		from .game import Game
+		return Game(dict.fromkeys(self.players), self.game_mode, self.modifiers, self.teamlist,
+			seed=self.seed, record=False)
+
+	def play(self, until=None):
+		"""
+		Yields (step, state) for every step of the match, up to the step
+		`until`, the end of the recording or the end of the game. The
+		recorded scores are checked against the simulated ones: a
+		divergence raises ReplayError.
+		"""
+		game = self.game()
+		players = list(game.players.values())
+		scored = [(step, name) for step, name in self.events if name.startswith('scored')]
+		last = self.end_step or max(list(self.inputs) + [step for step, _ in self.events] + [0])
+		if until is not None:
+			last = min(last, until)
+		for step in range(1, last + 1):
+			for index, command in self.inputs.get(step, ()):
+				players[index].pending = command
+			state = game.update(self.dt)
+			if state['type'] in ('scored', 'game_end') and 'team' in state:
+				expected = scored.pop(0) if scored else None
+				if expected != (step, f"scored_{state['team']}"):
+					raise ReplayError(f"replay diverged at step {step}: {state['type']} {state['team']}, recorded {expected}")
+			yield step, state
+			if state['type'] == 'game_end':
+				return
+		for step, name in self.events:
+			if name.startswith('give_up') and step <= last:
+				yield step, game.give_up(name.rsplit('_', 1)[1])
@@ -0,0 +1,68 @@
+# Compact value types of the simulation. They are updated in place during a
+# tick and only turned into dicts (to_dict) when a state is exported.
+
+class Vec2:
+	__slots__ = ('x', 'y')
+
+	def __init__(self, x=0.0, y=0.0):
+		self.x = x
+		self.y = y
+
+	@classmethod
+	def from_dict(cls, data):
+		return cls(data['x'], data['y'])
+
+	def set(self, x, y):
+		self.x = x
+		self.y = y
+
+	def to_dict(self):
+		return {'x': self.x, 'y': self.y}
+
+	def __repr__(self):
+		return f"Vec2({self.x}, {self.y})"
+
+class Vec3:
+	__slots__ = ('x', 'y', 'z')
+
+	def __init__(self, x=0.0, y=0.0, z=0.0):
+		self.x = x
+		self.y = y
+		self.z = z
+
+	@classmethod
+	def from_dict(cls, data):
+		return cls(data['x'], data['y'], data['z'])
+
+	def to_dict(self):
+		return {'x': self.x, 'y': self.y, 'z': self.z}
+
+	def __repr__(self):
+		return f"Vec3({self.x}, {self.y}, {self.z})"
+
+class Hitbox:
+	"""
+	Axis-aligned rectangle of a padel, see collisions.py for the faces.
+	"""
+	__slots__ = ('left', 'right', 'bottom', 'top')
+
+	def __init__(self):
+		self.left = self.right = self.bottom = self.top = 0.0
+
+	def update(self, x, y, size_x, size_y):
+		self.left = x - size_x / 2
+		self.right = x + size_x / 2
+		self.bottom = y - size_y / 2
+		self.top = y + size_y / 2
+
+	def to_dict(self):
+		# corners, as named by collisions.py
+		return {
+			'A': {'x': self.right, 'y': self.top},
+			'B': {'x': self.right, 'y': self.bottom},
+			'C': {'x': self.left, 'y': self.bottom},
+			'D': {'x': self.left, 'y': self.top}
+		}
+
+	def __repr__(self):
+		return f"Hitbox({self.left}, {self.right}, {self.bottom}, {self.top})"
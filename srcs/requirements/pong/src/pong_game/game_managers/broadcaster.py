@@ -0,0 +1,142 @@
+from ..utils.logger import logger
+from ..utils.metrics import metrics
+from . import wire
+import json
+import time
+import uuid
+
+ENCODE = metrics.phase('encode')
+CHANNEL_LAYER = metrics.phase('channel_layer')
+
+class Frame:
+	"""
+	A state to send, encoded at most once per format whatever the number of
+	consumers it is delivered to.
+
+	`variants` maps a stream (see delta.py, trajectory.py) to the
+	(frame, encoder) its subscribers get instead of this frame, the frame
+	being NO_FRAME when they get nothing this tick. `full_bytes` is then the
+	size of this frame, which the encoders compare what they send with.
+	"""
+	__slots__ = ('state', 'variants', 'full_bytes', '_text', '_binary')
+
+	def __init__(self, state):
+		self.state = state
+		self.variants = None
+		self.full_bytes = 0
+		self._text = None
+		self._binary = None
+
+	@property
+	def text(self):
+		if self._text is None:
+			start = time.perf_counter()
+			self._text = json.dumps(self.state)
+			ENCODE.observe(time.perf_counter() - start)
+		return self._text
+
+	@property
+	def binary(self):
+		"""
+		Binary frame of the state, None for the states only sent as JSON.
+		"""
+		if self._binary is None and wire.is_binary(self.state):
+			start = time.perf_counter()
+			self._binary = wire.encode_state(self.state)
+			ENCODE.observe(time.perf_counter() - start)
+		return self._binary
+
+class Broadcaster:
+	"""
+	Group fan-out for the consumers of this process.
+
+	Every room lives in the memory of a single process, so all the members of
+	its groups (game_id, admin_id) are local consumers: a group_send encodes
+	the state once and hands the same bytes to each of them directly. The
+	channel layer membership is kept in sync and is used:
+	- for groups with no local member (they live in another process),
+	- in addition to the local delivery for groups marked shared, whose
+	  members may also live elsewhere. Local members drop the channel layer
+	  copy of a message they already got.
+	"""
+
+	def __init__(self):
+		self.id = uuid.uuid4().hex
+		self.groups = {}
+		self.shared = set()
+		self.stats = {
+			'frames': 0,
+			'local_deliveries': 0,
+			'layer_sends': 0,
+		}
+
+	async def group_add(self, group, consumer):
+		self.groups.setdefault(group, set()).add(consumer)
+		start = time.perf_counter()
+		await consumer.channel_layer.group_add(group, consumer.channel_name)
+		CHANNEL_LAYER.observe(time.perf_counter() - start)
+
+	async def group_discard(self, group, consumer):
+		members = self.groups.get(group)
+		if members is not None:
+			members.discard(consumer)
+			if not members:
+				del self.groups[group]
+				self.shared.discard(group)
+		start = time.perf_counter()
+		await consumer.channel_layer.group_discard(group, consumer.channel_name)
+		CHANNEL_LAYER.observe(time.perf_counter() - start)
+
+	def forget(self, consumer):
+		for group in [group for group, members in self.groups.items() if consumer in members]:
+			self.groups[group].discard(consumer)
+			if not self.groups[group]:
+				del self.groups[group]
+				self.shared.discard(group)
+
+	def mark_shared(self, group, shared=True):
+		if shared:
+			self.shared.add(group)
+		else:
+			self.shared.discard(group)
+
+	def is_member(self, group, consumer):
+		return consumer in self.groups.get(group, ())
+
+	async def group_send(self, channel_layer, group, state, streams=None, frame=None):
+		"""
+		`frame`: the frame of `state` already sent to another group, its
+		encodings and stream variants are reused.
+		"""
+		if frame is None:
+			frame = Frame(state)
+			if streams:
+				frame.variants = {}
+				for name, encoder in streams.items():
+					variant = encoder.encode(state)
+					if variant is not state:
+						frame.variants[name] = (NO_FRAME if variant is None else Frame(variant), encoder)
+				if frame.variants:
+					full = frame.binary
+					frame.full_bytes = len(full if full is not None else frame.text)
+			self.stats['frames'] += 1
+		members = self.groups.get(group)
+		if members:
+			for consumer in list(members):
+				await consumer.send_frame(frame)
+			self.stats['local_deliveries'] += len(members)
+		if not members or group in self.shared:
+			self.stats['layer_sends'] += 1
+			start = time.perf_counter()
+			await channel_layer.group_send(group, {
+				'type': 'send_state',
+				'state': state,
+				'origin': self.id,
+				'group': group
+			})
+			CHANNEL_LAYER.observe(time.perf_counter() - start)
+		return frame
+
+NO_FRAME = Frame(None)
+
+broadcaster = Broadcaster()
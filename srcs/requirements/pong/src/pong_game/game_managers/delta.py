@@ -0,0 +1,88 @@
+"""
+Delta stream of the `gu` states of a room.
+
+Connections opened with `?delta=1` receive, instead of every full `gu`:
+- a keyframe (a regular `gu` holding every field) every KEYFRAME_INTERVAL
+  frames and when they join,
+- in between, `gd` frames holding only the fields that moved by more than
+  DELTA_THRESHOLD since the last emitted value of that field.
+
+The encoder is shared by all the delta subscribers of the room: its
+reference is the last value emitted for each field, which is exactly the
+state each subscriber rebuilt by merging the frames (websockets are
+ordered and reliable, every sent frame is received), so one encoding
+serves everyone.
+"""
+from .wire import DELTA_FIELDS as FIELDS
+import copy
+
+KEYFRAME_INTERVAL = 40 # frames (1 s at the 40 Hz tick)
+DELTA_THRESHOLD = 0.01 # arena units
+
+class DeltaEncoder:
+	def __init__(self, keyframe_interval=KEYFRAME_INTERVAL, threshold=DELTA_THRESHOLD):
+		self.keyframe_interval = keyframe_interval
+		self.threshold = threshold
+		self.reference = None
+		self.since_keyframe = 0
+		self.stats = {
+			'frames': 0,
+			'keyframes': 0,
+			'deltas': 0,
+			'skipped': 0,
+			'full_bytes': 0,
+			'sent_bytes': 0,
+		}
+
+	def encode(self, state):
+		"""
+		State to send to the delta subscribers for a `gu` state: the keyframe
+		(a full `gu`), a `gd` with the changed fields, or None when nothing
+		moved enough to be worth a frame. The other states are sent as is.
+		"""
+		if state['type'] != 'gu':
+			return state
+		self.stats['frames'] += 1
+		if self.reference is None or self.since_keyframe >= self.keyframe_interval \
+			or self.reference['pp'].keys() != state['pp'].keys():
+			self.reference = {
+				'bp': dict(state['bp']),
+				'bs': dict(state['bs']),
+				'pp': dict(state['pp'])
+			}
+			self.since_keyframe = 1
+			self.stats['keyframes'] += 1
+			return self.keyframe()
+		self.since_keyframe += 1
+		delta = {'type': 'gd'}
+		for group, key in FIELDS:
+			if key not in state[group]:
+				continue
+			value = state[group][key]
+			if abs(value - self.reference[group][key]) > self.threshold:
+				self.reference[group][key] = value
+				delta.setdefault(group, {})[key] = value
+		if len(delta) == 1:
+			self.stats['skipped'] += 1
+			return None
+		self.stats['deltas'] += 1
+		return delta
+
+	def keyframe(self):
+		"""
+		Full `gu` holding the state the delta subscribers currently have,
+		sent to a subscriber joining the stream.
+		"""
+		if self.reference is None:
+			return None
+		state = copy.deepcopy(self.reference)
+		state['type'] = 'gu'
+		return state
+
+	def record(self, full_bytes, sent_bytes):
+		self.stats['full_bytes'] += full_bytes
+		self.stats['sent_bytes'] += sent_bytes
+
+	@property
+	def bytes_saved(self):
+		return self.stats['full_bytes'] - self.stats['sent_bytes']
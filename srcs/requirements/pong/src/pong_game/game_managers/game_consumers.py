@@ -1,11 +1,48 @@
 from ..utils.logger import logger
 import json
 import asyncio
+import time
 from .game_manager import game_manager
+from .tick_scheduler import tick_scheduler
+from . import wire
+from .broadcaster import broadcaster, Frame, NO_FRAME
+from .inputs import InputLimiter
+from .replays import replay_store
+from .spectators import SpectatorOutbox, spectator_group, spectator_rate
+from ..utils.metrics import metrics
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.layers import get_channel_layer
 from ..utils.decorators import auth_required
 
+SEND = metrics.phase('send')
+ADMIN_FLUSH_TIMEOUT = 5 # seconds the admin has to receive the result before being closed
+SPECTATOR_FLUSH_TIMEOUT = 1 # seconds the spectators have to receive the last frames
+
+def replace_nicknames(room, game_data):
+	special_ids = room.get('special_id', [])
+	if special_ids:
+		id_to_nickname = {id_map['public']: id_map['nickname'] for id_map in special_ids if 'public' in id_map and 'nickname' in id_map}
+
+		logger.debug(f"ID TO NICKNAME : {id_to_nickname}")
+		logger.debug(f"GAME DATA : {game_data}")
+
+		def replace_ids_with_nicknames(data):
+			if isinstance(data, dict):
+					# Parcourt récursivement les dictionnaires
+				return {k: replace_ids_with_nicknames(v) for k, v in data.items()}
+			elif isinstance(data, list):
+					# Parcourt récursivement les listes et remplace les IDs
+				return [id_to_nickname.get(item, item) for item in data]
+			return data
+
+		game_data['teams'] = {k: replace_ids_with_nicknames(v) for k, v in game_data['teams'].items()}
+
+def spectator_data(room):
+	# export_data as sent to the spectators
+	game_data = room['game_instance'].export_data()
+	replace_nicknames(room, game_data)
+	return game_data
+
 class GameConsumer(AsyncWebsocketConsumer):
 	ready_queue = asyncio.Lock()
 
@@ -19,11 +56,26 @@ class GameConsumer(AsyncWebsocketConsumer):
 		self.is_closed = False
 		self.admin_id = None
 		self.username = username
-		self.can_be_disconnected = True
+		# cleared until the result of the game has been sent to the admin
+		self.flushed = asyncio.Event()
+		self.flushed.set()
+		self.inputs = InputLimiter()
+		query_string = self.scope.get('query_string', b'')
+		self.wire_format = wire.parse_format(query_string)
+		query = wire.parse_query(query_string)
+		self.rate = spectator_rate(query)
+		self.outbox = None # spectators only, see spectators.py
+		self.stream = None
+		if query.get('trajectory') == '1':
+			self.stream = 'trajectory'
+		elif query.get('delta') == '1':
+			self.stream = 'delta'
+		elif query.get('ball') == '1':
+			self.stream = 'ball'
 		special_id = None
 		if len(segments) >= 4:
 			self.game_id = segments[3]
-		if len(segments) >= 6:
+		if len(segments) >= 6 and segments[4] != 'spectate':
 			special_id = segments[4]
 			logger.debug(f'special_id = {special_id}')
 		if special_id:
@@ -53,8 +105,10 @@ class GameConsumer(AsyncWebsocketConsumer):
 			if self.room is None:
 				return
 			await self.accept()
-			await self.channel_layer.group_add(self.admin_id, self.channel_name)
-			asyncio.create_task(self.status_loop())
+			await broadcaster.group_add(self.admin_id, self)
+			task = asyncio.create_task(self.wait_game_over())
+			self.room['tasks'].add(task)
+			task.add_done_callback(self.room['tasks'].discard)
 			logger.debug(f"Admin is connected !")
 
 			return
@@ -62,6 +116,9 @@ class GameConsumer(AsyncWebsocketConsumer):
 			self.room = game_manager.add_user(self.username, self, self.game_id)
 			if self.room is None:
 				return
+			if self.username in self.room['spectator']:
+				self.outbox = SpectatorOutbox(self.deliver, self.rate, name=self.username,
+					keyframe=self.stream_keyframe)
 			await self.send_user_connection()
 			await self.accept()
 		if self.room and self.room['status'] == 'startup' and self.room['game_instance'] \
@@ -81,9 +138,9 @@ class GameConsumer(AsyncWebsocketConsumer):
 		admin = self.room['admin']
 		for player in self.room['players']:
 			logger.debug(f"add {player} to channel")
-			await self.channel_layer.group_add(self.game_id, self.room['players'][player].channel_name)
+			await broadcaster.group_add(self.game_id, self.room['players'][player])
 		for spectator in self.room['spectator']:
-			await self.channel_layer.group_add(self.game_id, self.room['spectator'][spectator].channel_name)
+			await broadcaster.group_add(spectator_group(self.game_id), self.room['spectator'][spectator])
 		await self.send_game_status(admin['id'], self.game_id, 'loading')
 		game_data = self.room['game_instance'].export_data()
   
@@ -101,28 +158,11 @@ class GameConsumer(AsyncWebsocketConsumer):
 		logger.debug(f'Export data')
 
 	def remplacenickname(self, game_data):
-		special_ids = self.room.get('special_id', [])
-		if special_ids:
-			id_to_nickname = {id_map['public']: id_map['nickname'] for id_map in special_ids if 'public' in id_map and 'nickname' in id_map}
-
-			logger.debug(f"ID TO NICKNAME : {id_to_nickname}")
-			logger.debug(f"GAME DATA : {game_data}")
-
-			def replace_ids_with_nicknames(data):
-				if isinstance(data, dict):
-						# Parcourt récursivement les dictionnaires
-					return {k: replace_ids_with_nicknames(v) for k, v in data.items()}
-				elif isinstance(data, list):
-						# Parcourt récursivement les listes et remplace les IDs
-					return [id_to_nickname.get(item, item) for item in data]
-				return data
-
-			game_data['teams'] = {k: replace_ids_with_nicknames(v) for k, v in game_data['teams'].items()}
+		replace_nicknames(self.room, game_data)
 
 	async def add_spectator(self):
 		logger.debug(f"{self.username} is here")
-		game_data = self.room['game_instance'].export_data()
-		self.remplacenickname(game_data)
+		game_data = spectator_data(self.room)
 		await self.send_message({
 			'type': "export_data",
 			'data': game_data
@@ -146,10 +186,15 @@ class GameConsumer(AsyncWebsocketConsumer):
 	# DISCONNECT
 
 	async def disconnect(self, close_code):
+		broadcaster.forget(self)
+		if self.outbox:
+			self.outbox.close()
 		if not self.room or self.is_closed == True:
 			return
 		self.is_closed = True
-		await self.channel_layer.group_discard(self.game_id, self.channel_name)
+		await broadcaster.group_discard(self.game_id, self)
+		if self.outbox:
+			await broadcaster.group_discard(spectator_group(self.game_id), self)
 		if self.admin_id == self.room['admin']['id']:
 			logger.debug(f"admin as been disconnected")
 			await self.game_end()
@@ -168,12 +213,7 @@ class GameConsumer(AsyncWebsocketConsumer):
 						logger.debug(f'opponant team : {self.username} in {teamname}.')
 						break
 				logger.debug(f"{opponent_team}: {score[opponent_team]}")
-				await self.channel_layer.group_send( self.game_id,
-					{
-						'type': 'send_state',
-						'state': self.room['game_instance'].give_up(opponent_team)
-					}
-				)
+				await self.group_send(self.game_id, self.room['game_instance'].give_up(opponent_team))
 				if self.room['status'] != 'aborted':
 					game_manager.update_status('aborted', self.game_id)
 					await self.send_game_finished(opponent_team, score[opponent_team], 'aborted')
@@ -188,14 +228,18 @@ class GameConsumer(AsyncWebsocketConsumer):
 		for player in self.room['players']:
 			try:
 				self.room['players'][player].is_closed = True
-				await self.channel_layer.group_discard(self.game_id, self.room['players'][player].channel_name)
+				await broadcaster.group_discard(self.game_id, self.room['players'][player])
 				await self.room['players'][player].close()
 			except Exception as e:
 				logger.error(f"Error closing player connection: {e}")
+		await asyncio.gather(*(
+			consumer.outbox.flush(SPECTATOR_FLUSH_TIMEOUT)
+			for consumer in self.room['spectator'].values() if consumer.outbox
+		))
 		for spectator in self.room['spectator']:
 			try:
 				self.room['spectator'][spectator].is_closed = True
-				await self.channel_layer.group_discard(self.game_id, self.room['spectator'][spectator].channel_name)
+				await broadcaster.group_discard(spectator_group(self.game_id), self.room['spectator'][spectator])
 				await self.room['spectator'][spectator].close()
 			except Exception as e:
 				logger.error(f"Error closing spectator connection: {e}")
@@ -218,22 +262,28 @@ class GameConsumer(AsyncWebsocketConsumer):
 	async def disconnect_admin(self):
 		logger.debug('disconnect_admin')
 		try:
-			admin = self.room['admin']
-			while True:
-				if admin['consumer'].can_be_disconnected == True:
-					admin['consumer'].is_closed = True
-					await self.channel_layer.group_discard(self.game_id, self.room['admin']['consumer'].channel_name)
-					await self.room['admin']['consumer'].close()
-					return
-				else:
-					await asyncio.sleep(1)
+			admin = self.room['admin']['consumer']
+			try:
+				await asyncio.wait_for(admin.flushed.wait(), ADMIN_FLUSH_TIMEOUT)
+			except asyncio.TimeoutError:
+				logger.warning(f"{self.game_id}: the result was not sent to the admin in time")
+			admin.is_closed = True
+			await broadcaster.group_discard(self.game_id, admin)
+			await admin.close()
 		except Exception as e:
 			logger.error(f"Error closing admin connection: {e}")
 
 	async def game_end(self):
 		logger.debug("game_end")
+		for name, encoder in self.room['streams'].items():
+			if encoder.stats['full_bytes'] and game_manager.get_room(self.game_id):
+				logger.info(f"{self.game_id} {name} stream: {encoder.bytes_saved} bytes saved "
+					f"({encoder.stats['sent_bytes']}/{encoder.stats['full_bytes']} sent)")
+		if game_manager.get_room(self.game_id):
+			await replay_store.archive(self.game_id, self.room)
 		await self.disconnect_all_users()
 		await self.disconnect_admin()
+		tick_scheduler.remove_room(self.game_id)
 		game_manager.remove_room(self.game_id)
 
 	# RECEIVE
@@ -247,7 +297,10 @@ class GameConsumer(AsyncWebsocketConsumer):
 			game_room = self.room['game_instance']
 			if game_room:
 				if data_type == 'move' and self.username in self.room['players']:
-					game_room.input_players(self.username, data['input'])
+					input = data['input']
+					stop = game_room.players[self.username].is_stop(input)
+					if self.inputs.allow(self.username, force=stop):
+						self.inputs.record(game_room.input_players(self.username, input))
 				elif data_type == 'ready':
 					if self.username in self.room['players']:
 						async with GameConsumer.ready_queue:
@@ -268,84 +321,66 @@ class GameConsumer(AsyncWebsocketConsumer):
 			game_manager.update_status('running', self.game_id)
 			admin = self.room['admin']
 			await self.send_game_status(admin['id'], None, 'in_progress')
-			await self.channel_layer.group_send(self.game_id, {
-				'type': 'send_state',
-				'state': {
-					'type': 'game_start'
-				}
+			await self.group_send(self.game_id, {
+				'type': 'game_start'
 			})
-			asyncio.create_task(self.game_loop(self.game_id))
+			self.room['streams']['trajectory'].reset()
+			self.room['streams']['ball'].reset()
+			tick_scheduler.add_room(self.game_id, self)
 			logger.debug(f'Game start')
 	
 	async def game_start_spectator(self):
 		self.ready = True
 		if self.room['status'] == 'running':
-			await self.channel_layer.group_add(self.game_id, self.channel_name)
+			await broadcaster.group_add(spectator_group(self.game_id), self)
 			await self.send_message({
 				'type': 'game_start'
 			})
+			if self.stream:
+				keyframe = self.room['streams'][self.stream].keyframe()
+				if keyframe:
+					await self.send_frame(Frame(keyframe))
 			logger.debug(f'Spectate start for {self.username}')
 
 
 
 	# GAME LOOP
 
-	async def game_loop(self, game_id):
-		if not self.room:
-			return
-		logger.debug("Game loop is running")
-		while game_manager.get_room(self.game_id):
-			game = self.room['game_instance']
-			if game:
-				game_state = game.update()
-				await self.channel_layer.group_send(
-					game_id,
-					{
-						'type': 'send_state',
-						'state': game_state
-					}
-				)
-				if game_state['type'] == 'scored':
-					logger.debug('scored')
-					await self.send_update_score(game_state['team'], game_state['score'])
-				elif game_state['type'] == 'game_end':
-					game_manager.update_status('finished', self.game_id)
-					await self.send_game_finished(game_state['team'], game_state['score'], 'finished')
-					await self.game_end()
-					return
-				await asyncio.sleep(0.025)
-			else:
-				break
+	async def publish_states(self, states):
+		# called by the tick_scheduler with the states produced for this room
+		for game_state in states:
+			await self.group_send(self.game_id, game_state, self.room['streams'])
+			if game_state['type'] == 'scored':
+				logger.debug('scored')
+				await self.send_update_score(game_state['team'], game_state['score'])
+			elif game_state['type'] == 'game_end':
+				game_manager.update_status('finished', self.game_id)
+				await self.send_game_finished(game_state['team'], game_state['score'], 'finished')
+				await self.game_end()
+				return
 
 	async def send_update_score(self, team, score):
 		admin = self.room['admin']
-		await self.channel_layer.group_send(admin['id'], {
-				'type': "send_state",
-				'state': {
-					'type': "update_score",
-					'team': team,
-					'score': score
-				}
+		await self.group_send(admin['id'], {
+				'type': "update_score",
+				'team': team,
+				'score': score
 			})
 		
 	async def send_game_finished(self, team, score, status):
 		admin = self.room['admin']
-		admin['consumer'].can_be_disconnected = False
-		await self.channel_layer.group_send(admin['id'], {
-				'type': "send_state",
-				'state': {
-					'type': "export_status",
-					'status': status,
-					'team': team,
-					'score': score
-				}
+		admin['consumer'].flushed.clear()
+		await self.group_send(admin['id'], {
+				'type': "export_status",
+				'status': status,
+				'team': team,
+				'score': score
 			})
 
-	# STATUS_LOOP
-	async def status_loop(self):
-		while self.room['status'] != 'aborted' and self.room['status'] != 'finished':
-			logger.debug("HELLO")
-			await asyncio.sleep(1)
+	# GAME OVER
+	async def wait_game_over(self):
+		# admin: woken when the room is aborted or finished, cancelled with the room
+		await game_manager.wait_status(self.game_id, ('aborted', 'finished'))
 
 		if self.room['status'] == 'aborted' and self.room['teamlist']:
 			logger.debug(f"THE JUDGEMENT")
@@ -406,21 +441,15 @@ class GameConsumer(AsyncWebsocketConsumer):
 	# UTILS
 
 	async def send_export_data(self, game_id, data):
-		await self.channel_layer.group_send(game_id, {
-				'type': "send_state",
-				'state': {
-					'type': "export_data",
-					'data': data
-				}
+		await self.group_send(game_id, {
+				'type': "export_data",
+				'data': data
 			})
 		
 	async def send_export_teams(self, admin_id, teams):
-		await self.channel_layer.group_send(admin_id, {
-				'type': "send_state",
-				'state': {
-					'type': "export_teams",
-					'teams': teams
-				}
+		await self.group_send(admin_id, {
+				'type': "export_teams",
+				'teams': teams
 			})
 
 	async def send_game_status(self, admin_id, game_id, status):
@@ -441,18 +470,25 @@ class GameConsumer(AsyncWebsocketConsumer):
 			if group:  # S'assurer que le nom du groupe est valide
 				try:
 					logger.debug(f"Sending message to group: {group}\nmessage: {message}")
-					await self.channel_layer.group_send(
-						group, {
-							'type': 'send_state',
-							'state': message
-						}
-					)
+					await self.group_send(group, message)
 				except Exception as e:
 					logger.error(f"Failed to send message to group {group}: {e}")
 			else:
 				logger.error("Invalid group name detected")
 
 
+	async def group_send(self, group, state, streams=None):
+		frame = await broadcaster.group_send(self.channel_layer, group, state, streams)
+		if group == self.game_id:
+			# the spectators get every message of the game, same frame
+			group = spectator_group(self.game_id)
+			if self.room['relayed']:
+				# spectators of a relay process (relay.py)
+				broadcaster.mark_shared(group)
+			elif not broadcaster.groups.get(group):
+				return
+			await broadcaster.group_send(self.channel_layer, group, state, frame=frame)
+
 	async def send_message(self, message):
 		try:
 			if self.is_closed is False:
@@ -462,13 +498,52 @@ class GameConsumer(AsyncWebsocketConsumer):
 
 	# STATE EVENT
 
+	def stream_keyframe(self):
+		return self.room['streams'][self.stream].keyframe() if self.stream else None
+
 	async def send_state(self, event):
+		# channel layer path: skip the copy of a frame already delivered locally
+		if event.get('origin') == broadcaster.id and broadcaster.is_member(event.get('group'), self):
+			return
+		await self.send_frame(Frame(event['state']))
+
+	def encode_frame(self, frame):
+		if self.wire_format == 'binary' and frame.binary is not None:
+			return frame.binary
+		return frame.text
+
+	async def send_frame(self, frame):
 		try:
 			if self.is_closed is False:
-				if event['state']['type'] == 'export_data':
+				if self.stream and frame.variants and self.stream in frame.variants:
+					variant, encoder = frame.variants[self.stream]
+					payload = None if variant is NO_FRAME else self.encode_frame(variant)
+					encoder.record(frame.full_bytes, len(payload) if payload else 0)
+					if payload is None:
+						return
+					frame = variant
+				if self.outbox:
+					self.outbox.push(frame)
+				else:
+					await self.deliver(frame)
+			else:
+				logger.debug(f"{self.username} consumer want send new statde but is closed")
+		except Exception as e:
+			logger.warning(f"{self.username}: Failed to send state: {e}")
+
+	async def deliver(self, frame):
+		try:
+			if self.is_closed is False:
+				if frame.state['type'] == 'export_data':
 					logger.debug(f"{self.username} receive export data")
-				await self.send(text_data=json.dumps(event['state']))
-				self.can_be_disconnected = True
+				payload = self.encode_frame(frame)
+				start = time.perf_counter()
+				if isinstance(payload, bytes):
+					await self.send(bytes_data=payload)
+				else:
+					await self.send(text_data=payload)
+				SEND.observe(time.perf_counter() - start)
+				self.flushed.set()
 			else:
 				logger.debug(f"{self.username} consumer want send new statde but is closed")
 		except Exception as e:
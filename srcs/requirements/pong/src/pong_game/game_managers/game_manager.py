@@ -1,6 +1,10 @@
 from ..game.game import Game
 from ..utils.logger import logger
 from .data import game_modes
+from .delta import DeltaEncoder
+from .trajectory import TrajectoryEncoder, BALL_SAMPLE_INTERVAL
+import asyncio
+import time
 import uuid
 import copy
 
@@ -21,6 +25,9 @@ class game_manager:
 			return None
 		self.games_room[game_id] = {
 			'status': 'waiting',
+			'status_since': time.monotonic(),
+			'waiters': [],
+			'tasks': set(),
 			'game_mode': game_mode,
 			'modifiers': modifiers,
 			'admin': {
@@ -32,7 +39,13 @@ class game_manager:
 			'spectator': {},
 			'teamlist': teamlist,
 			'special_id': special_id,
-			'game_instance': None
+			'relayed': 0, # spectators served by a relay process
+			'game_instance': None,
+			'streams': {
+				'delta': DeltaEncoder(),
+				'trajectory': TrajectoryEncoder(),
+				'ball': TrajectoryEncoder(BALL_SAMPLE_INTERVAL, padels=False)
+			}
 		}
 		return self.games_room[game_id]
 
@@ -74,7 +87,7 @@ class game_manager:
 		if room['status'] == 'waiting'\
 			and len(room['players']) is game_modes[game_mode]['players']:
 			logger.debug('player start the game')
-			room['status'] = 'startup'
+			self.set_status(room, 'startup')
 			new_game = Game(room['players'], game_mode, modifiers, teamlist) # add teams list
 			room['game_instance'] = new_game
 		return room
@@ -95,7 +108,7 @@ class game_manager:
 			and len(room['players']) is game_modes[game_mode]['players'] \
 			and room['admin']['consumer']:
 			logger.debug('admin start the game')
-			room['status'] = 'startup'
+			self.set_status(room, 'startup')
 			new_game = Game(room['players'], teamlist) # add teams list)
       
       
@@ -106,8 +119,32 @@ class game_manager:
 		if game_id not in self.games_room \
 			or status not in self.status_list:
 			return None
-		room = self.games_room[game_id]
+		self.set_status(self.games_room[game_id], status)
+
+	def set_status(self, room, status):
 		room['status'] = status
+		room['status_since'] = time.monotonic()
+		for waiter in list(room['waiters']):
+			statuses, loop, future = waiter
+			if status in statuses:
+				room['waiters'].remove(waiter)
+				# the waiter may be on another loop than the caller
+				loop.call_soon_threadsafe(resolve, future, status)
+
+	def wait_status(self, game_id, statuses):
+		"""
+		Future resolved with the status of the room once it is in `statuses`,
+		cancelled if the room is removed before.
+		"""
+		future = asyncio.get_running_loop().create_future()
+		room = self.get_room(game_id)
+		if room is None:
+			future.cancel()
+		elif room['status'] in statuses:
+			future.set_result(room['status'])
+		else:
+			room['waiters'].append((statuses, future.get_loop(), future))
+		return future
 
 	def remove_user(self, username, game_id):
 		if game_id not in self.games_room:
@@ -120,8 +157,11 @@ class game_manager:
 			del users[username]
 
 	def remove_room(self, game_id):
-		if game_id in self.games_room:
-			del self.games_room[game_id]
+		room = self.games_room.pop(game_id, None)
+		if room is not None:
+			for _, loop, future in room['waiters']:
+				loop.call_soon_threadsafe(future.cancel)
+			room['waiters'].clear()
 
 	def get_room(self, game_id):
 		if game_id in self.games_room:
@@ -130,9 +170,13 @@ class game_manager:
 
 	def abortgame(self, game_id):
 		if game_id in self.games_room:
-			self.games_room[game_id]['status'] = 'aborted'
+			self.set_status(self.games_room[game_id], 'aborted')
 			return True
 		else:
 			return None
 
+def resolve(future, status):
+	if not future.done():
+		future.set_result(status)
+
 game_manager = game_manager()
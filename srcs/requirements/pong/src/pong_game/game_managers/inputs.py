@@ -0,0 +1,73 @@
+"""
+Rate limiting of the messages received from a connection.
+
+Every `move` message costs a token of the connection's bucket (INPUT_BURST
+tokens, refilled at INPUT_RATE per second): a client sending faster than
+that has its moves dropped. The other messages (ready...) are not limited,
+nor are the stops, which a padel would otherwise keep moving without: they
+are always composed into the command of the tick. The inputs that get
+through are composed per tick by the player (Player.queue_input), so a
+room applies at most one command per padel and per tick.
+
+Counters, per connection and for the whole process (input_stats):
+- received: messages received,
+- dropped: messages dropped by the rate limit,
+- commands: inputs giving the padel a command for the next tick,
+- merged: inputs composed into the pending command of the tick,
+- invalid: unknown inputs.
+"""
+from ..utils.logger import logger
+import time
+
+INPUT_RATE = 60 # messages per second
+INPUT_BURST = 20 # messages
+
+input_stats = {
+	'received': 0,
+	'dropped': 0,
+	'commands': 0,
+	'merged': 0,
+	'invalid': 0,
+}
+
+class InputLimiter:
+	def __init__(self, rate=INPUT_RATE, burst=INPUT_BURST):
+		self.rate = rate
+		self.burst = burst
+		self.tokens = burst
+		self.last = time.monotonic()
+		self.stats = dict.fromkeys(input_stats, 0)
+
+	def allow(self, name=None, force=False):
+		"""
+		Takes a token for a message, False when it has to be dropped. A
+		`force`d message (a stop) takes a token if there is one but always
+		gets through.
+		"""
+		now = time.monotonic()
+		self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+		self.last = now
+		self.count('received')
+		if force:
+			self.tokens = max(self.tokens - 1, 0)
+			return True
+		if self.tokens < 1:
+			if not self.stats['dropped']:
+				logger.warning(f"{name}: more than {self.rate} messages/s, dropping")
+			self.count('dropped')
+			return False
+		self.tokens -= 1
+		return True
+
+	def record(self, merged):
+		# result of Game.input_players
+		if merged is None:
+			self.count('invalid')
+		elif merged:
+			self.count('merged')
+		else:
+			self.count('commands')
+
+	def count(self, name):
+		self.stats[name] += 1
+		input_stats[name] += 1
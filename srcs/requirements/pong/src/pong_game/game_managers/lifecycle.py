@@ -0,0 +1,175 @@
+"""
+Lifecycle of the rooms: a room left in a status for longer than its
+timeout is expired, so a process running for weeks does not keep the rooms
+whose admin or players never connected.
+
+- newgame registers the room (watch), the deadlines are kept in a timer
+  wheel of WHEEL_SLOTS slots of WHEEL_RESOLUTION second: scheduling is an
+  append, a turn of the wheel only looks at the entries of one slot,
+- an entry is not moved when the status changes (game_manager records
+  room['status_since']): when it is due the deadline of the current status
+  is computed again, and the entry rescheduled if it is not reached,
+- a room expired before it started (no admin) or already over is purged:
+  its connections are closed, its tasks cancelled and it is removed,
+- a room expired while an admin is connected is aborted, which wakes the
+  admin's status task (GameConsumer.wait_game_over) ending the game as an
+  abortgame would; it is purged if still there after the next timeout.
+
+The reaper task only runs while rooms are watched.
+"""
+from ..utils.logger import logger
+from .game_manager import game_manager
+from .tick_scheduler import tick_scheduler
+from .replays import replay_store
+from channels.generic.websocket import AsyncWebsocketConsumer
+import asyncio
+import logging
+import math
+import sys
+import time
+import types
+
+WHEEL_SLOTS = 64
+WHEEL_RESOLUTION = 1.0 # seconds
+# seconds a room may stay in a status
+ROOM_TIMEOUTS = {
+	'waiting': 10 * 60,
+	'startup': 2 * 60,
+	'loading': 2 * 60,
+	'running': 2 * 60 * 60,
+	'aborted': 60,
+	'finished': 60,
+}
+
+# what room_memory counts
+ROOM_DATA = ('game_instance', 'streams', 'modifiers', 'expected_players', 'teamlist', 'special_id')
+NOT_ROOM_DATA = (
+	AsyncWebsocketConsumer, logging.Logger, type, types.ModuleType,
+	types.FunctionType, types.MethodType, types.BuiltinFunctionType,
+)
+
+class TimerWheel:
+	def __init__(self, slots=WHEEL_SLOTS, resolution=WHEEL_RESOLUTION):
+		self.slots = [[] for _ in range(slots)]
+		self.resolution = resolution
+		self.current = 0 # turns since the start
+		self.size = 0
+
+	def schedule(self, delay, item):
+		due = self.current + max(1, math.ceil(delay / self.resolution))
+		self.slots[due % len(self.slots)].append((due, item))
+		self.size += 1
+
+	def advance(self):
+		"""
+		One turn: the items that are due. Those of a later revolution stay.
+		"""
+		self.current += 1
+		slot = self.slots[self.current % len(self.slots)]
+		due = [item for turn, item in slot if turn <= self.current]
+		if due:
+			slot[:] = [(turn, item) for turn, item in slot if turn > self.current]
+			self.size -= len(due)
+		return due
+
+class RoomReaper:
+	def __init__(self, timeouts=ROOM_TIMEOUTS):
+		self.timeouts = dict(timeouts)
+		self.wheel = TimerWheel()
+		self.task = None
+		self.stats = {
+			'watched': 0,
+			'aborted': 0,
+			'purged': 0,
+		}
+
+	def configure(self, waiting_timeout=None):
+		if waiting_timeout:
+			self.timeouts['waiting'] = waiting_timeout
+
+	def watch(self, game_id):
+		# from a coroutine: the reaper runs on the loop of the rooms
+		self.wheel.schedule(self.timeouts['waiting'], game_id)
+		self.stats['watched'] += 1
+		if self.task is None or self.task.done():
+			self.task = asyncio.get_running_loop().create_task(self.run())
+
+	async def run(self):
+		while self.wheel.size:
+			await asyncio.sleep(self.wheel.resolution)
+			for game_id in self.wheel.advance():
+				try:
+					await self.check(game_id)
+				except Exception as e:
+					logger.error(f"reaper: {game_id}: {e}")
+
+	async def check(self, game_id):
+		room = game_manager.get_room(game_id)
+		if room is None:
+			return
+		remaining = room['status_since'] + self.timeouts[room['status']] - time.monotonic()
+		if remaining > 0:
+			self.wheel.schedule(remaining, game_id)
+			return
+		if room['status'] in ('aborted', 'finished') or room['admin']['consumer'] is None:
+			await self.purge(game_id, room)
+			return
+		logger.info(f"reaper: {game_id} {room['status']} for too long, aborted")
+		self.stats['aborted'] += 1
+		game_manager.update_status('aborted', game_id)
+		self.wheel.schedule(self.timeouts['aborted'], game_id)
+
+	async def purge(self, game_id, room):
+		logger.info(f"reaper: {game_id} {room['status']} for too long, removed")
+		self.stats['purged'] += 1
+		for task in list(room['tasks']):
+			task.cancel()
+		tick_scheduler.remove_room(game_id)
+		game_manager.remove_room(game_id)
+		await replay_store.archive(game_id, room)
+		for consumer in room_consumers(room):
+			consumer.is_closed = True
+			try:
+				await consumer.close()
+			except Exception as e:
+				logger.warning(f"reaper: {game_id}: failed to close a connection: {e}")
+
+def room_consumers(room):
+	consumers = list(room['players'].values()) + list(room['spectator'].values())
+	if room['admin']['consumer'] is not None:
+		consumers.append(room['admin']['consumer'])
+	return consumers
+
+def room_memory(room):
+	"""
+	Approximate size in bytes of what a room holds (game, encoders, ...),
+	the connections excluded.
+	"""
+	seen = set()
+	stack = [room[key] for key in ROOM_DATA]
+	size = sys.getsizeof(room)
+	while stack:
+		obj = stack.pop()
+		if id(obj) in seen or isinstance(obj, NOT_ROOM_DATA):
+			continue
+		seen.add(id(obj))
+		size += sys.getsizeof(obj)
+		if isinstance(obj, dict):
+			stack.extend(obj.keys())
+			stack.extend(obj.values())
+		elif isinstance(obj, (list, tuple, set, frozenset)):
+			stack.extend(obj)
+		elif isinstance(obj, (str, bytes, bytearray, int, float, bool)) or obj is None:
+			continue
+		else:
+			if hasattr(obj, '__dict__'):
+				stack.append(obj.__dict__)
+			for slot in getattr(type(obj), '__slots__', ()):
+				if hasattr(obj, slot):
+					stack.append(getattr(obj, slot))
+			if hasattr(obj, 'nbytes'):
+				# numpy arrays
+				size += obj.nbytes
+	return size
+
+room_reaper = RoomReaper()
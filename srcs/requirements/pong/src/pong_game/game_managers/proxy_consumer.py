@@ -0,0 +1,58 @@
+from ..utils.logger import logger
+from .shards import shards
+import asyncio
+from channels.generic.websocket import AsyncWebsocketConsumer
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed, WebSocketException
+
+class ProxyConsumer(AsyncWebsocketConsumer):
+	"""
+	Router side of a game websocket: relays the frames, both ways, to the
+	worker owning the game. The connection is accepted once the worker
+	accepted it, and closed when either side closes.
+	"""
+
+	async def connect(self):
+		self.upstream = None
+		self.relay_task = None
+		game_id = self.scope['url_route']['kwargs']['game_id']
+		worker = await shards.aowner(game_id)
+		url = shards.ws_url(worker, self.scope['path'], self.scope.get('query_string', b''))
+		headers = [
+			(name.decode('latin-1'), value.decode('latin-1'))
+			for name, value in self.scope['headers'] if name == b'cookie'
+		]
+		try:
+			self.upstream = await connect(url, additional_headers=headers, max_size=None, compression=None)
+		except (OSError, WebSocketException) as e:
+			logger.warning(f"proxy: {game_id} on worker {worker} refused the connection: {e}")
+			await self.close()
+			return
+		await self.accept()
+		self.relay_task = asyncio.create_task(self.relay())
+
+	async def relay(self):
+		try:
+			async for message in self.upstream:
+				if isinstance(message, bytes):
+					await self.send(bytes_data=message)
+				else:
+					await self.send(text_data=message)
+		except ConnectionClosed:
+			pass
+		finally:
+			await self.close()
+
+	async def receive(self, text_data=None, bytes_data=None):
+		if self.upstream is None:
+			return
+		try:
+			await self.upstream.send(text_data if text_data is not None else bytes_data)
+		except ConnectionClosed:
+			await self.close()
+
+	async def disconnect(self, close_code):
+		if self.upstream is not None:
+			await self.upstream.close()
+		if self.relay_task is not None and self.relay_task is not asyncio.current_task():
+			self.relay_task.cancel()
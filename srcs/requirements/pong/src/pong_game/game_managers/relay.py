@@ -0,0 +1,190 @@
+"""
+Spectators served by a process owning no room: the router when the rooms
+are sharded, or a relay process (PONG_SPECTATOR_RELAY=1 in start_pong.sh),
+on ws/pong/<game_id>/spectate/. The relay process is opt-in: it is only
+reached once nginx sends the spectate route to PONG_RELAY_PORT (commented
+in nginx/default.conf) and the viewers open that route, the client opening
+ws/pong/<game_id>/ for players and spectators alike.
+
+The worker owning the game is asked for its data (views.spectate), with
+the cookies of the spectator, which counts the room's relayed spectators:
+while there are some the messages of its spectator group are published on
+the channel layer as well. Each game has one RelayHub per relay process,
+subscribed once to the spectator group, decoding each message once and
+pushing the same frame to the outbox (spectators.py) of every spectator
+of the process. Thousands of viewers cost the worker one channel layer
+message per frame.
+
+Relayed spectators receive the full states (json or binary), not the delta
+or trajectory streams, whose encoders live with the room.
+"""
+from ..utils.logger import logger
+from ..utils.decorators import auth_required
+from .broadcaster import Frame
+from .shards import shards
+from .spectators import SpectatorOutbox, spectator_group, spectator_rate
+from . import wire
+from channels.generic.websocket import AsyncWebsocketConsumer
+import asyncio
+import json
+import httpx
+
+RELAY_IDLE = 60 # seconds without a message before the spectators of a game are closed
+WORKER_TIMEOUT = 5 # seconds the worker owning the game has to answer
+FINISH_TIMEOUT = 1 # seconds the spectators have to receive the end of the game
+
+relay_stats = {
+	'frames': 0,
+	'deliveries': 0,
+}
+
+class RelayHub:
+	def __init__(self, game_id, channel_layer):
+		self.game_id = game_id
+		self.channel_layer = channel_layer
+		self.viewers = set()
+		self.task = asyncio.get_running_loop().create_task(self.run())
+
+	async def run(self):
+		group = spectator_group(self.game_id)
+		channel = await self.channel_layer.new_channel()
+		await self.channel_layer.group_add(group, channel)
+		try:
+			while True:
+				message = await asyncio.wait_for(self.channel_layer.receive(channel), RELAY_IDLE)
+				if message.get('type') != 'send_state':
+					continue
+				frame = Frame(message['state'])
+				relay_stats['frames'] += 1
+				relay_stats['deliveries'] += len(self.viewers)
+				for viewer in list(self.viewers):
+					viewer.push(frame)
+				if frame.state['type'] == 'game_end':
+					await asyncio.gather(*(viewer.finish() for viewer in list(self.viewers)))
+					return
+		except asyncio.TimeoutError:
+			logger.info(f"relay: nothing from {self.game_id} for {RELAY_IDLE}s, closing its spectators")
+			for viewer in list(self.viewers):
+				await viewer.close()
+		finally:
+			await self.channel_layer.group_discard(group, channel)
+
+class RelayHubs:
+	def __init__(self):
+		self.hubs = {}
+
+	def join(self, game_id, viewer):
+		hub = self.hubs.get(game_id)
+		if hub is None or hub.task.done():
+			hub = self.hubs[game_id] = RelayHub(game_id, viewer.channel_layer)
+		hub.viewers.add(viewer)
+
+	def leave(self, game_id, viewer):
+		hub = self.hubs.get(game_id)
+		if hub is None:
+			return
+		hub.viewers.discard(viewer)
+		if not hub.viewers:
+			hub.task.cancel()
+			del self.hubs[game_id]
+
+	@property
+	def viewers(self):
+		return sum(len(hub.viewers) for hub in self.hubs.values())
+
+relay_hubs = RelayHubs()
+
+class RelayConsumer(AsyncWebsocketConsumer):
+
+	@auth_required
+	async def connect(self, username=None):
+		self.game_id = self.scope['url_route']['kwargs']['game_id']
+		self.username = username
+		self.outbox = None
+		self.joined = False
+		self.relayed = False
+		self.status = None
+		if not username:
+			logger.warning(f'An unauthorized connection has been received')
+			await self.close()
+			return
+		query_string = self.scope.get('query_string', b'')
+		self.wire_format = wire.parse_format(query_string)
+		info = await self.fetch_game()
+		await self.accept()
+		if info is None:
+			await self.send(text_data=json.dumps({
+				'error': '404',
+				'message': f'{self.game_id} does not exist'
+			}))
+			await self.close()
+			return
+		self.status = info['status']
+		self.outbox = SpectatorOutbox(self.deliver, spectator_rate(wire.parse_query(query_string)), name=self.username)
+		if info['data'] is not None and self.status != 'waiting':
+			await self.send(text_data=json.dumps({'type': 'export_data', 'data': info['data']}))
+		else:
+			await self.send(text_data=json.dumps({'type': 'waiting_room'}))
+		if self.status != 'running':
+			# export_data and game_start come through the hub
+			self.join()
+
+	async def spectate(self, method):
+		worker = await shards.aowner(self.game_id)
+		cookie = dict(self.scope['headers']).get(b'cookie', b'').decode('utf-8')
+		try:
+			async with httpx.AsyncClient(timeout=WORKER_TIMEOUT) as client:
+				return await client.request(method, shards.http_url(worker, f'/api/pong/spectate/{self.game_id}/'),
+					headers={'Cookie': cookie})
+		except httpx.RequestError as e:
+			logger.error(f"relay: worker {worker} unreachable: {e}")
+			return None
+
+	async def fetch_game(self):
+		response = await self.spectate('GET')
+		if response is None or response.status_code != 200:
+			return None
+		self.relayed = True
+		return response.json()
+
+	def join(self):
+		if not self.joined:
+			self.joined = True
+			relay_hubs.join(self.game_id, self)
+
+	def push(self, frame):
+		self.outbox.push(frame)
+
+	async def finish(self):
+		await self.outbox.flush(FINISH_TIMEOUT)
+		await self.close()
+
+	async def receive(self, text_data=None, bytes_data=None):
+		if self.outbox is None or self.joined:
+			return
+		try:
+			data = json.loads(text_data)
+		except (TypeError, json.JSONDecodeError):
+			return
+		if data.get('type') == 'ready' and self.status == 'running':
+			await self.send(text_data=json.dumps({'type': 'game_start'}))
+			self.join()
+
+	async def deliver(self, frame):
+		try:
+			if self.wire_format == 'binary' and frame.binary is not None:
+				await self.send(bytes_data=frame.binary)
+			else:
+				await self.send(text_data=frame.text)
+		except Exception as e:
+			logger.warning(f"{self.username}: Failed to send state: {e}")
+
+	async def disconnect(self, close_code):
+		if self.joined:
+			relay_hubs.leave(self.game_id, self)
+		if self.outbox:
+			self.outbox.close()
+		if self.relayed:
+			# the worker stops publishing once its last relayed spectator left
+			self.relayed = False
+			await self.spectate('DELETE')
@@ -0,0 +1,96 @@
+"""
+Recordings of the matches (game/replay.py) kept once their room is removed.
+
+A recording is written to PONG_REPLAY_DIR/<game_id>.replay when the room
+ends, from a thread of the executor; the oldest files are removed past
+PONG_REPLAY_KEEP recordings. The recording of a match in progress is read
+from its room, so a late spectator can catch up on what it missed.
+"""
+from ..utils.logger import logger
+from .game_manager import game_manager
+import asyncio
+import os
+import re
+
+REPLAY_KEEP = 10000 # recordings kept on disk
+PRUNE_EVERY = 100 # saves
+GAME_ID = re.compile(r'^[\w-]{1,64}$')
+
+class ReplayStore:
+	def __init__(self):
+		self.configure()
+
+	def configure(self, directory=None, keep=REPLAY_KEEP):
+		self.directory = directory
+		self.keep = keep
+		self.stats = {
+			'saved': 0,
+			'bytes': 0,
+			'failed': 0,
+		}
+
+	def path(self, game_id):
+		if not self.directory or not GAME_ID.match(str(game_id)):
+			return None
+		return os.path.join(self.directory, f'{game_id}.replay')
+
+	async def archive(self, game_id, room):
+		"""
+		Ends the recording of the room's game and writes it.
+		"""
+		game = room['game_instance']
+		path = self.path(game_id)
+		if game is None or game.recorder is None or game.recorder.ended or path is None:
+			return
+		recorder = game.end_recording()
+		if not recorder.data:
+			return
+		data = bytes(recorder.data)
+		try:
+			await asyncio.get_running_loop().run_in_executor(None, self.write, path, data)
+		except OSError as e:
+			self.stats['failed'] += 1
+			logger.error(f"replays: {game_id} not saved: {e}")
+			return
+		self.stats['saved'] += 1
+		self.stats['bytes'] += len(data)
+		if self.stats['saved'] % PRUNE_EVERY == 0:
+			asyncio.get_running_loop().run_in_executor(None, self.prune)
+
+	def write(self, path, data):
+		os.makedirs(self.directory, exist_ok=True)
+		temporary = path + '.tmp'
+		with open(temporary, 'wb') as file:
+			file.write(data)
+		os.replace(temporary, path)
+
+	def prune(self):
+		try:
+			entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith('.replay')]
+			if len(entries) <= self.keep:
+				return
+			entries.sort(key=lambda entry: entry.stat().st_mtime)
+			for entry in entries[:len(entries) - self.keep]:
+				os.remove(entry.path)
+		except OSError as e:
+			logger.warning(f"replays: pruning {self.directory} failed: {e}")
+
+	def load(self, game_id):
+		"""
+		Recording of a game, in progress or archived, None if there is none.
+		"""
+		room = game_manager.get_room(game_id)
+		if room and room['game_instance'] and room['game_instance'].recorder:
+			data = room['game_instance'].recorder.data
+			if data:
+				return bytes(data)
+		path = self.path(game_id)
+		if path is None:
+			return None
+		try:
+			with open(path, 'rb') as file:
+				return file.read()
+		except OSError:
+			return None
+
+replay_store = ReplayStore()
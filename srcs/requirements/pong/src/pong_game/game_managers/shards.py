@@ -0,0 +1,110 @@
+"""
+Rooms sharded over several worker processes.
+
+start_pong.sh runs PONG_WORKERS daphne workers on 127.0.0.1:PONG_WORKER_PORT
++ i, each owning its rooms (game_manager, tick_scheduler and broadcaster
+are per process), and a router on the public port 8000 holding no room:
+
+- newgame assigns the game to a worker with a consistent hash ring of the
+  game ids, records it in the registry (the Redis cache) and is forwarded
+  to it, as abortgame,
+- a websocket is relayed to the owner of its game (proxy_consumer.py).
+
+The registry keeps a game on its worker for the whole match even if the
+ring changes (PONG_WORKERS edited between two restarts); when the cache is
+not reachable the ring alone gives the owner.
+
+With a single worker there is no router: the process on port 8000 owns
+every room, as before.
+
+Spectators connecting on ws/pong/<game_id>/spectate/ to a process owning no
+room (the router, or a relay process) are served by relay.py.
+"""
+from ..utils.logger import logger
+from bisect import bisect
+from django.core.cache import cache
+import hashlib
+
+REPLICAS = 64 # points of each worker on the ring
+OWNER_TIMEOUT = 6 * 60 * 60 # seconds a game stays in the registry
+PUBLIC_PORT = 8000 # the router, or the only worker
+
+def ring_hash(key):
+	return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+class HashRing:
+	def __init__(self, workers, replicas=REPLICAS):
+		points = []
+		for worker in workers:
+			for replica in range(replicas):
+				points.append((ring_hash(f'{worker}:{replica}'), worker))
+		points.sort()
+		self.hashes = [point for point, _ in points]
+		self.workers = [worker for _, worker in points]
+
+	def owner(self, key):
+		index = bisect(self.hashes, ring_hash(key)) % len(self.hashes)
+		return self.workers[index]
+
+class Shards:
+	def __init__(self):
+		self.configure()
+
+	def configure(self, workers=1, worker_id=None, port=8001):
+		self.workers = max(workers, 1)
+		self.worker_id = worker_id
+		self.port = port
+		self.ring = HashRing([str(worker) for worker in range(self.workers)])
+
+	@property
+	def is_router(self):
+		return self.workers > 1 and self.worker_id == 'router'
+
+	@property
+	def is_relay(self):
+		return self.worker_id == 'relay'
+
+	@property
+	def owns_rooms(self):
+		return not self.is_router and not self.is_relay
+
+	def key(self, game_id):
+		return f'pong:owner:{game_id}'
+
+	def assign(self, game_id):
+		worker = self.ring.owner(game_id)
+		try:
+			cache.set(self.key(game_id), worker, OWNER_TIMEOUT)
+		except Exception as e:
+			logger.warning(f"shards: registry unavailable ({e}), {game_id} placed by the ring only")
+		logger.debug(f"shards: {game_id} -> worker {worker}")
+		return worker
+
+	def owner(self, game_id):
+		try:
+			worker = cache.get(self.key(game_id))
+		except Exception as e:
+			logger.warning(f"shards: registry unavailable ({e})")
+			worker = None
+		return worker if worker is not None else self.ring.owner(game_id)
+
+	async def aowner(self, game_id):
+		try:
+			worker = await cache.aget(self.key(game_id))
+		except Exception as e:
+			logger.warning(f"shards: registry unavailable ({e})")
+			worker = None
+		return worker if worker is not None else self.ring.owner(game_id)
+
+	def worker_port(self, worker):
+		return self.port + int(worker) if self.workers > 1 else PUBLIC_PORT
+
+	def http_url(self, worker, path):
+		return f'http://127.0.0.1:{self.worker_port(worker)}{path}'
+
+	def ws_url(self, worker, path, query_string=b''):
+		if isinstance(query_string, bytes):
+			query_string = query_string.decode('latin-1')
+		return f'ws://127.0.0.1:{self.worker_port(worker)}{path}' + (f'?{query_string}' if query_string else '')
+
+shards = Shards()
@@ -0,0 +1,159 @@
+"""
+Fan-out to the spectators, off the path of the players.
+
+Spectators are not in the group of the players (game_id) but in
+spectator_group(game_id), which receives every message of the game group
+(GameConsumer.group_send). A spectator never sends inline: its frames go to
+its SpectatorOutbox, drained by a task of its own, so a slow socket only
+delays itself and the tick never waits for it.
+
+- the outbox is a ring of SPECTATOR_QUEUE frames: when full, the oldest
+  frame is dropped. A dropped gd is merged into the next state of the
+  ring, or, when none is queued, the next gd pushed is replaced by a
+  keyframe of the stream,
+- a state frame (gu, gd, tr) replaces the state frame of the same kind
+  at the end of the ring: the newest state is the only one worth sending
+  (a gd is merged into it, the delta stream being cumulative). Events,
+  padel_contact included although it carries a full state, are kept in
+  order and never replaced,
+- state frames are sent at most SPECTATOR_RATE times per second (lower
+  with `?rate=` on the connection), events as they come.
+
+relay.py serves spectators from another process with the same outbox.
+"""
+from ..utils.logger import logger
+from .broadcaster import Frame
+from collections import deque
+import asyncio
+import time
+
+SPECTATOR_QUEUE = 32 # frames
+SPECTATOR_RATE = 20 # state frames per second
+# state frames, replacing the previous one of the same kind
+STATE_KINDS = {
+	'gu': 'state',
+	'gd': 'state',
+	'tr': 'trajectory',
+}
+# frames a client takes as the whole state of the game
+FULL_STATES = ('gu', 'padel_contact')
+MERGED_GROUPS = ('bp', 'bs', 'pp')
+
+spectator_stats = {
+	'queued': 0,
+	'coalesced': 0,
+	'dropped': 0,
+	'sent': 0,
+}
+
+def spectator_group(game_id):
+	return f'{game_id}.spectators'
+
+def spectator_rate(query, rate=SPECTATOR_RATE):
+	"""
+	Rate asked for with `?rate=` (no higher than `rate`).
+	"""
+	try:
+		return min(max(float(query.get('rate', rate)), 1.0), rate)
+	except ValueError:
+		return rate
+
+def merge_delta(state, delta):
+	# the state a client rebuilds by applying `delta` to `state`
+	merged = dict(state)
+	for group in MERGED_GROUPS:
+		if group in delta:
+			merged[group] = {**state.get(group, {}), **delta[group]}
+	return merged
+
+class SpectatorOutbox:
+	def __init__(self, deliver, rate=SPECTATOR_RATE, size=SPECTATOR_QUEUE, name=None, keyframe=None):
+		"""
+		`deliver(frame)` sends a frame to the connection, `keyframe()` returns
+		the full state of the stream of the connection (delta.py).
+		"""
+		self.deliver = deliver
+		self.keyframe = keyframe
+		self.needs_keyframe = False
+		self.interval = 1 / rate if rate else 0
+		self.queue = deque()
+		self.size = size
+		self.name = name
+		self.wake = asyncio.Event()
+		self.tail_kind = None
+		self.drained = asyncio.Event()
+		self.drained.set()
+		self.task = asyncio.get_running_loop().create_task(self.run())
+
+	def push(self, frame):
+		kind = STATE_KINDS.get(frame.state['type'])
+		spectator_stats['queued'] += 1
+		if kind is not None and kind == self.tail_kind:
+			if frame.state['type'] == 'gd':
+				frame = Frame(merge_delta(self.queue[-1].state, frame.state))
+			self.queue[-1] = frame
+			spectator_stats['coalesced'] += 1
+			return
+		self.tail_kind = kind
+		if len(self.queue) >= self.size:
+			dropped = self.queue.popleft()
+			if dropped.state['type'] == 'gd':
+				self.carry_delta(dropped.state)
+			if not spectator_stats['dropped']:
+				logger.warning(f"{self.name}: spectator outbox full, dropping the oldest frames")
+			spectator_stats['dropped'] += 1
+		if frame.state['type'] in FULL_STATES:
+			self.needs_keyframe = False
+		elif self.needs_keyframe and frame.state['type'] == 'gd':
+			keyframe = self.keyframe() if self.keyframe else None
+			if keyframe is not None:
+				frame = Frame(keyframe)
+				self.needs_keyframe = False
+		self.queue.append(frame)
+		self.drained.clear()
+		self.wake.set()
+
+	def carry_delta(self, delta):
+		# the changes of a dropped gd still reach the client with the next one
+		for index, frame in enumerate(self.queue):
+			if frame.state['type'] == 'gd':
+				self.queue[index] = Frame(merge_delta(delta, frame.state))
+				return
+			if frame.state['type'] in FULL_STATES:
+				# replaces it anyway
+				return
+		self.needs_keyframe = True
+
+	async def run(self):
+		next_state = 0.0
+		while True:
+			if not self.queue:
+				self.drained.set()
+				self.wake.clear()
+				await self.wake.wait()
+			frame = self.queue[0]
+			is_state = frame.state['type'] in STATE_KINDS
+			if is_state:
+				delay = next_state - time.monotonic()
+				if delay > 0:
+					# the state may still be replaced by a newer one meanwhile
+					await asyncio.sleep(delay)
+					continue
+			self.queue.popleft()
+			if not self.queue:
+				self.tail_kind = None
+			await self.deliver(frame)
+			spectator_stats['sent'] += 1
+			if is_state:
+				next_state = time.monotonic() + self.interval
+
+	async def flush(self, timeout):
+		# before closing: the last frames (game_end) are sent
+		try:
+			await asyncio.wait_for(self.drained.wait(), timeout)
+		except asyncio.TimeoutError:
+			pass
+
+	def close(self):
+		self.task.cancel()
+		self.queue.clear()
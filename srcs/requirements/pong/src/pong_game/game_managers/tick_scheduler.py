@@ -0,0 +1,202 @@
+from ..utils.logger import logger
+from ..utils.metrics import metrics
+from .game_manager import game_manager
+from ..game.game import update_games
+import asyncio
+import time
+
+TICK = metrics.phase('tick')
+PHYSICS = metrics.phase('physics')
+PUBLISH = metrics.phase('publish')
+
+TICK_RATE = 0.025 # fixed simulation step (40 Hz)
+MAX_CATCH_UP_STEPS = 4 # steps a late room may run in a single tick
+
+class TickScheduler:
+	"""
+	Advances every running room on a fixed timestep from a single task.
+
+	Each room keeps its own time accumulator: when the event loop is late the
+	room runs several fixed steps to catch up, bounded by `max_catch_up_steps`.
+	Time beyond that bound is dropped, so an overloaded process slows the
+	matches down instead of integrating bigger (tunnelling) steps.
+
+	Only the physics runs on the tick: the states of a room are published by
+	a task of the room, one publication at a time and in order. While it is
+	still sending, the states of the next ticks wait in its backlog, where
+	only the latest update is kept.
+	"""
+
+	def __init__(self, tick_rate=TICK_RATE, max_catch_up_steps=MAX_CATCH_UP_STEPS):
+		self.tick_rate = tick_rate
+		self.max_catch_up_steps = max_catch_up_steps
+		self.rooms = {}
+		self.publishers = {} # game_id: backlog and task of its publications
+		self._task = None
+		self.engine = update_games
+		self.stats = {
+			'ticks': 0,
+			'steps': 0,
+			'overruns': 0,
+			'dropped_steps': 0,
+			'coalesced_states': 0,
+			'last_tick_duration': 0.0,
+			'max_tick_duration': 0.0,
+		}
+
+	def add_room(self, game_id, consumer):
+		self.rooms[game_id] = {
+			'consumer': consumer,
+			'accumulator': 0.0,
+			'last_time': time.perf_counter(),
+		}
+		logger.debug(f"tick_scheduler: {game_id} added ({len(self.rooms)} rooms)")
+		metrics.start_lag_monitor()
+		if self._task is None or self._task.done():
+			self._task = asyncio.create_task(self._loop())
+
+	def remove_room(self, game_id):
+		if game_id in self.rooms:
+			del self.rooms[game_id]
+			logger.debug(f"tick_scheduler: {game_id} removed ({len(self.rooms)} rooms)")
+
+	def set_engine(self, engine):
+		"""
+		`engine(games, dt)` advances every game of the list by one fixed step
+		and returns their states in the same order.
+		"""
+		self.engine = engine
+		logger.info(f"tick_scheduler: physics engine {getattr(engine, '__name__', type(engine).__name__)}")
+
+	def steps_owed(self, game_id, room, now):
+		"""
+		Number of fixed steps a room has to run this tick, from its accumulator.
+		"""
+		room['accumulator'] += now - room['last_time']
+		room['last_time'] = now
+		steps = int(room['accumulator'] / self.tick_rate)
+		if steps > self.max_catch_up_steps:
+			self.stats['dropped_steps'] += steps - self.max_catch_up_steps
+			steps = self.max_catch_up_steps
+			room['accumulator'] = 0.0
+		else:
+			room['accumulator'] -= steps * self.tick_rate
+		return steps
+
+	def step_rooms(self, now):
+		"""
+		Run the fixed steps owed to every room, all the rooms due at a given
+		step going through the engine together. Returns (consumer, states)
+		pairs, states holding every event state (padel_contact, scored,
+		game_end) plus the latest update of the room.
+		"""
+		due = []
+		for game_id, room in list(self.rooms.items()):
+			game_room = game_manager.get_room(game_id)
+			game = game_room['game_instance'] if game_room else None
+			if not game:
+				self.remove_room(game_id)
+				continue
+			steps = self.steps_owed(game_id, room, now)
+			if steps:
+				due.append({'game_id': game_id, 'game': game, 'consumer': room['consumer'], 'steps': steps, 'states': [], 'latest': None})
+		rooms = list(due)
+		step = 0
+		while due:
+			for entry, state in self.run_engine(due):
+				self.stats['steps'] += 1
+				entry['latest'] = state
+				if state['type'] != 'gu':
+					entry['states'].append(state)
+				if state['type'] == 'game_end':
+					self.remove_room(entry['game_id'])
+			step += 1
+			due = [entry for entry in due if entry['game_id'] in self.rooms and entry['steps'] > step]
+		publications = []
+		for entry in rooms:
+			if entry['latest'] and entry['latest']['type'] == 'gu':
+				entry['states'].append(entry['latest'])
+			if entry['states']:
+				publications.append((entry['consumer'], entry['states']))
+		return publications
+
+	def run_engine(self, due):
+		if self.engine is not update_games:
+			games = [entry['game'] for entry in due]
+			try:
+				return list(zip(due, self.engine(games, self.tick_rate)))
+			except Exception as e:
+				# part of the rooms may already be advanced: this step is not
+				# replayed, the following ones run room by room
+				logger.error(f"tick_scheduler: engine failed ({e}), back to per room updates")
+				self.set_engine(update_games)
+				return []
+		results = []
+		for entry in due:
+			try:
+				results.append((entry, entry['game'].update(self.tick_rate)))
+			except Exception as e:
+				logger.error(f"tick_scheduler: {entry['game_id']} update failed: {e}")
+				self.remove_room(entry['game_id'])
+		return results
+
+	async def _loop(self):
+		logger.debug("tick_scheduler is running")
+		next_tick = time.perf_counter()
+		try:
+			while self.rooms:
+				tick_start = time.perf_counter()
+				for consumer, states in self.step_rooms(tick_start):
+					self.publish(consumer, states)
+				PHYSICS.observe(time.perf_counter() - tick_start)
+				self.record_tick(time.perf_counter() - tick_start)
+				next_tick += self.tick_rate
+				delay = next_tick - time.perf_counter()
+				if delay < 0:
+					# Overrun: rooms catch up through their accumulators, the
+					# schedule itself restarts from now instead of bursting.
+					self.stats['overruns'] += 1
+					next_tick = time.perf_counter()
+					delay = 0
+				await asyncio.sleep(delay)
+		finally:
+			# idle or shut down, add_room starts both again
+			metrics.stop_lag_monitor()
+		logger.debug("tick_scheduler is idle")
+
+	def publish(self, consumer, states):
+		publisher = self.publishers.get(consumer.game_id)
+		if publisher is None:
+			publisher = {'backlog': list(states)}
+			self.publishers[consumer.game_id] = publisher
+			publisher['task'] = asyncio.create_task(self._publish(consumer, publisher))
+			return
+		# the room is still sending: the events are kept, the updates
+		# replaced by the latest one
+		backlog = publisher['backlog'] + list(states)
+		last_update = max((index for index, state in enumerate(backlog) if state['type'] == 'gu'), default=None)
+		publisher['backlog'] = [state for index, state in enumerate(backlog)
+			if state['type'] != 'gu' or index == last_update]
+		self.stats['coalesced_states'] += len(backlog) - len(publisher['backlog'])
+
+	async def _publish(self, consumer, publisher):
+		try:
+			while publisher['backlog']:
+				states, publisher['backlog'] = publisher['backlog'], []
+				publish_start = time.perf_counter()
+				try:
+					await consumer.publish_states(states)
+				except Exception as e:
+					logger.error(f"tick_scheduler: publish failed: {e}")
+				PUBLISH.observe(time.perf_counter() - publish_start)
+		finally:
+			del self.publishers[consumer.game_id]
+
+	def record_tick(self, duration):
+		TICK.observe(duration)
+		self.stats['ticks'] += 1
+		self.stats['last_tick_duration'] = duration
+		if duration > self.stats['max_tick_duration']:
+			self.stats['max_tick_duration'] = duration
+
+tick_scheduler = TickScheduler()
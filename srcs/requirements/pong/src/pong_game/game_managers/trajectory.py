@@ -0,0 +1,121 @@
+"""
+Trajectory stream of a room.
+
+Between two events the ball and the padels move in straight lines at
+constant speed, so connections opened with `?trajectory=1` do not receive
+the 40 Hz `gu` states but `tr` events describing the current motion:
+
+	{'type': 'tr', 't': game time, 'bp': ball position, 'bv': ball velocity,
+	 'pp': padel positions, 'pv': padel velocities}
+
+and extrapolate `position + velocity * (now - t)` in between. An event is
+sent when a velocity changes (padel contact, border bounce, input, score,
+start of a point) or when the motion drifts from the last event, plus a
+correction every CORRECTION_INTERVAL seconds of game time.
+
+Velocities come from the motion: the ball uses its exported speed while it
+is allowed to move, the padels the distance covered since the previous
+state. The time and the moving flag are those of the step that produced the
+state (Game.export_state): states are published after the tick, sometimes
+several steps at once.
+
+The ball stream (`?ball=1`, the AIs) is the same without the padel events:
+a `tr` when the motion of the ball changes (padel contact, border bounce,
+score, start of a point) and a sample every BALL_SAMPLE_INTERVAL seconds.
+"""
+
+CORRECTION_INTERVAL = 0.25 # seconds of game time between two corrections
+BALL_SAMPLE_INTERVAL = 0.5 # seconds of game time, ball stream
+POSITION_TOLERANCE = 0.05 # arena units
+VELOCITY_TOLERANCE = 0.01 # arena units per second
+
+STILL = {'x': 0.0, 'y': 0.0}
+
+class TrajectoryEncoder:
+	def __init__(self, correction_interval=CORRECTION_INTERVAL, padels=True):
+		"""
+		`padels`: whether a change in the motion of a padel is an event.
+		"""
+		self.correction_interval = correction_interval
+		self.padels = padels
+		self.last = None
+		self.previous = None
+		self.stats = {
+			'frames': 0,
+			'events': 0,
+			'corrections': 0,
+			'skipped': 0,
+			'full_bytes': 0,
+			'sent_bytes': 0,
+		}
+
+	def reset(self):
+		# start of the game
+		self.last = None
+		self.previous = None
+
+	def encode(self, state):
+		"""
+		`tr` event to send for a state carrying the ball, None when the last
+		event still describes the motion. The other states are sent as is.
+		"""
+		if state['type'] not in ('gu', 'padel_contact'):
+			return state
+		self.stats['frames'] += 1
+		t = state['t']
+		bv = dict(state['bs']) if state['moving'] else dict(STILL)
+		pv = {}
+		for key, y in state['pp'].items():
+			pv[key] = 0.0
+			if self.previous and key in self.previous['pp'] and t > self.previous['t']:
+				pv[key] = (y - self.previous['pp'][key]) / (t - self.previous['t'])
+		self.previous = {'t': t, 'pp': dict(state['pp'])}
+		if self.last is not None and not self.diverges(t, state['bp'], bv, state['pp'], pv):
+			if t - self.last['t'] < self.correction_interval:
+				self.stats['skipped'] += 1
+				return None
+			self.stats['corrections'] += 1
+		else:
+			self.stats['events'] += 1
+		self.last = {
+			'type': 'tr',
+			't': t,
+			'bp': dict(state['bp']),
+			'bv': bv,
+			'pp': dict(state['pp']),
+			'pv': pv
+		}
+		return self.last
+
+	def diverges(self, t, bp, bv, pp, pv):
+		last = self.last
+		elapsed = t - last['t']
+		if pp.keys() != last['pp'].keys():
+			return True
+		for axis in ('x', 'y'):
+			if abs(bv[axis] - last['bv'][axis]) > VELOCITY_TOLERANCE:
+				return True
+			if abs(last['bp'][axis] + last['bv'][axis] * elapsed - bp[axis]) > POSITION_TOLERANCE:
+				return True
+		if not self.padels:
+			return False
+		for key, y in pp.items():
+			if abs(pv[key] - last['pv'][key]) > VELOCITY_TOLERANCE:
+				return True
+			if abs(last['pp'][key] + last['pv'][key] * elapsed - y) > POSITION_TOLERANCE:
+				return True
+		return False
+
+	def keyframe(self):
+		"""
+		Last event, enough for a joining subscriber to extrapolate from.
+		"""
+		return self.last
+
+	def record(self, full_bytes, sent_bytes):
+		self.stats['full_bytes'] += full_bytes
+		self.stats['sent_bytes'] += sent_bytes
+
+	@property
+	def bytes_saved(self):
+		return self.stats['full_bytes'] - self.stats['sent_bytes']
@@ -0,0 +1,179 @@
+"""
+Binary frames for the per-tick game states.
+
+JSON stays the default format; a connection opened with `?format=binary`
+receives the `gu` and `padel_contact` states, and the `gd` (delta.py) or
+`tr` (trajectory.py) frames of its stream, as binary websocket frames;
+every other message is still sent as JSON text.
+
+Frame layouts (little endian):
+
+gu / padel_contact
+	header	B version	B type code	B padel mask
+	ball	f bp.x	f bp.y	f bp.z	f bs.x	f bs.y
+	padels	f y for every bit set in the mask, lowest bit first
+
+	Bit i of the padel mask is the padel `p{i + 1}` of the `pp` dict (p1..p4).
+
+gd (delta stream, see delta.py)
+	header	B version	B type code	H field mask
+	fields	f value for every bit set in the mask, lowest bit first
+
+	Bit i of the field mask is DELTA_FIELDS[i].
+
+tr (trajectory stream, see trajectory.py)
+	header	B version	B type code	B padel mask
+	motion	f t	f bp.x	f bp.y	f bp.z	f bv.x	f bv.y
+	padels	f y	f v for every bit set in the mask, lowest bit first
+
+	t is the game time of the step the motion starts from, bv the ball
+	velocity (zero while the ball waits), y and v the position and
+	velocity of the padel `p{i + 1}` (pp and pv dicts).
+
+The decoders live in static/srcs/wire.js and in the IA service; bump
+WIRE_VERSION when the layout changes.
+"""
+import struct
+
+WIRE_VERSION = 1
+
+TYPE_CODES = {
+	'gu': 1,
+	'padel_contact': 2,
+	'gd': 3,
+	'tr': 4,
+}
+TYPE_NAMES = {code: name for name, code in TYPE_CODES.items()}
+
+HEADER = struct.Struct('<BBB')
+BALL = struct.Struct('<5f')
+MAX_PADELS = 4
+PADELS = [struct.Struct(f'<{count}f') for count in range(MAX_PADELS + 1)]
+
+DELTA_HEADER = struct.Struct('<BBH')
+DELTA_FIELDS = (
+	('bp', 'x'), ('bp', 'y'), ('bp', 'z'),
+	('bs', 'x'), ('bs', 'y'),
+	('pp', 'p1'), ('pp', 'p2'), ('pp', 'p3'), ('pp', 'p4'),
+)
+VALUES = [struct.Struct(f'<{count}f') for count in range(len(DELTA_FIELDS) + 1)]
+
+MOTION = struct.Struct('<6f')
+
+FORMATS = ('json', 'binary')
+
+def parse_query(query_string):
+	"""
+	Parameters of the raw query string of a connection scope.
+	"""
+	if isinstance(query_string, bytes):
+		query_string = query_string.decode('latin-1')
+	params = {}
+	for param in query_string.split('&'):
+		key, _, value = param.partition('=')
+		if key:
+			params[key] = value
+	return params
+
+def parse_format(query_string):
+	"""
+	Wire format asked by a connection, from the raw query string of its scope.
+	"""
+	value = parse_query(query_string).get('format')
+	return value if value in FORMATS else 'json'
+
+def is_binary(state):
+	return state.get('type') in TYPE_CODES
+
+def encode_state(state):
+	"""
+	Binary frame of a `gu` / `padel_contact` state, a `gd` delta or a `tr`
+	trajectory event.
+	"""
+	if state['type'] == 'gd':
+		return encode_delta(state)
+	if state['type'] == 'tr':
+		return encode_trajectory(state)
+	mask = 0
+	padels = []
+	pp = state['pp']
+	for i in range(MAX_PADELS):
+		key = f'p{i + 1}'
+		if key in pp:
+			mask |= 1 << i
+			padels.append(pp[key])
+	bp = state['bp']
+	bs = state['bs']
+	return HEADER.pack(WIRE_VERSION, TYPE_CODES[state['type']], mask) \
+		+ BALL.pack(bp['x'], bp['y'], bp.get('z', 0), bs['x'], bs['y']) \
+		+ PADELS[len(padels)].pack(*padels)
+
+def encode_delta(state):
+	mask = 0
+	values = []
+	for i, (group, key) in enumerate(DELTA_FIELDS):
+		if key in state.get(group, ()):
+			mask |= 1 << i
+			values.append(state[group][key])
+	return DELTA_HEADER.pack(WIRE_VERSION, TYPE_CODES['gd'], mask) \
+		+ VALUES[len(values)].pack(*values)
+
+def encode_trajectory(state):
+	mask = 0
+	padels = []
+	pp = state['pp']
+	for i in range(MAX_PADELS):
+		key = f'p{i + 1}'
+		if key in pp:
+			mask |= 1 << i
+			padels += (pp[key], state['pv'][key])
+	bp = state['bp']
+	bv = state['bv']
+	return HEADER.pack(WIRE_VERSION, TYPE_CODES['tr'], mask) \
+		+ MOTION.pack(state['t'], bp['x'], bp['y'], bp.get('z', 0), bv['x'], bv['y']) \
+		+ VALUES[len(padels)].pack(*padels)
+
+def decode_frame(frame):
+	"""
+	State dict of a binary frame, as it would have been sent in JSON.
+	"""
+	version, code, mask = HEADER.unpack_from(frame, 0)
+	if version != WIRE_VERSION:
+		raise ValueError(f"unsupported wire version {version}")
+	if code not in TYPE_NAMES:
+		raise ValueError(f"unknown frame type {code}")
+	if TYPE_NAMES[code] == 'gd':
+		return decode_delta(frame)
+	if TYPE_NAMES[code] == 'tr':
+		return decode_trajectory(frame, mask)
+	x, y, z, sx, sy = BALL.unpack_from(frame, HEADER.size)
+	keys = [f'p{i + 1}' for i in range(MAX_PADELS) if mask & (1 << i)]
+	padels = PADELS[len(keys)].unpack_from(frame, HEADER.size + BALL.size)
+	return {
+		'type': TYPE_NAMES[code],
+		'bp': {'x': x, 'y': y, 'z': z},
+		'bs': {'x': sx, 'y': sy},
+		'pp': dict(zip(keys, padels))
+	}
+
+def decode_delta(frame):
+	_, _, mask = DELTA_HEADER.unpack_from(frame, 0)
+	fields = [field for i, field in enumerate(DELTA_FIELDS) if mask & (1 << i)]
+	values = VALUES[len(fields)].unpack_from(frame, DELTA_HEADER.size)
+	state = {'type': 'gd'}
+	for (group, key), value in zip(fields, values):
+		state.setdefault(group, {})[key] = value
+	return state
+
+def decode_trajectory(frame, mask):
+	t, x, y, z, vx, vy = MOTION.unpack_from(frame, HEADER.size)
+	keys = [f'p{i + 1}' for i in range(MAX_PADELS) if mask & (1 << i)]
+	values = VALUES[2 * len(keys)].unpack_from(frame, HEADER.size + MOTION.size)
+	return {
+		'type': 'tr',
+		't': t,
+		'bp': {'x': x, 'y': y, 'z': z},
+		'bv': {'x': vx, 'y': vy},
+		'pp': dict(zip(keys, values[0::2])),
+		'pv': dict(zip(keys, values[1::2]))
+	}
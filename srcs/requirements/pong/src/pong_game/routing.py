@@ -1,7 +1,18 @@
 from django.urls import re_path
 from .game_managers.game_consumers import GameConsumer
+from .game_managers.shards import shards
+
+consumer = GameConsumer
+spectator_consumer = GameConsumer
+if not shards.owns_rooms:
+	# the rooms live in the workers
+	from .game_managers.proxy_consumer import ProxyConsumer
+	from .game_managers.relay import RelayConsumer
+	consumer = ProxyConsumer
+	spectator_consumer = RelayConsumer
 
 websocket_urlpatterns = [
-	re_path(r"ws/pong/(?P<game_id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})/$", GameConsumer.as_asgi()),
-	re_path(r"ws/pong/(?P<game_id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})/(?P<special_id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})/$", GameConsumer.as_asgi()),
+	re_path(r"ws/pong/(?P<game_id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})/$", consumer.as_asgi()),
+	re_path(r"ws/pong/(?P<game_id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})/spectate/$", spectator_consumer.as_asgi()),
+	re_path(r"ws/pong/(?P<game_id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})/(?P<special_id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})/$", consumer.as_asgi()),
 ]
@@ -0,0 +1,30 @@
+import random
+import pytest
+from pong_game.game.game import Game, update_games
+
+pytest.importorskip('numpy')
+from pong_game.game.batch_physics import BatchPhysics
+
+MODIFIERS = [[], ['so_long'], ['small_arena'], ['elusive'], ['so_long', 'small_arena']]
+
+def games(seed):
+	return [Game({'left': None, 'right': None}, 'PONG_CLASSIC', modifiers, [['left'], ['right']],
+		seed=seed + i, record=False) for i, modifiers in enumerate(MODIFIERS)]
+
+def test_batch_engine_matches_the_per_room_engine():
+	per_room, batched = games(7), games(7)
+	engine = BatchPhysics()
+	inputs = random.Random(3)
+	types = set()
+	for step in range(2000):
+		if step % 7 == 0:
+			for a, b in zip(per_room, batched):
+				for side in ('left', 'right'):
+					name = inputs.choice(['up', 'down', 'stop_up', 'stop_down'])
+					a.input_players(side, a.players[side].input_data[name])
+					b.input_players(side, b.players[side].input_data[name])
+		states = update_games(per_room, 0.025)
+		assert engine(batched, 0.025) == states, f"step {step}"
+		types.update(state['type'] for state in states)
+	# both paths of the batch engine ran
+	assert {'gu', 'padel_contact', 'scored'} <= types
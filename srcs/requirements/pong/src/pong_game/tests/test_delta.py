@@ -0,0 +1,41 @@
+from pong_game.game_managers.delta import DeltaEncoder
+from pong_game.game_managers.spectators import merge_delta
+
+def state(x, y=0.0, p1=0.0):
+	return {
+		'type': 'gu',
+		'bp': {'x': x, 'y': y, 'z': 1.0},
+		'bs': {'x': 1.0, 'y': 0.0},
+		'pp': {'p1': p1, 'p2': 0.0},
+	}
+
+def test_keyframe_first():
+	encoder = DeltaEncoder()
+	assert encoder.encode(state(0.0)) == state(0.0)
+	assert encoder.stats['keyframes'] == 1
+
+def test_dropped_frame_keeps_the_drift():
+	encoder = DeltaEncoder(threshold=0.01)
+	client = encoder.encode(state(0.0))
+	# below the threshold: no frame, the reference is kept
+	assert encoder.encode(state(0.006)) is None
+	assert encoder.stats['skipped'] == 1
+	# measured from the last emitted value, not from the dropped state
+	delta = encoder.encode(state(0.012))
+	assert delta == {'type': 'gd', 'bp': {'x': 0.012}}
+	client = merge_delta(client, delta)
+	assert client['bp']['x'] == 0.012
+
+def test_client_rebuilds_the_states():
+	encoder = DeltaEncoder(keyframe_interval=5, threshold=0.01)
+	client = None
+	for i in range(12):
+		current = state(i * 0.5, y=i * 0.003, p1=(i % 3) * 0.2)
+		frame = encoder.encode(current)
+		if frame is None:
+			continue
+		client = frame if frame['type'] == 'gu' else merge_delta(client, frame)
+		for group in ('bp', 'bs', 'pp'):
+			for key, value in current[group].items():
+				assert abs(client[group][key] - value) <= 0.01
+	assert encoder.keyframe() == {**client, 'type': 'gu'}
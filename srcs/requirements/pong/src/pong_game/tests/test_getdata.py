@@ -0,0 +1,15 @@
+from pong_game.game.getdata import get_data, modifiers_key, parse_modifiers
+
+def test_modifiers_from_the_game_manager_string():
+	# the game_manager sends the modifiers as a comma separated string
+	assert modifiers_key('so_long,small_arena') == frozenset({'so_long', 'small_arena'})
+	assert modifiers_key(' so_long , border,') == frozenset({'so_long', 'border'})
+	assert get_data('so_long,small_arena', 'arena_data') is get_data(['small_arena', 'so_long'], 'arena_data')
+
+def test_modifiers_list_and_empty():
+	assert modifiers_key(['elusive', 'unknown']) == frozenset({'elusive'})
+	assert modifiers_key(None) == modifiers_key('') == modifiers_key([]) == frozenset()
+	assert parse_modifiers('so_long,small_arena') == ['so_long', 'small_arena']
+
+def test_string_modifiers_change_the_arena():
+	assert dict(get_data('small_arena', 'arena_data')['size']) != dict(get_data(None, 'arena_data')['size'])
@@ -0,0 +1,39 @@
+from pong_game.game_managers import inputs
+from pong_game.game_managers.inputs import InputLimiter
+
+class Clock:
+	def __init__(self):
+		self.now = 100.0
+
+	def __call__(self):
+		return self.now
+
+def limiter(monkeypatch, rate=10, burst=3):
+	clock = Clock()
+	monkeypatch.setattr(inputs.time, 'monotonic', clock)
+	return InputLimiter(rate, burst), clock
+
+def test_burst_then_drop(monkeypatch):
+	limit, clock = limiter(monkeypatch)
+	assert [limit.allow('u0') for _ in range(4)] == [True, True, True, False]
+	assert limit.stats['received'] == 4 and limit.stats['dropped'] == 1
+
+def test_refill_at_the_rate(monkeypatch):
+	limit, clock = limiter(monkeypatch)
+	for _ in range(3):
+		limit.allow('u0')
+	clock.now += 0.15
+	assert limit.allow('u0')
+	assert not limit.allow('u0')
+	# no more than the burst after a long pause
+	clock.now += 10
+	assert [limit.allow('u0') for _ in range(4)] == [True, True, True, False]
+
+def test_stops_always_get_through(monkeypatch):
+	limit, clock = limiter(monkeypatch)
+	for _ in range(3):
+		limit.allow('u0')
+	assert not limit.allow('u0')
+	assert limit.allow('u0', force=True)
+	assert limit.tokens == 0
+	assert limit.stats['dropped'] == 1
@@ -0,0 +1,47 @@
+import json
+import random
+import pytest
+from pong_game.game.game import Game
+from pong_game.game.replay import Replay, ReplayError, ReplayRecorder
+
+def test_meta_modifiers_from_the_game_manager_string():
+	recorder = ReplayRecorder(1, 'PONG_CLASSIC', 'so_long,small_arena', ['left', 'right'], None)
+	assert json.loads(recorder.meta)['modifiers'] == ['so_long', 'small_arena']
+
+def play_match(modifiers, seed, steps=3000):
+	game = Game({'left': None, 'right': None}, 'PONG_CLASSIC', modifiers, [['left'], ['right']], seed=seed)
+	inputs = random.Random(seed)
+	states = []
+	for step in range(1, steps + 1):
+		if step % 5 == 0:
+			for side in ('left', 'right'):
+				name = inputs.choice(['up', 'down', 'stop_up', 'stop_down'])
+				game.input_players(side, game.players[side].input_data[name])
+		state = game.update(0.025)
+		states.append((step, state))
+		if state['type'] == 'game_end':
+			break
+	game.recorder.event(game.steps, 'end')
+	return game, states
+
+def test_replay_simulates_the_same_states():
+	for modifiers, seed in ((None, 1), ('so_long,small_arena', 2), (['elusive'], 3)):
+		game, states = play_match(modifiers, seed)
+		assert list(Replay(game.recorder.data).play()) == states
+
+def test_replay_until():
+	game, states = play_match(None, 4, steps=200)
+	assert list(Replay(game.recorder.data).play(until=50)) == states[:50]
+
+def test_divergence_and_corruption_detected():
+	game, states = play_match(None, 5)
+	assert any(state['type'] == 'scored' for step, state in states)
+	data = bytearray(game.recorder.data)
+	# another seed: the points are not scored at the recorded steps
+	data[5] ^= 1
+	with pytest.raises(ReplayError):
+		list(Replay(data).play())
+	with pytest.raises(ReplayError):
+		Replay(bytes(game.recorder.data)[:10])
+	with pytest.raises(ReplayError):
+		Replay(b'XXXX' + bytes(game.recorder.data)[4:])
@@ -0,0 +1,49 @@
+import asyncio
+from pong_game.game_managers.broadcaster import Frame
+from pong_game.game_managers.spectators import SpectatorOutbox
+
+async def deliver(frame):
+	pass
+
+def frames(outbox):
+	states = [frame.state for frame in outbox.queue]
+	outbox.close()
+	return states
+
+def test_dropped_delta_merged_into_the_next_one():
+	async def run():
+		outbox = SpectatorOutbox(deliver, size=3)
+		outbox.push(Frame({'type': 'gd', 'bp': {'x': 1}}))
+		outbox.push(Frame({'type': 'score'}))
+		outbox.push(Frame({'type': 'gd', 'bp': {'y': 2}}))
+		outbox.push(Frame({'type': 'score'}))
+		return frames(outbox)
+	assert asyncio.run(run()) == [
+		{'type': 'score'},
+		{'type': 'gd', 'bp': {'x': 1, 'y': 2}},
+		{'type': 'score'},
+	]
+
+def test_dropped_delta_without_next_state_asks_a_keyframe():
+	async def run():
+		keyframe = {'type': 'gu', 'bp': {'x': 1, 'y': 2}}
+		outbox = SpectatorOutbox(deliver, size=2, keyframe=lambda: keyframe)
+		outbox.push(Frame({'type': 'gd', 'bp': {'x': 1}}))
+		outbox.push(Frame({'type': 'score'}))
+		outbox.push(Frame({'type': 'goal'}))
+		outbox.push(Frame({'type': 'gd', 'bp': {'y': 2}}))
+		return frames(outbox)
+	assert asyncio.run(run()) == [
+		{'type': 'goal'},
+		{'type': 'gu', 'bp': {'x': 1, 'y': 2}},
+	]
+
+def test_padel_contact_never_replaced():
+	async def run():
+		outbox = SpectatorOutbox(deliver)
+		outbox.push(Frame({'type': 'gu', 'step': 1}))
+		outbox.push(Frame({'type': 'padel_contact', 'step': 2}))
+		outbox.push(Frame({'type': 'gu', 'step': 3}))
+		outbox.push(Frame({'type': 'gu', 'step': 4}))
+		return frames(outbox)
+	assert [state['step'] for state in asyncio.run(run())] == [1, 2, 4]
@@ -0,0 +1,85 @@
+import asyncio
+from pong_game.game_managers.game_manager import game_manager
+from pong_game.game_managers.tick_scheduler import TickScheduler
+from pong_game.utils.metrics import metrics
+
+class Game:
+	def __init__(self, events=()):
+		self.steps = 0
+		self.events = dict(events) # step: state type
+
+	def update(self, dt):
+		self.steps += 1
+		return {'type': self.events.get(self.steps, 'gu'), 'step': self.steps}
+
+class Consumer:
+	def __init__(self, game_id):
+		self.game_id = game_id
+		self.published = []
+		self.release = asyncio.Event()
+
+	async def publish_states(self, states):
+		self.published.append([state.get('step', state['type']) for state in states])
+		await self.release.wait()
+
+def add_room(monkeypatch, scheduler, game_id, game, now=0.0):
+	monkeypatch.setitem(game_manager.games_room, game_id, {'game_instance': game})
+	scheduler.rooms[game_id] = {'consumer': Consumer(game_id), 'accumulator': 0.0, 'last_time': now}
+
+def test_catch_up_bounded():
+	scheduler = TickScheduler(tick_rate=0.025, max_catch_up_steps=4)
+	room = {'accumulator': 0.0, 'last_time': 0.0}
+	assert scheduler.steps_owed('g', room, 0.06) == 2
+	assert abs(room['accumulator'] - 0.01) < 1e-9
+	# a second late: 4 steps, the rest of the time is dropped
+	assert scheduler.steps_owed('g', room, 1.06) == 4
+	assert room['accumulator'] == 0.0
+	assert scheduler.stats['dropped_steps'] == 36
+
+def test_catch_up_keeps_the_events(monkeypatch):
+	scheduler = TickScheduler(tick_rate=0.025, max_catch_up_steps=4)
+	game = Game({2: 'padel_contact'})
+	add_room(monkeypatch, scheduler, 'g', game)
+	[(consumer, states)] = scheduler.step_rooms(0.1)
+	assert game.steps == 4
+	# the event of step 2 and the latest update only
+	assert [state['step'] for state in states] == [2, 4]
+
+def test_game_end_removes_the_room(monkeypatch):
+	scheduler = TickScheduler(tick_rate=0.025, max_catch_up_steps=4)
+	add_room(monkeypatch, scheduler, 'g', Game({1: 'game_end'}))
+	[(consumer, states)] = scheduler.step_rooms(0.1)
+	assert [state['type'] for state in states] == ['game_end']
+	assert 'g' not in scheduler.rooms
+
+def test_publish_backlog_keeps_events_and_latest_update():
+	async def run():
+		scheduler = TickScheduler()
+		consumer = Consumer('g')
+		scheduler.publish(consumer, [{'type': 'gu', 'step': 1}])
+		await asyncio.sleep(0)
+		# the room is still sending step 1
+		scheduler.publish(consumer, [{'type': 'gu', 'step': 2}])
+		scheduler.publish(consumer, [{'type': 'scored', 'step': 3}, {'type': 'gu', 'step': 4}])
+		scheduler.publish(consumer, [{'type': 'gu', 'step': 5}])
+		consumer.release.set()
+		await scheduler.publishers['g']['task']
+		return scheduler, consumer
+	scheduler, consumer = asyncio.run(run())
+	assert consumer.published == [[1], [3, 5]]
+	assert scheduler.stats['coalesced_states'] == 2
+	assert scheduler.publishers == {}
+
+def test_lag_monitor_stops_with_the_scheduler(monkeypatch):
+	async def run():
+		scheduler = TickScheduler(tick_rate=0.01)
+		monkeypatch.setitem(game_manager.games_room, 'g', {'game_instance': Game({1: 'game_end'})})
+		consumer = Consumer('g')
+		consumer.release.set()
+		scheduler.add_room('g', consumer)
+		lag_task = metrics.lag_task
+		assert lag_task is not None
+		await scheduler._task
+		await asyncio.sleep(0)
+		assert lag_task.cancelled() and metrics.lag_task is None
+	asyncio.run(run())
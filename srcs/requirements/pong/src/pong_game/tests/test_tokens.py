@@ -0,0 +1,44 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import time
+from pong_game.utils.tokens import TokenVerifier, decode_token
+
+KEY = 'signing-key'
+NOW = 1_700_000_000
+
+def segment(data):
+	return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip('=')
+
+def token(claims, key=KEY, alg='HS256'):
+	signed = f"{segment({'alg': alg, 'typ': 'JWT'})}.{segment(claims)}"
+	signature = hmac.new(key.encode(), signed.encode(), hashlib.sha256).digest()
+	return f"{signed}.{base64.urlsafe_b64encode(signature).decode().rstrip('=')}"
+
+def access(**claims):
+	return {'token_type': 'access', 'user_id': 42, 'exp': NOW + 60, **claims}
+
+def test_valid_token():
+	assert decode_token(token(access()), KEY, NOW)['user_id'] == 42
+
+def test_rejected_tokens():
+	assert decode_token(token(access()), 'other-key', NOW) is None
+	assert decode_token(token(access(exp=NOW)), KEY, NOW) is None
+	assert decode_token(token(access(token_type='refresh')), KEY, NOW) is None
+	assert decode_token(token(access(), alg='none'), KEY, NOW) is None
+	assert decode_token(token(access()).rsplit('.', 1)[0] + '.AAAA', KEY, NOW) is None
+
+def test_malformed_tokens():
+	for value in ('', 'a.b', 'a.b.c', 'a.b.c.d', f"x.{segment([1])}.y"):
+		assert decode_token(value, KEY, NOW) is None
+
+def test_remote_token_cached_until_its_expiry():
+	verifier = TokenVerifier(ttl=3600)
+	async def request(access_token, refresh_token):
+		return 'alice'
+	verifier.request = request
+	value = token(access(exp=time.time() + 60), key='whatever')
+	assert asyncio.run(verifier.verify(value)) == 'alice'
+	assert time.time() + 50 < verifier.tokens[value][1] <= time.time() + 60
@@ -0,0 +1,52 @@
+from pong_game.game.game import Game
+from pong_game.game_managers.trajectory import TrajectoryEncoder, STILL
+
+def state(t, x, vx=10.0, p1=0.0, moving=True, type='gu'):
+	return {
+		'type': type,
+		'bp': {'x': x, 'y': 0.0, 'z': 1.0},
+		'bs': {'x': vx, 'y': 0.0},
+		'pp': {'p1': p1, 'p2': 0.0},
+		't': t,
+		'moving': moving,
+	}
+
+def test_event_then_extrapolated():
+	encoder = TrajectoryEncoder(correction_interval=1.0)
+	first = encoder.encode(state(1.0, 0.0))
+	assert first['t'] == 1.0 and first['bv'] == {'x': 10.0, 'y': 0.0}
+	# on the line of the last event
+	assert encoder.encode(state(1.025, 0.25)) is None
+	# the ball turns around
+	assert encoder.encode(state(1.05, 0.3, vx=-10.0))['bv']['x'] == -10.0
+
+def test_time_of_the_step_not_of_the_publication():
+	# two steps published together keep their own time and padel velocity
+	encoder = TrajectoryEncoder()
+	encoder.encode(state(1.0, 0.0))
+	event = encoder.encode(state(1.025, 0.25, p1=0.5))
+	assert event['t'] == 1.025
+	assert abs(event['pv']['p1'] - 20.0) < 1e-9
+
+def test_still_ball_while_waiting():
+	encoder = TrajectoryEncoder()
+	assert encoder.encode(state(0.5, 0.0, moving=False))['bv'] == STILL
+
+def test_other_states_as_is():
+	encoder = TrajectoryEncoder()
+	scored = {'type': 'scored', 'team': 'left'}
+	assert encoder.encode(scored) is scored
+
+def test_game_states_extrapolate():
+	game = Game({'left': None, 'right': None}, 'PONG_CLASSIC', [], [['left'], ['right']], seed=1, record=False)
+	encoder = TrajectoryEncoder()
+	last = None
+	for _ in range(400):
+		current = game.update(0.025)
+		if current['type'] not in ('gu', 'padel_contact'):
+			continue
+		event = encoder.encode(current)
+		last = event or last
+		elapsed = current['t'] - last['t']
+		for axis in ('x', 'y'):
+			assert abs(last['bp'][axis] + last['bv'][axis] * elapsed - current['bp'][axis]) <= 0.05
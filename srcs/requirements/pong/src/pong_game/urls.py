@@ -5,4 +5,8 @@ urlpatterns = [
 	path('', index, name='index'),
 	path('newgame/', newgame, name='newgame'),
     path('abortgame/', abortgame, name='abortgame'),
+    path('metrics/', export_metrics, name='metrics'),
+    path('replay/<str:game_id>/', replay, name='replay'),
+    path('replay/<str:game_id>/states/', replay_states, name='replay_states'),
+    path('spectate/<str:game_id>/', spectate, name='spectate'),
 ]
\ No newline at end of file
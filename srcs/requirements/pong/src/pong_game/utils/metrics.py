@@ -0,0 +1,115 @@
+"""
+Instrumentation of the game loop, exposed on /api/pong/metrics/ in the
+Prometheus text format.
+
+- pong_phase_seconds{phase}: histogram of the duration of each phase of
+  the loop:
+	tick		a whole tick of the scheduler
+	physics		stepping the rooms (the engine)
+	publish		one room delivering its backlog of states, in its own
+			task outside of the tick (tick_scheduler.py)
+	encode		encoding a frame (JSON or binary), once per format
+	send		one websocket send
+	channel_layer	one channel layer call (group_send, group_add, ...)
+- pong_loop_lag_seconds: histogram of the event loop lag, the delay with
+  which a sleep of LAG_INTERVAL wakes up (the time the loop was busy),
+  sampled while the scheduler runs,
+- counters and gauges of the existing stats (scheduler, broadcaster,
+  inputs, token verification) and the rooms of the process, given by the
+  view.
+
+Observing costs a bisect and two additions: the hot paths time themselves
+with time.perf_counter() and call observe().
+"""
+from bisect import bisect_left
+import asyncio
+import time
+
+# upper bounds in seconds, from 10 us to 2.5 s
+BUCKETS = (
+	0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+	0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+)
+LAG_INTERVAL = 0.1 # seconds
+
+class Histogram:
+	__slots__ = ('counts', 'sum', 'count')
+
+	def __init__(self):
+		self.counts = [0] * (len(BUCKETS) + 1)
+		self.sum = 0.0
+		self.count = 0
+
+	def observe(self, value):
+		self.counts[bisect_left(BUCKETS, value)] += 1
+		self.sum += value
+		self.count += 1
+
+	def render(self, name, labels=''):
+		lines = []
+		seen = 0
+		separator = ',' if labels else ''
+		for bound, count in zip(BUCKETS, self.counts):
+			seen += count
+			lines.append(f'{name}_bucket{{{labels}{separator}le="{bound}"}} {seen}')
+		lines.append(f'{name}_bucket{{{labels}{separator}le="+Inf"}} {self.count}')
+		suffix = f'{{{labels}}}' if labels else ''
+		lines.append(f'{name}_sum{suffix} {self.sum}')
+		lines.append(f'{name}_count{suffix} {self.count}')
+		return lines
+
+class Metrics:
+	def __init__(self):
+		self.phases = {}
+		self.loop_lag = Histogram()
+		self.lag_task = None
+
+	def phase(self, name):
+		histogram = self.phases.get(name)
+		if histogram is None:
+			histogram = self.phases[name] = Histogram()
+		return histogram
+
+	def start_lag_monitor(self):
+		# from a coroutine: the sampler runs on the loop being measured
+		if self.lag_task is None or self.lag_task.done():
+			self.lag_task = asyncio.get_running_loop().create_task(self.sample_lag())
+
+	def stop_lag_monitor(self):
+		if self.lag_task is not None:
+			self.lag_task.cancel()
+			self.lag_task = None
+
+	async def sample_lag(self):
+		while True:
+			start = time.perf_counter()
+			await asyncio.sleep(LAG_INTERVAL)
+			self.loop_lag.observe(max(time.perf_counter() - start - LAG_INTERVAL, 0.0))
+
+	def render(self, values=()):
+		"""
+		Text exposition of the histograms and of `values`, (name, type, help,
+		value or {labels: value}) tuples.
+		"""
+		lines = [
+			'# HELP pong_phase_seconds Duration of the phases of the game loop.',
+			'# TYPE pong_phase_seconds histogram',
+		]
+		for name, histogram in sorted(self.phases.items()):
+			lines += histogram.render('pong_phase_seconds', f'phase="{name}"')
+		lines += [
+			'# HELP pong_loop_lag_seconds Event loop lag.',
+			'# TYPE pong_loop_lag_seconds histogram',
+		]
+		lines += self.loop_lag.render('pong_loop_lag_seconds')
+		for name, kind, help, value in values:
+			lines.append(f'# HELP {name} {help}')
+			lines.append(f'# TYPE {name} {kind}')
+			if isinstance(value, dict):
+				for labels, item in value.items():
+					lines.append(f'{name}{{{labels}}} {item}')
+			else:
+				lines.append(f'{name} {value}')
+		return '\n'.join(lines) + '\n'
+
+metrics = Metrics()
@@ -0,0 +1,166 @@
+"""
+Access token verification for the websocket connections.
+
+The authentication service signs its SimpleJWT access tokens (HS256) with
+the key shared through the `jwt_signing_key` secret: with that key a token
+is checked here (signature, type, expiry) without any request. The tokens
+only carry the user id, the username is learned from the first remote
+verification of that user and kept in memory.
+
+The remote `verify_token/` call remains the fallback: no key configured,
+token not verifiable locally (expired, signed with another key) or user
+not known yet. Concurrent fallbacks for the same token share one request,
+made with a single client kept for the process.
+
+Verified tokens are kept in a bounded cache until they expire, at most
+`ttl` seconds.
+"""
+from .logger import logger
+from collections import OrderedDict
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import time
+import httpx
+
+AUTH_URL = "http://authentication:8000/api/authentication/verify_token/"
+CACHE_TTL = 60 # seconds
+CACHE_SIZE = 4096 # tokens
+USERS_SIZE = 4096 # user id -> username
+
+def b64decode(segment):
+	return base64.urlsafe_b64decode(segment + '=' * (-len(segment) % 4))
+
+def decode_token(token, key, now=None):
+	"""
+	Claims of an access token, None unless the HS256 signature is valid,
+	the token is an access token and it has not expired.
+	"""
+	try:
+		header, payload, signature = token.split('.')
+		claims = json.loads(b64decode(payload))
+		if json.loads(b64decode(header)).get('alg') != 'HS256':
+			return None
+		expected = hmac.new(key.encode(), f'{header}.{payload}'.encode(), hashlib.sha256).digest()
+		if not hmac.compare_digest(expected, b64decode(signature)):
+			return None
+	except (ValueError, TypeError, UnicodeDecodeError):
+		return None
+	if not isinstance(claims, dict) or claims.get('token_type') != 'access':
+		return None
+	exp = claims.get('exp')
+	if not isinstance(exp, (int, float)) or exp <= (time.time() if now is None else now):
+		return None
+	return claims
+
+class TokenVerifier:
+	def __init__(self, signing_key=None, ttl=CACHE_TTL, auth_url=AUTH_URL):
+		self.signing_key = signing_key
+		self.ttl = ttl
+		self.auth_url = auth_url
+		self.tokens = OrderedDict() # access token -> (username, valid until)
+		self.usernames = OrderedDict() # user id -> username
+		self.pending = {}
+		self.client = None
+		self.stats = {
+			'cached': 0,
+			'local': 0,
+			'remote': 0,
+			'coalesced': 0,
+			'rejected': 0,
+		}
+
+	def configure(self, signing_key=None, ttl=CACHE_TTL):
+		self.signing_key = signing_key or None
+		self.ttl = ttl
+		self.tokens.clear()
+		logger.info(f"token verification: {'local' if self.signing_key else 'remote only'}, cache {ttl}s")
+
+	async def verify(self, access_token, refresh_token=None):
+		"""
+		Username of the owner of the token, None if it is not valid.
+		Raises httpx.RequestError when the authentication service is needed
+		and cannot be reached.
+		"""
+		now = time.time()
+		cached = self.tokens.get(access_token)
+		if cached is not None:
+			if cached[1] > now:
+				self.stats['cached'] += 1
+				return cached[0]
+			del self.tokens[access_token]
+		claims = decode_token(access_token, self.signing_key, now) if self.signing_key else None
+		user_id = claims.get('user_id') if claims else None
+		if user_id is not None and user_id in self.usernames:
+			self.stats['local'] += 1
+			username = self.usernames[user_id]
+			self.usernames.move_to_end(user_id)
+		else:
+			username = await self.verify_remote(access_token, refresh_token)
+			if username is None:
+				self.stats['rejected'] += 1
+				return None
+			if user_id is not None:
+				self.remember(self.usernames, user_id, username, USERS_SIZE)
+		exp = claims['exp'] if claims else self._expiry(access_token)
+		self.cache(access_token, username, exp, now)
+		return username
+
+	def _expiry(self, access_token):
+		# read without verification, only for a token the service accepted
+		try:
+			claims = json.loads(b64decode(access_token.split('.')[1]))
+		except (ValueError, TypeError, IndexError, UnicodeDecodeError):
+			return None
+		return claims.get('exp') if isinstance(claims, dict) else None
+
+	def cache(self, access_token, username, exp, now):
+		until = now + self.ttl
+		if isinstance(exp, (int, float)):
+			until = min(until, exp)
+		if until > now:
+			self.remember(self.tokens, access_token, (username, until), CACHE_SIZE)
+
+	def remember(self, table, key, value, size):
+		table[key] = value
+		table.move_to_end(key)
+		while len(table) > size:
+			table.popitem(last=False)
+
+	async def verify_remote(self, access_token, refresh_token):
+		pending = self.pending.get(access_token)
+		if pending is not None:
+			self.stats['coalesced'] += 1
+			return await asyncio.shield(pending)
+		future = asyncio.get_running_loop().create_future()
+		self.pending[access_token] = future
+		try:
+			username = await self.request(access_token, refresh_token)
+			future.set_result(username)
+			return username
+		except asyncio.CancelledError:
+			future.cancel()
+			raise
+		except Exception as e:
+			future.set_exception(e)
+			# retrieved here so that a failure nobody else waits for is not reported
+			future.exception()
+			raise
+		finally:
+			del self.pending[access_token]
+
+	async def request(self, access_token, refresh_token):
+		self.stats['remote'] += 1
+		if self.client is None:
+			self.client = httpx.AsyncClient()
+		cookies = {'access_token': access_token}
+		if refresh_token:
+			cookies['refresh_token'] = refresh_token
+		response = await self.client.post(self.auth_url, cookies=cookies)
+		if response.status_code == 200:
+			return response.json().get('user')
+		return None
+
+token_verifier = TokenVerifier()
@@ -1,19 +1,55 @@
 from django.shortcuts import render
-from django.http import JsonResponse
-from django.views.decorators.csrf import csrf_exempt
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from .game_managers.game_manager import game_manager
+from .game_managers.shards import shards
+from .game_managers.tick_scheduler import tick_scheduler
+from .game_managers.broadcaster import broadcaster
+from .game_managers.inputs import input_stats
+from .game_managers.lifecycle import room_reaper, room_memory
+from .game_managers.replays import replay_store
+from .game_managers.spectators import spectator_stats, spectator_group
+from .game_managers.relay import relay_hubs, relay_stats
+from .game_managers.game_consumers import spectator_data
+from .game.replay import Replay, ReplayError
+from .utils.tokens import token_verifier
+from .utils.decorators import async_csrf_exempt
+from .utils.metrics import metrics
 from .utils.logger import logger
+from asgiref.sync import sync_to_async
+import asyncio
+import os
 import json
+import httpx
+
+METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+FORWARD_TIMEOUT = 5 # seconds a worker has to answer the router
 
 def index(request):
 	return render(request, "index.html")
 
-@csrf_exempt
-def newgame(request):
+async def forward(request, worker):
+	# router: the worker owning the game answers
+	headers = {'Content-Type': request.content_type or 'application/json'}
+	if 'HTTP_COOKIE' in request.META:
+		headers['Cookie'] = request.META['HTTP_COOKIE']
+	try:
+		async with httpx.AsyncClient(timeout=FORWARD_TIMEOUT) as client:
+			response = await client.request(request.method, shards.http_url(worker, request.get_full_path()),
+				content=request.body, headers=headers)
+	except httpx.RequestError as e:
+		logger.error(f"Worker {worker} unreachable: {e}")
+		return JsonResponse({'error': 'Game worker unavailable'}, status=503)
+	return HttpResponse(response.content, status=response.status_code,
+		content_type=response.headers.get('content-type'))
+
+@async_csrf_exempt
+async def newgame(request):
 	if request.method == 'POST':
 		try:
 			data = json.loads(request.body)
 			game_id = data.get('gameId')
+			if shards.is_router:
+				return await forward(request, shards.assign(str(game_id)))
 			admin_id = data.get('adminId')
 			game_mode = data.get('gameMode')
 			modifiers = data.get('modifiers')
@@ -25,6 +61,7 @@ def newgame(request):
 			special_id = data.get('special_id')
 			if game_manager.add_games_room(game_id, admin_id, game_mode, modifiers, players_list, special_id, teamsList) is None:
 				return JsonResponse({'error': 'Invalid game mode'}, status=406)
+			room_reaper.watch(game_id)
 			logger.debug(f"Reçu: gameId={game_id}, adminId={admin_id}, gameMode={game_mode}, playersList={players_list}")
 			return JsonResponse({'status': 'success'}, status=201)
 
@@ -33,12 +70,14 @@ def newgame(request):
 	else:
 		return JsonResponse({'error': 'Invalid request method'}, status=405)
 
-@csrf_exempt
-def abortgame(request):
+@async_csrf_exempt
+async def abortgame(request):
 	if request.method == 'POST':
 		try:
 			data = json.loads(request.body)
 			game_id = data.get('gameId')
+			if shards.is_router:
+				return await forward(request, shards.owner(str(game_id)))
 			if game_manager.abortgame(game_id) is False:
 				return JsonResponse({'error': 'Invalid game id'}, status=406)
 			logger.debug(f"Abort: gameId={game_id}")
@@ -48,3 +87,176 @@ def abortgame(request):
 			return JsonResponse({'error': 'Invalid JSON data'}, status=400)
 	else:
 		return JsonResponse({'error': 'Invalid request method'}, status=405)
+
+async def replay(request, game_id):
+	"""
+	Recording of a match (see game/replay.py), in progress or over.
+	"""
+	if request.method != 'GET':
+		return JsonResponse({'error': 'Invalid request method'}, status=405)
+	if shards.is_router:
+		return await forward(request, shards.owner(game_id))
+	data = await sync_to_async(replay_store.load)(game_id)
+	if data is None:
+		return JsonResponse({'error': 'No replay for this game'}, status=404)
+	return HttpResponse(data, content_type='application/octet-stream')
+
+async def replay_states(request, game_id):
+	"""
+	The states of a match simulated again from its recording, one JSON
+	object per line: every event and one `gu` every `every` steps, up to the
+	step `until`.
+	"""
+	if request.method != 'GET':
+		return JsonResponse({'error': 'Invalid request method'}, status=405)
+	if shards.is_router:
+		return await forward(request, shards.owner(game_id))
+	try:
+		every = max(int(request.GET.get('every', '1')), 1)
+		until = int(request.GET['until']) if 'until' in request.GET else None
+	except ValueError:
+		return JsonResponse({'error': 'Invalid parameters'}, status=400)
+	data = await sync_to_async(replay_store.load)(game_id)
+	if data is None:
+		return JsonResponse({'error': 'No replay for this game'}, status=404)
+	try:
+		recording = Replay(data)
+	except ReplayError as e:
+		return JsonResponse({'error': str(e)}, status=500)
+	def lines():
+		try:
+			for step, state in recording.play(until):
+				if state['type'] != 'gu' or step % every == 0:
+					yield json.dumps({'step': step, 'state': state}) + '\n'
+		except ReplayError as e:
+			logger.error(f"replay of {game_id}: {e}")
+	return StreamingHttpResponse(lines(), content_type='application/x-ndjson')
+
+@async_csrf_exempt
+async def spectate(request, game_id):
+	"""
+	Asked by a relay process (relay.py) for a spectator, with the cookies
+	of the spectator: status and data of the game. While the room has
+	relayed spectators the messages of its spectator group are published on
+	the channel layer for the relays; DELETE is sent by the relay when one
+	of them leaves.
+	"""
+	if request.method not in ('GET', 'DELETE'):
+		return JsonResponse({'error': 'Invalid request method'}, status=405)
+	if shards.is_router:
+		return await forward(request, shards.owner(game_id))
+	room = game_manager.get_room(game_id)
+	if request.method == 'DELETE':
+		if room is not None and room['relayed'] > 0:
+			room['relayed'] -= 1
+			if not room['relayed']:
+				broadcaster.mark_shared(spectator_group(game_id), False)
+		return HttpResponse(status=204)
+	access_token = request.COOKIES.get('access_token')
+	if not access_token:
+		return JsonResponse({'error': 'Missing access token'}, status=401)
+	try:
+		username = await token_verifier.verify(access_token, request.COOKIES.get('refresh_token'))
+	except httpx.RequestError as e:
+		logger.error(f"Authentication service error: {e}")
+		return JsonResponse({'error': 'Authentication service unavailable'}, status=503)
+	if username is None:
+		return JsonResponse({'error': 'Invalid token'}, status=401)
+	if room is None:
+		return JsonResponse({'error': 'Invalid game id'}, status=404)
+	room['relayed'] += 1
+	return JsonResponse({
+		'status': room['status'],
+		'data': spectator_data(room) if room['game_instance'] else None,
+	})
+
+async def export_metrics(request):
+	if shards.is_router:
+		return HttpResponse(await worker_metrics(request.path), content_type=METRICS_CONTENT_TYPE)
+	return HttpResponse(metrics.render(process_values()), content_type=METRICS_CONTENT_TYPE)
+
+def process_values():
+	rooms = dict.fromkeys(game_manager.status_list, 0)
+	memory = dict.fromkeys(game_manager.status_list, 0)
+	for room in game_manager.games_room.values():
+		rooms[room['status']] = rooms.get(room['status'], 0) + 1
+		memory[room['status']] = memory.get(room['status'], 0) + room_memory(room)
+	loop = type(asyncio.get_running_loop())
+	values = [
+		('pong_rooms', 'gauge', 'Rooms of the process by status.',
+			{f'status="{status}"': count for status, count in rooms.items()}),
+		('pong_room_memory_bytes', 'gauge', 'Approximate memory held by the rooms, by status.',
+			{f'status="{status}"': size for status, size in memory.items()}),
+		('pong_reaper_events_total', 'counter', 'Rooms watched, aborted and removed by the reaper.',
+			{f'event="{name}"': value for name, value in room_reaper.stats.items()}),
+		('pong_reaper_timers', 'gauge', 'Deadlines pending in the timer wheel of the reaper.', room_reaper.wheel.size),
+		('pong_spectator_frames_total', 'counter', 'Spectator frames queued, coalesced, dropped (outbox full) and sent.',
+			{f'event="{name}"': value for name, value in spectator_stats.items()}),
+		('pong_relay_frames_total', 'counter', 'Frames received by the relay hubs and deliveries to their spectators.',
+			{f'event="{name}"': value for name, value in relay_stats.items()}),
+		('pong_relay_spectators', 'gauge', 'Spectators served by this process as a relay.', relay_hubs.viewers),
+		('pong_replays_total', 'counter', 'Recordings saved and failed, and bytes written.',
+			{f'event="{name}"': value for name, value in replay_store.stats.items()}),
+		('pong_scheduled_rooms', 'gauge', 'Rooms stepped by the tick scheduler.', len(tick_scheduler.rooms)),
+		('pong_scheduler_events_total', 'counter', 'Ticks, steps, overruns, dropped steps and coalesced states of the tick scheduler.',
+			{f'event="{name}"': tick_scheduler.stats[name] for name in ('ticks', 'steps', 'overruns', 'dropped_steps', 'coalesced_states')}),
+		('pong_broadcaster_events_total', 'counter', 'Frames, local deliveries and channel layer sends.',
+			{f'event="{name}"': value for name, value in broadcaster.stats.items()}),
+		('pong_inputs_total', 'counter', 'Client messages by outcome.',
+			{f'event="{name}"': value for name, value in input_stats.items()}),
+		('pong_token_verifications_total', 'counter', 'Websocket token verifications by outcome.',
+			{f'result="{name}"': value for name, value in token_verifier.stats.items()}),
+		('pong_event_loop_info', 'gauge', 'Event loop implementation.',
+			{f'loop="{loop.__module__}.{loop.__name__}"': 1}),
+	]
+	resident = resident_memory()
+	if resident is not None:
+		values.append(('pong_process_resident_bytes', 'gauge', 'Resident memory of the process.', resident))
+	return values
+
+def resident_memory():
+	try:
+		with open('/proc/self/statm') as statm:
+			return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+	except (OSError, ValueError, IndexError):
+		return None
+
+async def worker_metrics(path):
+	"""
+	Router: the metrics of every worker, labelled with its id.
+	"""
+	async with httpx.AsyncClient() as client:
+		responses = await asyncio.gather(*(
+			client.get(shards.http_url(worker, path)) for worker in range(shards.workers)
+		), return_exceptions=True)
+	families = {}
+	up = {}
+	for worker, response in enumerate(responses):
+		up[f'worker="{worker}"'] = 0
+		if isinstance(response, Exception) or response.status_code != 200:
+			continue
+		up[f'worker="{worker}"'] = 1
+		family = None
+		for line in response.text.splitlines():
+			if line.startswith('# HELP '):
+				family = families.setdefault(line.split(' ')[2], {'comments': [], 'samples': []})
+				if not family['comments']:
+					family['comments'].append(line)
+			elif line.startswith('# TYPE '):
+				if len(family['comments']) == 1:
+					family['comments'].append(line)
+			elif line and family is not None:
+				name, value = line.rsplit(' ', 1)
+				if '{' in name:
+					name = name.replace('{', f'{{worker="{worker}",', 1)
+				else:
+					name = f'{name}{{worker="{worker}"}}'
+				family['samples'].append(f'{name} {value}')
+	lines = [
+		'# HELP pong_worker_up Worker answering its metrics.',
+		'# TYPE pong_worker_up gauge',
+	]
+	lines += [f'pong_worker_up{{{labels}}} {value}' for labels, value in up.items()]
+	for family in families.values():
+		lines += family['comments'] + family['samples']
+	return '\n'.join(lines) + '\n'
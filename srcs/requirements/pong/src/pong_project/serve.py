@@ -0,0 +1,33 @@
+"""
+Starts daphne (same command line arguments) on uvloop when it is installed.
+
+daphne creates its event loop when daphne.server is imported, the policy
+is set before that. PONG_EVENT_LOOP selects the loop: 'auto' (default,
+uvloop if available), 'uvloop' or 'asyncio'.
+
+	python -m pong_project.serve -b 0.0.0.0 -p 8000 pong_project.asgi:application
+"""
+import asyncio
+import os
+import sys
+
+def install_event_loop():
+	choice = os.environ.get('PONG_EVENT_LOOP', 'auto')
+	if choice == 'asyncio':
+		return 'asyncio'
+	try:
+		import uvloop
+	except ImportError:
+		if choice == 'uvloop':
+			print("PONG_EVENT_LOOP=uvloop but uvloop is not installed, using asyncio", file=sys.stderr)
+		return 'asyncio'
+	asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+	return 'uvloop'
+
+def main():
+	install_event_loop()
+	from daphne.cli import CommandLineInterface
+	CommandLineInterface.entrypoint()
+
+if __name__ == '__main__':
+	main()
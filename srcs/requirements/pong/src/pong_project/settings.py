@@ -160,6 +160,50 @@ CACHES = {
 	}
 }
 
+# Pong physics
+
+# Step every running room together with the NumPy batch engine
+# (pong_game.game.batch_physics) instead of one Game.update per room.
+PONG_BATCH_PHYSICS = os.environ.get('PONG_BATCH_PHYSICS', '0') == '1'
+
+# Workers
+
+# Number of processes the rooms are sharded over (see start_pong.sh and
+# pong_game.game_managers.shards). PONG_WORKER_ID is set by start_pong.sh:
+# 'router' for the public process, 0..PONG_WORKERS - 1 for the workers,
+# listening on PONG_WORKER_PORT + id.
+PONG_WORKERS = int(os.environ.get('PONG_WORKERS', '1'))
+PONG_WORKER_ID = os.environ.get('PONG_WORKER_ID')
+PONG_WORKER_PORT = int(os.environ.get('PONG_WORKER_PORT', '8001'))
+
+# Rooms
+
+# Seconds a room created by newgame waits for its admin and players before
+# being removed (pong_game.game_managers.lifecycle).
+PONG_ROOM_WAITING_TIMEOUT = int(os.environ.get('PONG_ROOM_WAITING_TIMEOUT', '600'))
+
+# Directory the recordings of the matches are kept in (empty: not kept) and
+# number of recordings kept (pong_game.game_managers.replays). Outside of
+# the sources: the pong_replays volume of docker-compose.yml.
+PONG_REPLAY_DIR = os.environ.get('PONG_REPLAY_DIR', '/data/replays')
+PONG_REPLAY_KEEP = int(os.environ.get('PONG_REPLAY_KEEP', '10000'))
+
+# Websocket authentication
+
+def read_secret(secret_name):
+	file_path = os.environ.get(f'{secret_name}_FILE')
+	if file_path and os.path.exists(file_path):
+		with open(file_path, 'r') as file:
+			return file.read().strip()
+	return None
+
+# Key the authentication service signs its access tokens with: they are
+# verified locally (pong_game.utils.tokens), the service is only called as a
+# fallback. Without it every connection is verified remotely.
+PONG_JWT_SIGNING_KEY = read_secret('JWT_SIGNING_KEY')
+# Seconds a verified token is trusted without being checked again.
+PONG_AUTH_CACHE_TTL = int(os.environ.get('PONG_AUTH_CACHE_TTL', '60'))
+
 #CSP
 
 X_FRAME_OPTIONS = 'SAMEORIGIN' 
@@ -1,2 +1,48 @@
 #!/bin/sh
-exec daphne -b 0.0.0.0 -p 8000 pong_project.asgi:application
\ No newline at end of file
+# PONG_WORKERS daphne workers (default: 1, uvloop when installed, see
+# pong_project/serve.py) own the rooms. With more than one, the router on
+# port 8000 forwards each game to its worker (see
+# pong_game/game_managers/shards.py).
+# PONG_SPECTATOR_RELAY=1 adds a relay process on PONG_RELAY_PORT serving the
+# spectators of ws/pong/<game_id>/spectate/ (pong_game/game_managers/relay.py).
+# It is opt-in: docker-compose does not set it, and nginx sends
+# /ws/pong/ to port 8000 (see the commented route in nginx/default.conf).
+# When one of the processes stops the others are stopped and the script
+# exits with an error, docker restarts the container (restart: on-failure).
+WORKERS=${PONG_WORKERS:-1}
+PORT=${PONG_WORKER_PORT:-8001}
+export PONG_WORKERS=$WORKERS PONG_WORKER_PORT=$PORT
+if [ "$WORKERS" -le 1 ] && [ "${PONG_SPECTATOR_RELAY:-0}" != "1" ]; then
+	exec python -m pong_project.serve -b 0.0.0.0 -p 8000 pong_project.asgi:application
+fi
+PIDS=
+trap 'kill $PIDS 2>/dev/null; exit 0' TERM INT
+if [ "${PONG_SPECTATOR_RELAY:-0}" = "1" ]; then
+	PONG_WORKER_ID=relay python -m pong_project.serve -b 0.0.0.0 -p ${PONG_RELAY_PORT:-8100} pong_project.asgi:application &
+	PIDS="$PIDS $!"
+fi
+if [ "$WORKERS" -le 1 ]; then
+	python -m pong_project.serve -b 0.0.0.0 -p 8000 pong_project.asgi:application &
+	PIDS="$PIDS $!"
+else
+	i=0
+	while [ "$i" -lt "$WORKERS" ]; do
+		PONG_WORKER_ID=$i python -m pong_project.serve -b 127.0.0.1 -p $((PORT + i)) pong_project.asgi:application &
+		PIDS="$PIDS $!"
+		i=$((i + 1))
+	done
+	PONG_WORKER_ID=router python -m pong_project.serve -b 0.0.0.0 -p 8000 pong_project.asgi:application &
+	PIDS="$PIDS $!"
+fi
+# no `wait -n` in the alpine sh: watch the processes until one is gone
+while :; do
+	for pid in $PIDS; do
+		if ! kill -0 "$pid" 2>/dev/null; then
+			wait "$pid"
+			status=$?
+			kill $PIDS 2>/dev/null
+			exit $((status ? status : 1))
+		fi
+	done
+	sleep 1
+done
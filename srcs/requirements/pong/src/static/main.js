@@ -1,17 +1,22 @@
 import { init } from './srcs/init.js';
-import { startGame, updateGame, stopAnimation } from './srcs/animate.js';
+import { startGame, updateGame, stopAnimation, setFrameHook } from './srcs/animate.js';
 import { updateScore } from './srcs/object/score.js';
 import { printWinner } from './srcs/object/win.js';
 import {scene, cleanup} from './srcs/scene.js';
 import './srcs/object/camera.js';
+import { decodeFrame, applyDelta } from './srcs/wire.js';
+import { setTrajectory, extrapolate } from './srcs/trajectory.js';
 
 const wsProtocol = location.protocol === 'https:' ? 'wss:' : 'ws:';
 const host = window.location.hostname;
 const port = window.location.port;
 const gameId = new URLSearchParams(window.location.search).get('gameId');
 const specialId = new URLSearchParams(window.location.search).get('specialId');
-const url = `${wsProtocol}//${host}${port ? `:${port}` : ''}/ws/pong/${gameId}${specialId ? `/${specialId}` : ''}/`;
+// `?stream=trajectory` trades the per-tick updates for extrapolated trajectories
+const trajectoryMode = new URLSearchParams(window.location.search).get('stream') === 'trajectory';
+const url = `${wsProtocol}//${host}${port ? `:${port}` : ''}/ws/pong/${gameId}${specialId ? `/${specialId}` : ''}/?format=binary&${trajectoryMode ? 'trajectory=1' : 'delta=1'}`;
 const socket = new WebSocket(url);
+socket.binaryType = 'arraybuffer';
 
 socket.onopen = function() {
 	console.log("WebSocket connection established.");
@@ -25,9 +30,11 @@ socket.onopen = function() {
 
 let playerLscore = 0;
 let playerRscore = 0;
+let lastState = null;
 
 socket.onmessage = function(event) {
-	const data = JSON.parse(event.data);
+	// game updates come as binary frames, everything else as JSON
+	const data = event.data instanceof ArrayBuffer ? decodeFrame(event.data) : JSON.parse(event.data);
 	switch (data.type) {
 		case "waiting_room":
 			console.log("Waiting for an opponent to join...");
@@ -39,11 +46,25 @@ socket.onmessage = function(event) {
 			break;
 		case "game_start":
 			console.log("Game started!");
+			if (trajectoryMode)
+				setFrameHook((now) => {
+					const state = extrapolate(now);
+					if (state)
+						updateGame(state);
+				});
 			startGame();
 			break;
 		case "gu":
+			lastState = data;
 			updateGame(data);
 			break;
+		case "gd":
+			if (lastState)
+				updateGame(applyDelta(lastState, data));
+			break;
+		case "tr":
+			setTrajectory(data);
+			break;
 		case "scored":
 			console.log("Scored :", data);
 			if (data.team === "left") {
@@ -6,6 +6,7 @@ import { updateMap2Mixer } from './object/map2.js'
 import { controls } from './controls.js'
 
 let animationId;
+let frameHook = null;
 const clock = new THREE.Clock();
 
 function startGame() {
@@ -16,9 +17,16 @@ function animate() {
 	animationId = requestAnimationFrame(animate);
 	const delta = clock.getDelta();
 	updateMap2Mixer(delta);
+	if (frameHook)
+		frameHook(performance.now());
 	renderer.render(scene, camera);
 }
 
+// called with the current time before every render
+function setFrameHook(hook) {
+	frameHook = hook;
+}
+
 function updateGame(state) {
 	updateBallPosition(state.bp);
 	updatePadsPosition(state.pp);
@@ -28,4 +36,4 @@ function stopAnimation() {
 	cancelAnimationFrame(animationId);
 }
 
-export { startGame, updateGame, stopAnimation };
\ No newline at end of file
+export { startGame, updateGame, stopAnimation, setFrameHook };
\ No newline at end of file
@@ -0,0 +1,37 @@
+// Trajectory stream (pong_game/game_managers/trajectory.py): the server sends
+// the current motion (`tr` events stamped with the game time) and the ball
+// and padels are extrapolated on every rendered frame in between.
+
+// how much the estimated latency may grow per event, so that the clock
+// follows a server running slower than real time
+const CLOCK_DRIFT = 0.005;
+
+let trajectory = null;
+let clockOffset = null;
+
+function setTrajectory(event) {
+	// offset between the local clock and the game time, taken on the fastest
+	// event received: the others only add network delay
+	const sample = performance.now() / 1000 - event.t;
+	clockOffset = clockOffset === null ? sample : Math.min(sample, clockOffset + CLOCK_DRIFT);
+	trajectory = event;
+}
+
+function extrapolate(now) {
+	if (trajectory === null)
+		return null;
+	const elapsed = Math.max(0, now / 1000 - clockOffset - trajectory.t);
+	const pp = {};
+	for (const key in trajectory.pp)
+		pp[key] = trajectory.pp[key] + trajectory.pv[key] * elapsed;
+	return {
+		bp: {
+			x: trajectory.bp.x + trajectory.bv.x * elapsed,
+			y: trajectory.bp.y + trajectory.bv.y * elapsed,
+			z: trajectory.bp.z
+		},
+		pp: pp
+	};
+}
+
+export { setTrajectory, extrapolate };
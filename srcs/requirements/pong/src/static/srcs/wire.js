@@ -0,0 +1,109 @@
+// Decoder of the binary game frames (pong_game/game_managers/wire.py).
+//
+// gu / padel_contact
+//   header: u8 version, u8 type code, u8 padel mask
+//   ball:   f32 bp.x, bp.y, bp.z, bs.x, bs.y
+//   padels: f32 y for every bit set in the mask (bit i is p{i + 1})
+// gd (delta stream)
+//   header: u8 version, u8 type code, u16 field mask
+//   fields: f32 value for every bit set in the mask (bit i is DELTA_FIELDS[i])
+// tr (trajectory stream)
+//   header: u8 version, u8 type code, u8 padel mask
+//   motion: f32 t, bp.x, bp.y, bp.z, bv.x, bv.y
+//   padels: f32 y, f32 v for every bit set in the mask
+
+const WIRE_VERSION = 1;
+const TYPE_NAMES = {
+	1: 'gu',
+	2: 'padel_contact',
+	3: 'gd',
+	4: 'tr'
+};
+const MAX_PADELS = 4;
+const HEADER_SIZE = 3;
+const BALL_SIZE = 5 * 4;
+const DELTA_HEADER_SIZE = 4;
+const DELTA_FIELDS = [
+	['bp', 'x'], ['bp', 'y'], ['bp', 'z'],
+	['bs', 'x'], ['bs', 'y'],
+	['pp', 'p1'], ['pp', 'p2'], ['pp', 'p3'], ['pp', 'p4']
+];
+
+function decodeDelta(view) {
+	const mask = view.getUint16(2, true);
+	const state = { type: 'gd' };
+	let offset = DELTA_HEADER_SIZE;
+	DELTA_FIELDS.forEach(([group, key], i) => {
+		if (mask & (1 << i)) {
+			if (state[group] === undefined)
+				state[group] = {};
+			state[group][key] = view.getFloat32(offset, true);
+			offset += 4;
+		}
+	});
+	return state;
+}
+
+function decodeTrajectory(view) {
+	const mask = view.getUint8(2);
+	const f = (i) => view.getFloat32(HEADER_SIZE + i * 4, true);
+	const pp = {};
+	const pv = {};
+	let offset = HEADER_SIZE + 6 * 4;
+	for (let i = 0; i < MAX_PADELS; i++) {
+		if (mask & (1 << i)) {
+			pp[`p${i + 1}`] = view.getFloat32(offset, true);
+			pv[`p${i + 1}`] = view.getFloat32(offset + 4, true);
+			offset += 8;
+		}
+	}
+	return {
+		type: 'tr',
+		t: f(0),
+		bp: { x: f(1), y: f(2), z: f(3) },
+		bv: { x: f(4), y: f(5) },
+		pp: pp,
+		pv: pv
+	};
+}
+
+function decodeFrame(buffer) {
+	const view = new DataView(buffer);
+	const version = view.getUint8(0);
+	if (version !== WIRE_VERSION)
+		throw new Error(`unsupported wire version ${version}`);
+	const type = TYPE_NAMES[view.getUint8(1)];
+	if (type === undefined)
+		throw new Error(`unknown frame type ${view.getUint8(1)}`);
+	if (type === 'gd')
+		return decodeDelta(view);
+	if (type === 'tr')
+		return decodeTrajectory(view);
+	const mask = view.getUint8(2);
+	const f = (i) => view.getFloat32(HEADER_SIZE + i * 4, true);
+	const pp = {};
+	let offset = HEADER_SIZE + BALL_SIZE;
+	for (let i = 0; i < MAX_PADELS; i++) {
+		if (mask & (1 << i)) {
+			pp[`p${i + 1}`] = view.getFloat32(offset, true);
+			offset += 4;
+		}
+	}
+	return {
+		type: type,
+		bp: { x: f(0), y: f(1), z: f(2) },
+		bs: { x: f(3), y: f(4) },
+		pp: pp
+	};
+}
+
+// Merges a gd frame into the last full state rebuilt from the stream.
+function applyDelta(state, delta) {
+	for (const group of ['bp', 'bs', 'pp']) {
+		if (delta[group] !== undefined)
+			Object.assign(state[group], delta[group]);
+	}
+	return state;
+}
+
+export { decodeFrame, applyDelta };